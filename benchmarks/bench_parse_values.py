@@ -0,0 +1,106 @@
+"""
+Micro-benchmark of `pyjdb.core.helpers.parse_jdb_value`, compared to the
+implementation it replaced, on the values of realistic `locals` and `dump`
+output. Run with `python benchmarks/bench_parse_values.py` (from anywhere, as
+the script finds the package next to it).
+"""
+
+import os as _os
+import re as _re
+import sys as _sys
+import timeit as _timeit
+import typing as _typ
+
+# Run from a checkout, without installing the package
+_sys.path.insert(0, _os.path.dirname(_os.path.dirname(_os.path.abspath(__file__))))
+
+from pyjdb.core import helpers as _helpers
+
+
+LOCALS_OUTPUT = """Method arguments:
+args = instance of java.lang.String[2] (id=495)
+n = 1000
+Local variables:
+i = 17
+total = 136
+ratio = 0.7853981633974483
+name = "Fibonacci"
+letter = 'f'
+found = false
+node = instance of Node(id=502)
+next = null
+values = {1, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233, 377, 610, 987}
+words = {"alpha", "beta", "gamma, delta", "epsilon"}
+"""
+
+REGEXP_LEGACY_CSV = _re.compile(_helpers.REGEXP_PATT_CSV)
+
+
+def legacy_parse_jdb_value(value: str) -> _typ.Any:
+    # The implementation of `parse_jdb_value` before the tokenizer
+    if type(value) is not str:
+        return value
+
+    if value == "<void value>":
+        return None
+
+    if value[0:8] == "instance":
+        return value
+
+    if value[0] == "{" and value[-1] == "}":
+        data = value[1:-1].strip()
+        values = map(str.strip, REGEXP_LEGACY_CSV.findall(data))
+        return list(map(legacy_parse_jdb_value, values))
+
+    if value == "null":
+        return None
+
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in ["'", '"']:
+        return value[1:-1]
+
+    if value in ["true", "false"]:
+        return value == "true"
+
+    try:
+        return int(value)
+    except ValueError:
+        pass
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    return value
+
+
+def get_values(text: str) -> _typ.List[str]:
+    return [
+        line.split("=", 1)[1].strip()
+        for line in text.splitlines()
+        if "=" in line
+    ]
+
+
+def bench(function: _typ.Callable[[str], _typ.Any], values: _typ.List[str], number: int) -> float:
+    def run():
+        for value in values:
+            function(value)
+
+    return min(_timeit.repeat(run, number=number, repeat=5)) / number
+
+
+def main(number: int = 2000) -> _typ.NoReturn:
+    values = get_values(LOCALS_OUTPUT)
+
+    legacy = bench(legacy_parse_jdb_value, values, number)
+    current = bench(_helpers.parse_jdb_value, values, number)
+
+    print("values per locals: {}".format(len(values)))
+    print("legacy:  {:8.2f} us per locals".format(legacy * 1e6))
+    print("current: {:8.2f} us per locals".format(current * 1e6))
+    print("speedup: {:8.2f}x".format(legacy / current))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+/******************************************************************************
+    Benchmark workload: deep recursion, which produces many method entry and
+    exit events, and many frames.
+
+    Compile with -g debug flag to get debugging information.
+******************************************************************************/
+
+
+public class DeepRecursion {
+    static int depth(int n) {
+        if (n == 0)
+            return 0;
+        return 1 + depth(n - 1);
+    }
+
+    static int fibonacci(int n) {
+        if (n < 2)
+            return n;
+        return fibonacci(n - 1) + fibonacci(n - 2);
+    }
+
+    public static void main(String[] args) {
+        int n = args.length > 0 ? Integer.parseInt(args[0]) : 200;
+
+        int d = depth(n);
+        int f = fibonacci(10);
+
+        System.out.println(d + f);
+    }
+}
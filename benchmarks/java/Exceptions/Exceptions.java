@@ -0,0 +1,31 @@
+/******************************************************************************
+    Benchmark workload: exceptions thrown and caught in a loop, and a final
+    uncaught exception, which ends the trace.
+
+    Compile with -g debug flag to get debugging information.
+******************************************************************************/
+
+
+public class Exceptions {
+    static int check(int i) {
+        if (i % 3 == 0)
+            throw new IllegalArgumentException("multiple of 3: " + i);
+        return i;
+    }
+
+    public static void main(String[] args) {
+        int n = args.length > 0 ? Integer.parseInt(args[0]) : 100;
+
+        int caught = 0;
+        for (int i = 0; i < n; i++) {
+            try {
+                check(i);
+            } catch (IllegalArgumentException e) {
+                caught++;
+            }
+        }
+
+        int[] values = new int[1];
+        values[caught] = 1;
+    }
+}
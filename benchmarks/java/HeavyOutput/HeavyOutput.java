@@ -0,0 +1,19 @@
+/******************************************************************************
+    Benchmark workload: heavy output on stdout. The target is launched
+    separately from the debugger (`capture_target`), so this output is not
+    mixed with that of `jdb`; it measures the cost of reading it as it is
+    written, which keeps the target from blocking once its terminal is full.
+
+    Compile with -g debug flag to get debugging information.
+******************************************************************************/
+
+
+public class HeavyOutput {
+    public static void main(String[] args) {
+        int n = args.length > 0 ? Integer.parseInt(args[0]) : 200;
+
+        for (int i = 0; i < n; i++) {
+            System.out.println("line " + i + ": the quick brown fox jumps over the lazy dog");
+        }
+    }
+}
@@ -0,0 +1,29 @@
+/******************************************************************************
+    Benchmark workload: large arrays, which are expensive to print and to
+    parse when they are dumped.
+
+    Compile with -g debug flag to get debugging information.
+******************************************************************************/
+
+
+public class LargeArrays {
+    public static void main(String[] args) {
+        int n = args.length > 0 ? Integer.parseInt(args[0]) : 1000;
+
+        int[] values = new int[n];
+        String[] names = new String[n];
+
+        for (int i = 0; i < n; i += 10) {
+            values[i] = i;
+            names[i] = "name" + i;
+        }
+
+        int max = 0;
+        for (int i = 0; i < n; i += 10) {
+            if (values[i] > max)
+                max = values[i];
+        }
+
+        System.out.println(max + " " + names[0]);
+    }
+}
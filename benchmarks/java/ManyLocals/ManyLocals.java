@@ -0,0 +1,39 @@
+/******************************************************************************
+    Benchmark workload: many local variables of different types, which makes
+    the output of `locals` long.
+
+    Compile with -g debug flag to get debugging information.
+******************************************************************************/
+
+
+public class ManyLocals {
+    public static void main(String[] args) {
+        int n = args.length > 0 ? Integer.parseInt(args[0]) : 100;
+
+        int a = 1, b = 2, c = 3, d = 4, e = 5, f = 6, g = 7, h = 8;
+        long total = 0;
+        double ratio = 0.5;
+        char letter = 'a';
+        boolean flag = false;
+        String text = "many, locals";
+        int[] small = {1, 2, 3, 4, 5};
+
+        for (int i = 0; i < n; i++) {
+            a = b + c;
+            b = c + d;
+            c = d + e;
+            d = e + f;
+            e = f + g;
+            f = g + h;
+            g = h + a;
+            h = a + b;
+            total += a + h;
+            ratio = ratio * 0.99 + 0.01;
+            letter = (char) ('a' + i % 26);
+            flag = !flag;
+            small[i % 5] = i;
+        }
+
+        System.out.println(total + " " + ratio + " " + letter + " " + flag + " " + text);
+    }
+}
@@ -0,0 +1,20 @@
+/******************************************************************************
+    Benchmark workload: a tight loop over a few primitive variables, which
+    measures the raw cost of a step.
+
+    Compile with -g debug flag to get debugging information.
+******************************************************************************/
+
+
+public class TightLoop {
+    public static void main(String[] args) {
+        int n = args.length > 0 ? Integer.parseInt(args[0]) : 500;
+
+        long sum = 0;
+        for (int i = 0; i < n; i++) {
+            sum += i * i;
+        }
+
+        System.out.println(sum);
+    }
+}
@@ -0,0 +1,274 @@
+"""
+Benchmark suite of `pyjdb` on the Java workloads of `benchmarks/java`: each
+workload is traced end-to-end with `get_program_trace` (measuring the total
+time and the peak memory allocated while tracing), and stepped through with
+`JdbProcess.step` and `JdbProcess.locals` (measuring the throughput and the
+latency of each command). The results are written as JSON, so that releases
+can be compared.
+
+Run with `python benchmarks/run_benchmarks.py [--output results.json]` (from
+anywhere, as the script finds the package next to it); this requires a JDK
+(`javac`, `java` and `jdb`).
+"""
+
+import argparse as _argparse
+import datetime as _datetime
+import json as _json
+import os as _os
+import platform as _platform
+import shutil as _shutil
+import statistics as _statistics
+import sys as _sys
+import tempfile as _tempfile
+import time as _time
+import tracemalloc as _tracemalloc
+import typing as _typ
+
+# Run from a checkout, without installing the package
+_sys.path.insert(0, _os.path.dirname(_os.path.dirname(_os.path.abspath(__file__))))
+
+from pyjdb.core import exceptions as _exceptions, helpers as _helpers
+from pyjdb.inspect import compiler as _compiler
+from pyjdb.inspect import process as _process
+from pyjdb.version import __version__ as _version
+
+
+BENCHMARKS_PATH = _os.path.join(_os.path.dirname(_os.path.abspath(__file__)), "java")
+
+# The workloads, with the command-line arguments which set their size
+WORKLOADS = {
+    "TightLoop": "500",
+    "DeepRecursion": "200",
+    "LargeArrays": "1000",
+    "ManyLocals": "100",
+    "HeavyOutput": "200",
+    "Exceptions": "100",
+}
+
+
+def _summarize(latencies: _typ.List[float]) -> _typ.Dict[str, _typ.Any]:
+    # Summarize latencies (in seconds) in milliseconds
+    if len(latencies) == 0:
+        return {"count": 0}
+
+    latencies = sorted(latencies)
+
+    return {
+        "count": len(latencies),
+        "mean_ms": _statistics.mean(latencies) * 1000,
+        "median_ms": _statistics.median(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def bench_end_to_end(
+        class_name: str,
+        path: str,
+        args: str,
+        columnar: bool,
+        backend: str = "jdb",
+) -> _typ.Dict[str, _typ.Any]:
+    """
+    Traces a workload with `get_program_trace`, measuring the total time, the
+    number of steps, and the peak memory allocated by Python while tracing
+    (on a second run, which is not timed, as tracing allocations slows the
+    program down).
+
+    :param class_name: The name of the main class of the workload.
+    :param path: The folder of the workload.
+    :param args: The command-line arguments of the workload.
+    :param columnar: Whether to store the trace in columnar form.
+    :param backend: The debugging backend ("jdb" or "jdwp").
+    :return: A dictionary of measurements.
+    """
+
+    def trace_workload():
+        return _process.get_program_trace(
+            class_name=class_name,
+            path=path,
+            args=args,
+            columnar=columnar,
+            backend=backend,
+        )
+
+    start = _time.perf_counter()
+    (exception, trace) = trace_workload()
+    elapsed = _time.perf_counter() - start
+
+    steps = len(trace)
+
+    _tracemalloc.start()
+    try:
+        trace_workload()
+        (_, peak) = _tracemalloc.get_traced_memory()
+    finally:
+        _tracemalloc.stop()
+
+    return {
+        "seconds": elapsed,
+        "steps": steps,
+        "steps_per_second": steps / elapsed if elapsed > 0 else None,
+        "trace_peak_bytes": peak,
+        "exception": exception,
+    }
+
+
+def bench_commands(
+        class_name: str,
+        path: str,
+        args: str,
+        max_steps: int,
+        backend: str = "jdb",
+) -> _typ.Dict[str, _typ.Any]:
+    """
+    Steps through a workload, timing each `step` and `locals` command, and
+    collects the statistics of the `JdbProcess`.
+
+    :param class_name: The name of the main class of the workload.
+    :param path: The folder of the workload.
+    :param args: The command-line arguments of the workload.
+    :param max_steps: The maximum number of steps to make.
+    :param backend: The debugging backend ("jdb" or "jdwp").
+    :return: A dictionary of measurements.
+    """
+
+    step_latencies = []
+    locals_latencies = []
+
+    start = _time.perf_counter()
+
+    with _process.JdbProcessContextManager(class_name=class_name, path=path, args=args, backend=backend) as p:
+        spawn_seconds = p.stats.times["spawn"]
+
+        try:
+            while p.active and len(step_latencies) < max_steps:
+                step_start = _time.perf_counter()
+                p.step()
+                step_latencies.append(_time.perf_counter() - step_start)
+
+                locals_start = _time.perf_counter()
+                p.locals()
+                locals_latencies.append(_time.perf_counter() - locals_start)
+
+        except (_exceptions.JdbHostErrorException, _exceptions.JdbHostExitedException):
+            pass
+
+        stats = p.stats.snapshot()
+
+    elapsed = _time.perf_counter() - start
+    stepping = sum(step_latencies) + sum(locals_latencies)
+
+    return {
+        "seconds": elapsed,
+        "spawn_seconds": spawn_seconds,
+        "steps": len(step_latencies),
+        "steps_per_second": len(step_latencies) / stepping if stepping > 0 else None,
+        "step": _summarize(step_latencies),
+        "locals": _summarize(locals_latencies),
+        "stats": stats,
+    }
+
+
+def run_workload(
+        class_name: str,
+        args: str,
+        repeat: int = 1,
+        max_steps: int = 1000,
+        columnar: bool = False,
+        backend: str = "jdb",
+) -> _typ.Dict[str, _typ.Any]:
+    """
+    Runs the benchmarks of a workload, in a temporary copy of its folder (so
+    that the class files are not written to the repository).
+
+    :param class_name: The name of the workload.
+    :param args: The command-line arguments of the workload.
+    :param repeat: The number of times each benchmark is run.
+    :param max_steps: The maximum number of steps timed one by one.
+    :param columnar: Whether to store the end-to-end traces in columnar form.
+    :param backend: The debugging backend ("jdb" or "jdwp").
+    :return: A dictionary of the results of each run.
+    """
+
+    folder = _tempfile.mkdtemp(prefix="pyjdb-bench-")
+    path = _os.path.join(folder, class_name)
+    _shutil.copytree(_os.path.join(BENCHMARKS_PATH, class_name), path)
+
+    try:
+        return {
+            "args": args,
+            "end_to_end": [bench_end_to_end(class_name, path, args, columnar, backend) for _ in range(repeat)],
+            "commands": [bench_commands(class_name, path, args, max_steps, backend) for _ in range(repeat)],
+        }
+
+    finally:
+        _shutil.rmtree(folder, ignore_errors=True)
+
+
+def get_environment() -> _typ.Dict[str, _typ.Any]:
+    return {
+        "pyjdb": _version,
+        "python": _platform.python_version(),
+        "javac": _compiler.get_javac_version(),
+        "jdb": _helpers.parse_jdb_version(),
+        "platform": _platform.platform(),
+        "date": _datetime.datetime.now(_datetime.timezone.utc).isoformat(),
+    }
+
+
+def main(argv: _typ.Optional[_typ.List[str]] = None) -> int:
+    parser = _argparse.ArgumentParser(description="Benchmarks pyjdb on reference Java workloads.")
+    parser.add_argument("workloads", nargs="*", help="the workloads to run (by default, all of them)")
+    parser.add_argument("--output", "-o", help="the JSON file to write (by default, standard output)")
+    parser.add_argument("--repeat", type=int, default=1, help="the number of runs of each benchmark")
+    parser.add_argument("--max-steps", type=int, default=1000, help="the maximum number of steps timed")
+    parser.add_argument("--columnar", action="store_true", help="store end-to-end traces in columnar form")
+    parser.add_argument("--backend", default="jdb",
+                        choices=sorted(set(_process.SESSION_BACKENDS) | set(_process.EXPERIMENTAL_SESSION_BACKENDS)),
+                        help="the debugging backend, which may be experimental (by default, jdb)")
+    options = parser.parse_args(argv)
+
+    # Experimental backends are benchmarked before they are offered
+    _process.enable_backend(options.backend)
+
+    names = options.workloads or list(WORKLOADS)
+    unknown = [name for name in names if name not in WORKLOADS]
+    if len(unknown) > 0:
+        parser.error("unknown workloads: {}".format(", ".join(unknown)))
+
+    results = {
+        "environment": get_environment(),
+        "options": {
+            "repeat": options.repeat,
+            "max_steps": options.max_steps,
+            "columnar": options.columnar,
+            "backend": options.backend,
+        },
+        "workloads": {},
+    }
+
+    for name in names:
+        print("Running {}...".format(name), file=_sys.stderr)
+        results["workloads"][name] = run_workload(
+            name,
+            WORKLOADS[name],
+            repeat=options.repeat,
+            max_steps=options.max_steps,
+            columnar=options.columnar,
+            backend=options.backend,
+        )
+
+    text = _json.dumps(results, indent=2)
+
+    if options.output is None:
+        print(text)
+    else:
+        with open(options.output, "w") as f:
+            f.write(text)
+
+    return 0
+
+
+if __name__ == "__main__":
+    _sys.exit(main())
@@ -14,6 +14,22 @@ License: Copyright (c) 2019 Jérémie Lumbroso, under LGPL3 license
 
 from pyjdb.core.jdb_process import JdbProcess
 
+from pyjdb.core.async_jdb_process import AsyncJdbProcess
+
+from pyjdb.core.jdwp_process import JdwpProcess
+
+from pyjdb.core.objects import JdbObject, JdbReference
+
+from pyjdb.core.stats import JdbStats
+
+from pyjdb.core.trace import Trace, TraceHistory, VariableHistory
+
+from pyjdb.core.sinks import *
+
 from pyjdb.core.exceptions import *
 
 from pyjdb.inspect.process import *
+
+from pyjdb.inspect.farm import TraceJobResult, trace_many
+
+from pyjdb.inspect.pool import JdbSessionPool
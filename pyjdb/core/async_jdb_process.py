@@ -0,0 +1,750 @@
+import asyncio as _asyncio
+import inspect as _inspect
+import re as _re
+import shlex as _shlex
+import typing as _typ
+
+from pyjdb.core import helpers as _helpers, exceptions as _exceptions
+from pyjdb.core import events as _events
+from pyjdb.core import sinks as _sinks
+from pyjdb.core import stats as _stats
+from pyjdb.core import jdb_process as _jdb_process
+
+
+def _tracer_attribute(name: str) -> property:
+    # An attribute of the session, held by its `tracer`
+    return property(
+        lambda self: getattr(self.tracer, name),
+        lambda self, value: setattr(self.tracer, name, value),
+        doc="See `JdbProcess.{}`.".format(name),
+    )
+
+
+class AsyncJdbProcess(object):
+    """
+    Variant of `JdbProcess` driven by `asyncio`: `jdb` (and the target, when
+    it is captured) run as `asyncio` subprocesses, and every method which
+    communicates with `jdb` is a coroutine (or, for `iter_steps` and
+    `iter_samples`, an asynchronous iterator), so that a single event loop
+    can drive many debugging sessions concurrently.
+
+    The configuration, trace history and bookkeeping of the session are held
+    by a `JdbProcess`, `tracer`, which interprets the output of `jdb` but is
+    never spawned; its attributes (such as `trace`, `include_classes` or
+    `max_depth`) are available on the `AsyncJdbProcess`, and step records
+    are in the same format. The logic of stepping, sampling and resolving
+    objects is that of the `tracer` (see `JdbProcess._run`): this class only
+    reads and writes the pipes.
+
+    Unlike `JdbProcess`, which runs `jdb` and the target in pseudo-terminals,
+    the subprocesses are connected with plain pipes (there is no terminal
+    support): programs which check whether they run in a terminal behave as
+    if their input and output were redirected.
+    """
+
+    class_name = _tracer_attribute("class_name")
+    class_path = _tracer_attribute("class_path")
+    entry_method = _tracer_attribute("entry_method")
+    exclude_classes = _tracer_attribute("exclude_classes")
+    include_classes = _tracer_attribute("include_classes")
+    include_methods = _tracer_attribute("include_methods")
+    max_depth = _tracer_attribute("max_depth")
+    skip_policy = _tracer_attribute("skip_policy")
+    call_depth = _tracer_attribute("call_depth")
+    trace = _tracer_attribute("trace")
+    trace_max = _tracer_attribute("trace_max")
+    trace_columnar = _tracer_attribute("trace_columnar")
+    trace_sinks = _tracer_attribute("trace_sinks")
+    keep_trace = _tracer_attribute("keep_trace")
+    thread_traces = _tracer_attribute("thread_traces")
+    truncated = _tracer_attribute("truncated")
+    current_locals = _tracer_attribute("current_locals")
+    object_depth = _tracer_attribute("object_depth")
+    stats = _tracer_attribute("stats")
+    cwd = _tracer_attribute("cwd")
+
+    def __init__(self, class_name, class_path=None, entry_method="main", exclude_classes=None,
+                 include_classes=None, include_methods=None):
+        self.tracer = _jdb_process.JdbProcess(
+            class_name,
+            class_path=class_path,
+            entry_method=entry_method,
+            exclude_classes=exclude_classes,
+            include_classes=include_classes,
+            include_methods=include_methods,
+        )
+        self.pty = None
+        self.target = None
+        self.events = None
+        self.port = None
+        self.timeout = 30
+
+        # Settings changed during a session, which are sent to `jdb` before
+        # the next step
+        self._trace_threads_changed = False
+        self._catch_exceptions_changed = False
+
+    @property
+    def active(self) -> bool:
+        """
+        Provides whether the `AsyncJdbProcess` is active. If it is not, it must
+        be reset using the `spawn` method.
+
+        :return: A `Boolean` representing the status of the `AsyncJdbProcess`.
+        """
+
+        return not (self.pty is None or self.pty.returncode is not None or
+                    self.events is None or self.events.eof)
+
+    @property
+    def command_timeout(self) -> _typ.Optional[float]:
+        """
+        See `JdbProcess.command_timeout`.
+
+        :return: The command timeout.
+        """
+
+        return self.tracer.command_timeout
+
+    @command_timeout.setter
+    def command_timeout(self, value: _typ.Optional[float]) -> _typ.NoReturn:
+        self.tracer.command_timeout = value
+        self._apply_command_timeout()
+
+    def _apply_command_timeout(self) -> _typ.NoReturn:
+        if self.events is not None:
+            self.events.timeout = self.command_timeout
+
+    @property
+    def trace_threads(self) -> bool:
+        """
+        See `JdbProcess.trace_threads`; when changed during a session, the
+        setting takes effect at the next step.
+
+        :return: Whether all threads are traced.
+        """
+
+        return self.tracer.trace_threads
+
+    @trace_threads.setter
+    def trace_threads(self, value: bool) -> _typ.NoReturn:
+        self.tracer.trace_threads = value
+        self._trace_threads_changed = self.active
+
+    @property
+    def catch_exceptions(self) -> bool:
+        """
+        See `JdbProcess.catch_exceptions`; when changed during a session, the
+        setting takes effect at the next step.
+
+        :return: Whether caught exceptions are reported.
+        """
+
+        return self.tracer.catch_exceptions
+
+    @catch_exceptions.setter
+    def catch_exceptions(self, value: bool) -> _typ.NoReturn:
+        self.tracer.catch_exceptions = value
+        self._catch_exceptions_changed = self.active
+
+    async def _apply_settings(self) -> _typ.NoReturn:
+        # See `JdbProcess._apply_trace_threads` and `_apply_catch_exceptions`
+        if not self.active:
+            return
+
+        if self._trace_threads_changed:
+            self._trace_threads_changed = False
+
+            if self.tracer.trace_threads:
+                await self._list_threads()
+
+            await self._send_setup_command("untrace methods")
+            await self._send_setup_command(self.tracer._trace_methods_command())
+
+        if self._catch_exceptions_changed:
+            self._catch_exceptions_changed = False
+            await self._send_setup_command(self.tracer._catch_command())
+
+    def add_trace_sink(self, sink: _sinks.TraceSink) -> _sinks.TraceSink:
+        """
+        Registers a sink to which each step record is written; see
+        `JdbProcess.add_trace_sink`.
+
+        :param sink: The sink (for instance, a `JsonLinesTraceSink`).
+        :return: The sink.
+        """
+
+        return self.tracer.add_trace_sink(sink)
+
+    async def _create_subprocess(self, cmd: str) -> _asyncio.subprocess.Process:
+        return await _asyncio.create_subprocess_exec(
+            *_shlex.split(cmd),
+            stdin=_asyncio.subprocess.PIPE,
+            stdout=_asyncio.subprocess.PIPE,
+            stderr=_asyncio.subprocess.STDOUT,
+            cwd=self.cwd,
+        )
+
+    async def _sendline(self, line: str) -> _typ.NoReturn:
+        self.pty.stdin.write("{}\n".format(line).encode("utf-8"))
+        await self.pty.stdin.drain()
+
+    async def close(self):
+        # Flush the sinks
+        self.tracer.close()
+
+        for process in [self.pty, self.target]:
+            if process is not None and process.returncode is None:
+                # noinspection PyBroadException
+                try:
+                    process.kill()
+                    await process.wait()
+                except:
+                    pass
+
+        self.target = None
+
+    async def spawn(
+            self,
+            args: _typ.Optional[str] = None,
+            capture_target=False,
+            port: _typ.Optional[int] = None,
+    ) -> _typ.NoReturn:
+        """
+        Launches `jdb` (and the target, if `capture_target` is set) and stops
+        at the entry method of the class; see `JdbProcess.spawn`.
+
+        :param args: The command-line arguments of the program.
+        :param capture_target: Whether to launch the target separately, so that
+                               its input and output can be accessed.
+        :param port: The port on which the target listens for the debugger, when
+                     `capture_target` is set; by default, a free port is picked
+                     by the JVM.
+        """
+
+        tracer = self.tracer
+
+        with self.stats.timer(_stats.PHASE_SPAWN):
+            # In case we have a live process going: Terminate it
+            await self.close()
+
+            if capture_target:
+                # Pick a port (with port 0, the JVM binds any free port)
+                if port is None:
+                    port = _helpers.JAVA_DEBUG_DEFAULT_PORT
+
+                # Launch the class separately on a port, and wait for it to listen
+                self.target = await self._create_subprocess(tracer._build_java_call(args=args, port=port))
+
+                match = None
+                while match is None:
+                    line = await _asyncio.wait_for(self.target.stdout.readline(), self.timeout)
+                    if len(line) == 0:
+                        raise _exceptions.JdbHostErrorException("The target exited before listening.")
+                    match = _re.search(_helpers.REGEXP_PATT_LISTENING, line.decode("utf-8", "replace"))
+
+                # Retrieve the port that was actually bound
+                self.port = int(match.group(1))
+
+                # Connect JDB
+                self.pty = await self._create_subprocess(tracer._build_jdb_call(port=self.port))
+            else:
+                # Launch the class through JDB
+                self.port = None
+                self.pty = await self._create_subprocess(tracer._build_jdb_call(args=args))
+
+            # Read the output of jdb as a stream of events
+            self.events = _events.AsyncJdbEventStream(self.pty.stdout, timeout=self.timeout, stats=self.stats)
+
+            await self._sendline(
+                "stop in {class_name}.{entry_method}".format(
+                    class_name=self.class_name, entry_method=self.entry_method
+                )
+            )
+
+            event = await self.events.expect_event([_events.EVENT_OUTPUT])
+            while "breakpoint" not in event.text:
+                event = await self.events.expect_event([_events.EVENT_OUTPUT])
+
+            await self._sendline("run")
+            event = await self.events.expect_event([_events.EVENT_BREAKPOINT])
+            await self.events.read_until_prompt()
+
+            # Remember the thread which reached the entry method; its id is
+            # only needed (and listed) when all threads are traced
+            tracer._reset_threads((event.info or {}).get("thread"))
+            if self.trace_threads:
+                await self._list_threads()
+
+            # Activate precise tracing information:
+            # - exclude standard library from events
+            await self._sendline(tracer._build_exclude_command())
+            # - provide information on methods being entered, exited (and return value)
+            await self._sendline(tracer._trace_methods_command())
+            # - stop where caught exceptions are thrown, if requested
+            if self.catch_exceptions:
+                await self._sendline(tracer._catch_command())
+
+            self._trace_threads_changed = False
+            self._catch_exceptions_changed = False
+
+            # Run dummy method to clear
+            await self.locals()
+            tracer._previous_step = None
+            tracer._reset_call_depth()
+            self._apply_command_timeout()
+
+            # Reset trace
+            tracer._reset_trace_history()
+
+    async def target_send_line(self, line):
+        if self.target is not None:
+            data = "{}\n".format(line).encode("utf-8")
+            self.target.stdin.write(data)
+            await self.target.stdin.drain()
+            return len(data)
+
+        else:
+            raise RuntimeWarning(
+                "Attempting to write to JDB process "
+                "but did not spawn it with `capture_target=True`.")
+
+    async def target_send_file(self, file_name):
+        return await self.target_send_line(open(file_name).read())
+
+    # Operations
+
+    async def _run(self, operation: _typ.Generator) -> _typ.Any:
+        # Run an operation of the `tracer`, awaiting its requests (see
+        # `JdbProcess._run`)
+        (result, error) = (None, None)
+
+        try:
+            while True:
+                try:
+                    request = operation.send(result) if error is None else operation.throw(error)
+                except StopIteration as stop:
+                    return stop.value
+
+                (result, error) = await self._perform(request)
+
+        finally:
+            self._apply_command_timeout()
+
+    async def _iterate(self, operation: _typ.Generator) -> _typ.AsyncIterator[_typ.Any]:
+        # Run an operation of the `tracer` which produces records, and yield
+        # them (see `JdbProcess._iterate`)
+        (result, error) = (None, None)
+
+        try:
+            while True:
+                try:
+                    request = operation.send(result) if error is None else operation.throw(error)
+                except StopIteration:
+                    return
+
+                if request[0] is _jdb_process._OPERATION_RECORD:
+                    (result, error) = (None, None)
+                    yield request[1]
+                else:
+                    (result, error) = await self._perform(request)
+
+        finally:
+            operation.close()
+            self._apply_command_timeout()
+
+    async def _perform(self, request: _typ.Tuple) -> _typ.Tuple[_typ.Any, _typ.Optional[Exception]]:
+        # Perform a request of an operation with the coroutine it names
+        (name, *args) = request
+
+        # Operations change the command timeout of the `tracer` (see `iter_steps`)
+        self._apply_command_timeout()
+
+        try:
+            attribute = getattr(self, name)
+            result = attribute(*args) if callable(attribute) else attribute
+            if _inspect.isawaitable(result):
+                result = await result
+            return result, None
+
+        except Exception as e:
+            return None, e
+
+    async def _expect_event(self, kinds: _typ.Iterable[str]) -> _events.JdbEvent:
+        return await self.events.expect_event(kinds)
+
+    # Stepping
+
+    async def _send_step(self, modifier: str) -> _typ.NoReturn:
+        await self._sendline(self.tracer._step_command(modifier))
+
+    async def _expect_step(self) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        # See `JdbProcess._expect_step`
+        with self.stats.timer(_stats.PHASE_STEP):
+            event = await self.events.expect_event(_events.STEP_OUTCOME_EVENTS)
+
+            if event.kind == _events.EVENT_EXITED:
+                raise _exceptions.JdbHostExitedException(event.text)
+
+            # Seek forward to prompt
+            await self.events.expect_event([_events.EVENT_PROMPT])
+
+        return self.tracer._step_event_info(event)
+
+    async def _resume_step(self) -> _typ.NoReturn:
+        # See `JdbProcess._resume_step`
+        await self._sendline("cont")
+
+    async def _expect_locals(
+        self,
+        strict: bool = False,
+    ) -> _typ.Optional[_typ.Tuple[_typ.Dict[str, _typ.Any], _typ.Dict[str, _typ.Any]]]:
+        # See `JdbProcess._expect_locals`
+        skipped = _events.NEUTRAL_EVENTS if strict else None
+
+        with self.stats.timer(_stats.PHASE_LOCALS):
+            event = await self.events.expect_event(_events.LOCALS_OUTCOME_EVENTS, skipped=skipped)
+
+            if event.kind == _events.EVENT_EXITED:
+                raise _exceptions.JdbHostExitedException(event.text)
+
+            # Seek forward to prompt
+            await self.events.expect_event([_events.EVENT_PROMPT], skipped=skipped)
+
+        # Keep the variables, which remain valid until the next step
+        if event.kind == _events.EVENT_NOT_SUSPENDED:
+            self.current_locals = None
+            return None
+
+        self.current_locals = event.info
+        return event.info
+
+    async def step(
+            self,
+            modifier: str = " in",
+            include_locals: bool = False,
+            locals_policy: _typ.Optional[str] = None,
+    ) -> _typ.Dict[str, _typ.Any]:
+        """
+        Makes a step; see `JdbProcess.step`.
+
+        :param modifier: The modifier of the `step` command (e.g. " in", " up").
+        :param include_locals: Whether to record the local variables.
+        :param locals_policy: When to retrieve the local variables.
+        :return: The step record.
+        """
+
+        await self._apply_settings()
+        return await self._run(self.tracer._step_operation(modifier, include_locals, locals_policy))
+
+    async def step_many(
+            self,
+            n: _typ.Optional[int],
+            modifier: str = " in",
+            include_locals: bool = False,
+    ) -> _typ.List[_typ.Dict[str, _typ.Any]]:
+        """
+        Makes up to `n` steps (or steps until the program terminates, if `n`
+        is `None`), retrieving the local variables of each one with the same
+        round trip as the next step; see `JdbProcess.step_many`.
+
+        :param n: The number of steps to make, or `None`.
+        :param modifier: The modifier of the `step` command (e.g. " in", " up").
+        :param include_locals: Whether to record the local variables of each step.
+        :return: The list of step records, in the same format as `step`.
+        """
+
+        await self._apply_settings()
+        return await self._run(self.tracer._step_many_operation(n, modifier, include_locals))
+
+    async def run_steps(
+            self,
+            modifier: str = " in",
+            include_locals: bool = False,
+    ) -> _typ.List[_typ.Dict[str, _typ.Any]]:
+        """
+        Makes steps until the program terminates; see `JdbProcess.run_steps`.
+
+        :param modifier: The modifier of the `step` command (e.g. " in", " up").
+        :param include_locals: Whether to record the local variables of each step.
+        :return: The list of step records, in the same format as `step`.
+        """
+
+        return await self.step_many(None, modifier=modifier, include_locals=include_locals)
+
+    async def iter_steps(
+            self,
+            modifier: str = " in",
+            include_locals: bool = False,
+            until: _typ.Optional[_typ.Callable[[_typ.Dict[str, _typ.Any]], bool]] = None,
+            locals_policy: _typ.Optional[str] = None,
+            max_steps: _typ.Optional[int] = None,
+            max_wall_time: _typ.Optional[float] = None,
+    ) -> _typ.AsyncIterator[_typ.Dict[str, _typ.Any]]:
+        """
+        Makes steps lazily, yielding each step record (to be consumed with
+        `async for`); see `JdbProcess.iter_steps`.
+
+        :param modifier: The modifier of the `step` command (e.g. " in", " up").
+        :param include_locals: Whether to record the local variables of each step.
+        :param until: An optional predicate on step records; iteration stops
+                      after the first record for which it returns `True`.
+        :param locals_policy: When to retrieve the local variables (see `step`).
+        :param max_steps: The maximum number of steps to make.
+        :param max_wall_time: The maximum number of seconds spent stepping.
+        :return: An asynchronous iterator of step records.
+        """
+
+        operation = self.tracer._iter_steps_operation(
+            modifier, include_locals, until, locals_policy, max_steps, max_wall_time)
+
+        async for info in self._iterate(operation):
+            yield info
+
+    # Commands
+
+    async def _send_setup_command(self, command: str) -> _typ.List[str]:
+        # See `JdbProcess._send_setup_command`
+        await self._sendline(command)
+        return self.tracer._setup_output(command, await self.events.read_until_prompt())
+
+    async def where(self) -> _typ.Optional[_typ.List[_typ.Dict[str, _typ.Any]]]:
+        """
+        Lists the frames of the thread in which the program is suspended; see
+        `JdbProcess.where`.
+
+        :return: The frames, innermost first.
+        """
+
+        if not self.active:
+            return None
+
+        return _helpers.parse_jdb_where("\n".join(await self._send_setup_command("where")))
+
+    async def threads(self) -> _typ.Optional[_typ.List[_typ.Dict[str, _typ.Any]]]:
+        """
+        Lists the threads of the program; see `JdbProcess.threads`.
+
+        :return: A list of dictionaries describing each thread.
+        """
+
+        if not self.active:
+            return None
+
+        return _helpers.parse_jdb_threads("\n".join(await self._send_setup_command("threads")))
+
+    async def select_thread(self, thread: _typ.Any) -> _typ.NoReturn:
+        """
+        Makes a thread the current thread; see `JdbProcess.select_thread`.
+
+        :param thread: The id of the thread, as listed by `threads`.
+        """
+
+        await self._send_setup_command("thread {}".format(thread))
+
+    async def suspend_thread(self, thread: _typ.Any) -> _typ.NoReturn:
+        """
+        Suspends a thread; see `JdbProcess.suspend_thread`.
+
+        :param thread: The id of the thread, as listed by `threads`.
+        """
+
+        await self._send_setup_command("suspend {}".format(thread))
+
+    async def resume_thread(self, thread: _typ.Any) -> _typ.NoReturn:
+        """
+        Resumes a thread; see `JdbProcess.resume_thread`.
+
+        :param thread: The id of the thread, as listed by `threads`.
+        """
+
+        await self._send_setup_command("resume {}".format(thread))
+
+    async def _list_threads(self) -> _typ.List[_typ.Dict[str, _typ.Any]]:
+        # See `JdbProcess._list_threads`
+        return await self._run(self.tracer._list_threads_operation())
+
+    async def _live_threads(self) -> _typ.List[_typ.Any]:
+        # See `JdbProcess._live_threads`
+        return await self._run(self.tracer._live_threads_operation())
+
+    async def _select_next_thread(self) -> _typ.NoReturn:
+        # See `JdbProcess._select_next_thread`
+        await self._run(self.tracer._select_next_thread_operation())
+
+    async def add_breakpoint(self, location: str) -> _typ.NoReturn:
+        """
+        Sets a breakpoint; see `JdbProcess.add_breakpoint`.
+
+        :param location: The location of the breakpoint.
+        """
+
+        if not self.active:
+            return
+
+        if ":" in location:
+            await self._send_setup_command("stop at {}".format(location))
+        else:
+            await self._send_setup_command("stop in {}".format(location))
+
+    async def add_watch(self, field: str, access: bool = False) -> _typ.NoReturn:
+        """
+        Sets a watchpoint on a field; see `JdbProcess.add_watch`.
+
+        :param field: The fully qualified name of the field.
+        :param access: Whether to also stop when the field is read.
+        """
+
+        if not self.active:
+            return
+
+        await self._send_setup_command("watch {}{}".format("all " if access else "", field))
+
+    async def iter_samples(
+            self,
+            breakpoints: _typ.Iterable[str] = (),
+            watches: _typ.Iterable[str] = (),
+            include_locals: bool = True,
+            until: _typ.Optional[_typ.Callable[[_typ.Dict[str, _typ.Any]], bool]] = None,
+    ) -> _typ.AsyncIterator[_typ.Dict[str, _typ.Any]]:
+        """
+        Lets the program run freely between breakpoints and watchpoints, and
+        yields a record for each hit (to be consumed with `async for`); see
+        `JdbProcess.iter_samples`.
+
+        :param breakpoints: The breakpoints to set (see `add_breakpoint`).
+        :param watches: The fields to watch for modifications (see `add_watch`).
+        :param include_locals: Whether to record the local variables of each hit.
+        :param until: An optional predicate on records; iteration stops after
+                      the first record for which it returns `True`.
+        :return: An asynchronous iterator of records, one per hit.
+        """
+
+        await self._apply_settings()
+
+        operation = self.tracer._iter_samples_operation(breakpoints, watches, include_locals, until)
+
+        async for info in self._iterate(operation):
+            yield info
+
+    async def trace_calls(self, include_arguments: bool = True) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        """
+        Lets the program run until it terminates, only tracing method entries
+        and exits, and builds the tree of calls; see `JdbProcess.trace_calls`.
+
+        :param include_arguments: Whether to retrieve the arguments of each call.
+        :return: The root of the call tree.
+        """
+
+        await self._apply_settings()
+        return await self._run(self.tracer._trace_calls_operation(include_arguments))
+
+    # Values
+
+    async def locals(
+        self
+    ) -> _typ.Optional[_typ.Tuple[_typ.Dict[str, _typ.Any], _typ.Dict[str, _typ.Any]]]:
+        """
+        Retrieves the method arguments and local variables; see
+        `JdbProcess.locals`.
+
+        :return: A tuple of the arguments and local variables.
+        """
+
+        if not self.active:
+            return None
+
+        # Print out all local variables
+        await self._sendline("locals")
+
+        return await self._expect_locals()
+
+    async def print_values(self, names: _typ.Iterable[str]) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        """
+        Retrieves the value of some variables only; see
+        `JdbProcess.print_values`.
+
+        :param names: The names of the variables.
+        :return: A dictionary of the values of the variables that were found.
+        """
+
+        if not self.active:
+            return None
+
+        names = list(names)
+
+        for name in names:
+            await self._sendline("print {}".format(name))
+
+        events = []
+        for _ in names:
+            events += await self.events.read_until_prompt()
+
+        return self.tracer._parse_print_events(names, events)
+
+    async def dump(self, obj: str) -> _typ.Any:
+        """
+        Dumps the value of an expression; see `JdbProcess.dump`.
+
+        :param obj: The expression to dump.
+        :return: The parsed value, or `None` if it could not be dumped.
+        """
+
+        if not self.active:
+            return None
+
+        # Send command
+        await self._sendline("dump {}".format(obj))
+
+        # Collect output until the next prompt
+        with self.stats.timer(_stats.PHASE_DUMP):
+            return self.tracer._parse_dump_events(obj, await self.events.read_until_prompt())
+
+    async def dump_many(self, objs: _typ.Iterable[str]) -> _typ.Optional[_typ.List[_typ.Any]]:
+        """
+        Dumps the values of several expressions; see `JdbProcess.dump_many`.
+
+        :param objs: The expressions to dump.
+        :return: The list of parsed values, in the same order.
+        """
+
+        if not self.active:
+            return None
+
+        objs = list(objs)
+
+        for obj in objs:
+            await self._sendline("dump {}".format(obj))
+
+        with self.stats.timer(_stats.PHASE_DUMP):
+            return [self.tracer._parse_dump_events(obj, await self.events.read_until_prompt()) for obj in objs]
+
+    async def resolve_objects(
+            self,
+            values: _typ.Mapping[str, _typ.Any],
+            depth: _typ.Optional[int] = None,
+    ) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        """
+        Resolves the objects referenced by some variables; see
+        `JdbProcess.resolve_objects`.
+
+        :param values: The variables, by name.
+        :param depth: The maximum number of references followed.
+        :return: A copy of `values`, in which references are resolved.
+        """
+
+        return await self._run(self.tracer._resolve_objects_operation(values, depth))
+
+    async def snapshot_locals(
+            self,
+            depth: _typ.Optional[int] = None,
+    ) -> _typ.Optional[_typ.Tuple[_typ.Dict[str, _typ.Any], _typ.Dict[str, _typ.Any]]]:
+        """
+        Retrieves the method arguments and local variables, and resolves the
+        objects they reference; see `JdbProcess.snapshot_locals`.
+
+        :param depth: The maximum number of references followed.
+        :return: A tuple of the arguments and local variables.
+        """
+
+        return await self._run(self.tracer._snapshot_locals_operation(depth))
@@ -0,0 +1,510 @@
+import asyncio as _asyncio
+import codecs as _codecs
+import collections as _collections
+import time as _time
+import typing as _typ
+
+import pexpect as _pexpect
+
+from pyjdb.core import helpers as _helpers, exceptions as _exceptions
+from pyjdb.core import stats as _stats
+
+
+# Kinds of events that are recognized in the output of `jdb`
+
+EVENT_STEP = "step"
+EVENT_METHOD_ENTERED = "method_entered"
+EVENT_METHOD_EXITED = "method_exited"
+EVENT_BREAKPOINT = "breakpoint"
+EVENT_WATCH = "watch"
+EVENT_EXCEPTION = "exception"
+EVENT_LOCALS = "locals"
+EVENT_PROMPT = "prompt"
+EVENT_NOT_SUSPENDED = "not_suspended"
+EVENT_EXITED = "exited"
+EVENT_OUTPUT = "output"
+
+# Events that report the location at which a thread was suspended
+
+LOCATION_EVENTS = (
+    EVENT_STEP,
+    EVENT_METHOD_ENTERED,
+    EVENT_METHOD_EXITED,
+    EVENT_BREAKPOINT,
+    EVENT_WATCH,
+)
+
+# Events that may answer the `step` and `locals` commands
+
+STEP_OUTCOME_EVENTS = LOCATION_EVENTS + (
+    EVENT_EXCEPTION,
+    EVENT_NOT_SUSPENDED,
+    EVENT_EXITED,
+)
+
+LOCALS_OUTCOME_EVENTS = (
+    EVENT_LOCALS,
+    EVENT_NOT_SUSPENDED,
+    EVENT_EXITED,
+)
+
+# Events which may precede the outcome of a command without being lost (the
+# echo of commands, output of the program, and prompts)
+
+NEUTRAL_EVENTS = (
+    EVENT_OUTPUT,
+    EVENT_PROMPT,
+)
+
+# Line prefixes that start a block of output (which ends with the next prompt)
+
+LOCATION_HEADERS = (
+    "Step completed:",
+    "Method entered:",
+    "Method exited:",
+    "Breakpoint hit:",
+    "Exception occurred:",
+    "Field (",
+)
+
+LOCALS_HEADERS = (
+    "Method arguments:",
+    "Local variables:",
+    "No local variables",
+    "Local variable information not available",
+)
+
+NOT_SUSPENDED_MESSAGES = (
+    "Nothing suspended.",
+    "Current thread isn't suspended.",
+)
+
+EXITED_MESSAGES = (
+    "The application exited",
+    "The application has been disconnected",
+)
+
+
+JdbEvent = _collections.namedtuple("JdbEvent", ["kind", "text", "info"])
+JdbEvent.__doc__ = """
+An event recognized in the output of `jdb`: its `kind` (one of the `EVENT_*`
+constants), the raw `text` it was parsed from, and the parsed `info` (a step
+record for location events, a tuple of arguments and local variables for
+`locals`, the thread and frame for prompts).
+"""
+
+
+class JdbEventTokenizer(object):
+    """
+    Incremental state machine that turns the raw output of `jdb`, fed in
+    chunks of arbitrary size, into a sequence of `JdbEvent`. Each character
+    is only scanned once, however large the output of a command is.
+    """
+
+    def __init__(self, stats: _typ.Optional[_stats.JdbStats] = None):
+        self.stats = stats
+        self._buffer = ""
+        self._block_kind = None
+        self._block_lines = []
+        self._block_located = False
+
+    def feed(self, data: str) -> _typ.List[JdbEvent]:
+        """
+        Consumes a chunk of output from `jdb`.
+
+        :param data: The chunk of output, as read from the PTY.
+        :return: The list of events completed by this chunk.
+        """
+
+        events = []
+
+        # Only process complete lines, the last (partial) line is buffered
+        lines = (self._buffer + data).split("\n")
+        self._buffer = lines.pop()
+
+        for line in lines:
+            self._feed_line(line.rstrip("\r"), events)
+
+        # A prompt is not followed by a line break, so check the partial line
+        match = _helpers.REGEXP_PROMPT.fullmatch(self._buffer)
+        if match is not None:
+            self._buffer = ""
+            self._feed_prompt(match, events)
+
+        if self.stats is not None:
+            self.stats.events += len(events)
+
+        return events
+
+    def close(self) -> _typ.List[JdbEvent]:
+        """
+        Flushes any pending output, once the PTY has been closed.
+
+        :return: The list of events completed by the end of the output.
+        """
+
+        events = []
+
+        if self._buffer != "":
+            self._feed_line(self._buffer, events)
+            self._buffer = ""
+
+        self._flush_block(events)
+
+        if self.stats is not None:
+            self.stats.events += len(events)
+
+        return events
+
+    def _feed_prompt(self, match, events: _typ.List[JdbEvent]) -> _typ.NoReturn:
+        self._flush_block(events)
+
+        info = None
+        if match.group(2) is not None:
+            info = {"thread": match.group(2), "frame": int(match.group(3))}
+
+        events.append(JdbEvent(EVENT_PROMPT, match.group(0), info))
+
+    def _feed_line(self, line: str, events: _typ.List[JdbEvent]) -> _typ.NoReturn:
+
+        # Prompts that were followed by further output (such as the echo of
+        # the next command, or an event)
+        match = _helpers.REGEXP_PROMPT.match(line)
+        while match is not None:
+            self._feed_prompt(match, events)
+            line = line[match.end():]
+            match = _helpers.REGEXP_PROMPT.match(line)
+
+        stripped = line.strip()
+
+        if stripped == "":
+            return
+
+        # Events with a location: the "Method entered:" and "Step completed:"
+        # headers may follow each other within the same block
+        if stripped.startswith(LOCATION_HEADERS):
+            # A block reports a single location: when events are not followed
+            # by a prompt (as with `trace go methods`), start a new block
+            if self._block_kind != "location" or self._block_located:
+                self._flush_block(events)
+                self._block_kind = "location"
+            self._block_lines.append(line)
+            self._block_located = "\"thread=" in line
+            return
+
+        if stripped.startswith(LOCALS_HEADERS):
+            if self._block_kind != "locals":
+                self._flush_block(events)
+                self._block_kind = "locals"
+            self._block_lines.append(line)
+            return
+
+        if stripped.startswith(NOT_SUSPENDED_MESSAGES):
+            self._flush_block(events)
+            events.append(JdbEvent(EVENT_NOT_SUSPENDED, line, None))
+            return
+
+        if stripped.startswith(EXITED_MESSAGES):
+            self._flush_block(events)
+            events.append(JdbEvent(EVENT_EXITED, line, None))
+            return
+
+        if self._block_kind is not None:
+            self._block_lines.append(line)
+            return
+
+        events.append(JdbEvent(EVENT_OUTPUT, line, None))
+
+    def _flush_block(self, events: _typ.List[JdbEvent]) -> _typ.NoReturn:
+        if self._block_kind is None:
+            return
+
+        if self.stats is None:
+            self._parse_block(events)
+        else:
+            with self.stats.timer(_stats.PHASE_PARSE):
+                self._parse_block(events)
+
+        self._block_kind = None
+        self._block_lines = []
+        self._block_located = False
+
+    def _parse_block(self, events: _typ.List[JdbEvent]) -> _typ.NoReturn:
+        # Rebuild the text as it was printed by jdb, which is what the
+        # parsing helpers expect
+        text = "\r\n" + "\r\n".join(self._block_lines) + "\r\n"
+
+        if self._block_kind == "locals":
+            events.append(JdbEvent(EVENT_LOCALS, text, _helpers.parse_jdb_locals(text)))
+
+        elif "Exception occurred:" in text:
+            events.append(JdbEvent(EVENT_EXCEPTION, text, _helpers.parse_jdb_exception(text)))
+
+        else:
+            if "Method entered" in text:
+                kind = EVENT_METHOD_ENTERED
+            elif "Method exited" in text:
+                kind = EVENT_METHOD_EXITED
+            elif "Breakpoint hit" in text:
+                kind = EVENT_BREAKPOINT
+            elif text.lstrip().startswith("Field ("):
+                kind = EVENT_WATCH
+            else:
+                kind = EVENT_STEP
+
+            info = _helpers.parse_jdb_step(text)
+            if kind == EVENT_WATCH and info is not None:
+                info["watch"] = _helpers.parse_jdb_watch(text)
+
+            events.append(JdbEvent(kind, text, info))
+
+
+class JdbEventStream(object):
+    """
+    Reads the output of a `jdb` process in large chunks, and provides the
+    events recognized by a `JdbEventTokenizer`, one at a time.
+    """
+
+    def __init__(
+            self,
+            pty: _pexpect.spawn,
+            chunk_size: _typ.Optional[int] = None,
+            stats: _typ.Optional[_stats.JdbStats] = None,
+    ):
+        self.pty = pty
+        self.chunk_size = chunk_size if chunk_size is not None else _helpers.JDB_READ_CHUNK_SIZE
+        self.stats = stats
+        self.tokenizer = JdbEventTokenizer(stats=stats)
+        self.pending = _collections.deque()
+        self.eof = False
+
+        # Take over any output that may have been buffered by `expect` calls
+        if pty.buffer:
+            self.pending.extend(self.tokenizer.feed(pty.buffer))
+            pty.buffer = pty.string_type()
+
+    def _read(self, timeout: _typ.Optional[float]) -> _typ.NoReturn:
+        if self.stats is None:
+            self._read_chunk(timeout)
+        else:
+            with self.stats.timer(_stats.PHASE_READ):
+                self._read_chunk(timeout)
+
+    def _read_chunk(self, timeout: _typ.Optional[float]) -> _typ.NoReturn:
+        try:
+            data = self.pty.read_nonblocking(size=self.chunk_size, timeout=timeout)
+
+        except _pexpect.EOF:
+            self.eof = True
+            self.pending.extend(self.tokenizer.close())
+            self.pending.append(JdbEvent(EVENT_EXITED, "", None))
+            return
+
+        except _pexpect.TIMEOUT as e:
+            e.__class__ = _exceptions.JdbTimeoutException
+            raise e
+
+        if self.stats is not None:
+            self.stats.record_read(len(data))
+
+        self.pending.extend(self.tokenizer.feed(data))
+
+    def next_event(self, timeout: _typ.Optional[float] = -1) -> JdbEvent:
+        """
+        Returns the next event, reading from `jdb` if necessary.
+
+        :param timeout: The number of seconds to wait for the event (by default,
+                        the timeout of the PTY; `None` to wait indefinitely).
+        :return: The next event.
+        """
+
+        if timeout == -1:
+            timeout = self.pty.timeout
+
+        deadline = None if timeout is None else _time.monotonic() + timeout
+
+        while len(self.pending) == 0:
+            if self.eof:
+                raise _exceptions.JdbHostExitedException("The jdb process has exited.")
+
+            remaining = None if deadline is None else max(0, deadline - _time.monotonic())
+            self._read(remaining)
+
+        return self.pending.popleft()
+
+    def expect_event(
+            self,
+            kinds: _typ.Iterable[str],
+            timeout: _typ.Optional[float] = -1,
+            skipped: _typ.Optional[_typ.Iterable[str]] = None,
+    ) -> JdbEvent:
+        """
+        Skips events until one of the requested kinds is found.
+
+        :param kinds: The kinds of events that are expected.
+        :param timeout: The number of seconds to wait for each event.
+        :param skipped: The kinds of events which may be skipped (by default,
+                        any); other events raise a `JdbHostErrorException`,
+                        rather than being lost.
+        :return: The first event of one of the requested kinds.
+        """
+
+        kinds = tuple(kinds)
+        skipped = None if skipped is None else tuple(skipped)
+
+        if self.stats is not None:
+            self.stats.expects += 1
+
+        while True:
+            event = self.next_event(timeout=timeout)
+            if event.kind in kinds:
+                return event
+
+            if skipped is not None and event.kind not in skipped:
+                raise _exceptions.JdbHostErrorException(
+                    "Unexpected output from jdb: '{}'".format(event.text.strip()))
+
+    def read_until_prompt(self, timeout: _typ.Optional[float] = -1) -> _typ.List[JdbEvent]:
+        """
+        Collects all the events that precede the next prompt (which is
+        consumed, but not returned).
+
+        :param timeout: The number of seconds to wait for each event.
+        :return: The events that were read before the prompt.
+        """
+
+        if self.stats is not None:
+            self.stats.expects += 1
+
+        events = []
+
+        while True:
+            event = self.next_event(timeout=timeout)
+            if event.kind == EVENT_PROMPT:
+                return events
+            events.append(event)
+
+
+class AsyncJdbEventStream(object):
+    """
+    Reads the output of a `jdb` process from an `asyncio.StreamReader`, and
+    provides the events recognized by a `JdbEventTokenizer`, one at a time;
+    this is the `asyncio` counterpart of `JdbEventStream`.
+    """
+
+    def __init__(
+            self,
+            reader: _asyncio.StreamReader,
+            chunk_size: _typ.Optional[int] = None,
+            timeout: _typ.Optional[float] = 30,
+            stats: _typ.Optional[_stats.JdbStats] = None,
+    ):
+        self.reader = reader
+        self.chunk_size = chunk_size if chunk_size is not None else _helpers.JDB_READ_CHUNK_SIZE
+        self.timeout = timeout
+        self.stats = stats
+        self.tokenizer = JdbEventTokenizer(stats=stats)
+        self.decoder = _codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.pending = _collections.deque()
+        self.eof = False
+
+    async def _read(self, timeout: _typ.Optional[float]) -> _typ.NoReturn:
+        if self.stats is None:
+            await self._read_chunk(timeout)
+        else:
+            with self.stats.timer(_stats.PHASE_READ):
+                await self._read_chunk(timeout)
+
+    async def _read_chunk(self, timeout: _typ.Optional[float]) -> _typ.NoReturn:
+        try:
+            data = await _asyncio.wait_for(self.reader.read(self.chunk_size), timeout)
+
+        except _asyncio.TimeoutError:
+            raise _exceptions.JdbTimeoutException("Timeout exceeded while waiting for jdb.")
+
+        if len(data) == 0:
+            self.eof = True
+            self.pending.extend(self.tokenizer.feed(self.decoder.decode(b"", final=True)))
+            self.pending.extend(self.tokenizer.close())
+            self.pending.append(JdbEvent(EVENT_EXITED, "", None))
+            return
+
+        if self.stats is not None:
+            self.stats.record_read(len(data))
+
+        self.pending.extend(self.tokenizer.feed(self.decoder.decode(data)))
+
+    async def next_event(self, timeout: _typ.Optional[float] = -1) -> JdbEvent:
+        """
+        Returns the next event, reading from `jdb` if necessary.
+
+        :param timeout: The number of seconds to wait for the event (by default,
+                        the timeout of the stream; `None` to wait indefinitely).
+        :return: The next event.
+        """
+
+        if timeout == -1:
+            timeout = self.timeout
+
+        deadline = None if timeout is None else _time.monotonic() + timeout
+
+        while len(self.pending) == 0:
+            if self.eof:
+                raise _exceptions.JdbHostExitedException("The jdb process has exited.")
+
+            remaining = None if deadline is None else max(0, deadline - _time.monotonic())
+            await self._read(remaining)
+
+        return self.pending.popleft()
+
+    async def expect_event(
+            self,
+            kinds: _typ.Iterable[str],
+            timeout: _typ.Optional[float] = -1,
+            skipped: _typ.Optional[_typ.Iterable[str]] = None,
+    ) -> JdbEvent:
+        """
+        Skips events until one of the requested kinds is found.
+
+        :param kinds: The kinds of events that are expected.
+        :param timeout: The number of seconds to wait for each event.
+        :param skipped: The kinds of events which may be skipped (by default,
+                        any); other events raise a `JdbHostErrorException`,
+                        rather than being lost.
+        :return: The first event of one of the requested kinds.
+        """
+
+        kinds = tuple(kinds)
+        skipped = None if skipped is None else tuple(skipped)
+
+        if self.stats is not None:
+            self.stats.expects += 1
+
+        while True:
+            event = await self.next_event(timeout=timeout)
+            if event.kind in kinds:
+                return event
+
+            if skipped is not None and event.kind not in skipped:
+                raise _exceptions.JdbHostErrorException(
+                    "Unexpected output from jdb: '{}'".format(event.text.strip()))
+
+    async def read_until_prompt(self, timeout: _typ.Optional[float] = -1) -> _typ.List[JdbEvent]:
+        """
+        Collects all the events that precede the next prompt (which is
+        consumed, but not returned).
+
+        :param timeout: The number of seconds to wait for each event.
+        :return: The events that were read before the prompt.
+        """
+
+        if self.stats is not None:
+            self.stats.expects += 1
+
+        events = []
+
+        while True:
+            event = await self.next_event(timeout=timeout)
+            if event.kind == EVENT_PROMPT:
+                return events
+            events.append(event)
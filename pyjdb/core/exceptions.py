@@ -21,3 +21,32 @@ class JdbHostErrorException(EOF):
 
 class JdbException(TIMEOUT):
     pass
+
+
+class JdbUncaughtException(JdbHostErrorException):
+    """
+    Raised when a step stops at an exception which the program does not
+    catch; the step record describing it (see `JdbProcess.step`) is `info`.
+    """
+
+    def __init__(self, info):
+        super().__init__("Exception occurred: {} (uncaught)".format(info["exception"]["class"]))
+        self.info = info
+
+
+class JdbTimeoutException(JdbException):
+    """
+    Raised when `jdb` (or the VM) does not complete a command within the
+    command timeout of the session.
+    """
+
+
+class JdwpErrorException(JdbException):
+    """
+    Raised when the VM replies to a JDWP command with an error code.
+    """
+
+    def __init__(self, command, error):
+        super().__init__("JDWP command {} failed with error {}.".format(command, error))
+        self.command = command
+        self.error = error
@@ -1,3 +1,4 @@
+import itertools as _itertools
 import re as _re
 import subprocess as _subprocess
 import typing as _typ
@@ -8,6 +9,58 @@ JDB_VERSION_FLAG = "-version"
 
 JDB_DEFAULT_EXCLUDED = ["java.*","javax.*","sun.*","com.sun.*","jdk.*"]
 
+# Messages with which jdb rejects commands such as `stop` or `watch`
+JDB_SETUP_ERRORS = ("Unable to set", "Usage:", "Invalid", "Not a valid", "No such")
+
+# When to retrieve the local variables after a step (see `JdbProcess.step`):
+# after every step, only when a method is entered (to record its arguments),
+# only when they may have changed since the last time they were retrieved, or
+# never
+LOCALS_POLICY_ALWAYS = "always"
+LOCALS_POLICY_ENTRY = "entry"
+LOCALS_POLICY_CHANGES = "changes"
+LOCALS_POLICY_NEVER = "never"
+
+# How to skip the methods which are not traced (see `JdbProcess.step`): leave
+# them with `step up` (so that the methods they call are not traced either),
+# or step over their lines with `next` (so that traced methods which they
+# call are still found)
+SKIP_POLICY_UP = "up"
+SKIP_POLICY_NEXT = "next"
+
+# Why `JdbProcess.iter_steps` stopped before the program terminated: the
+# maximum number of steps, or the maximum wall time, was reached, or a single
+# command exceeded the command timeout
+TRUNCATED_MAX_STEPS = "max_steps"
+TRUNCATED_MAX_WALL_TIME = "max_wall_time"
+TRUNCATED_TIMEOUT = "timeout"
+
+# Threads which are not part of the program, and are never traced: those of
+# the system groups, and the thread which waits for the program to end
+JDB_SYSTEM_THREAD_GROUPS = ("system", "InnocuousThreadGroup")
+JDB_SYSTEM_THREADS = ("DestroyJavaVM",)
+
+# Statuses of threads which are not running code
+JDB_INACTIVE_THREAD_STATUSES = ("zombie", "not started")
+
+# The modifier of `JdbProcess.step` which steps over calls (as `next`)
+JDB_STEP_OVER = " over"
+
+# The class of the exceptions reported when `JdbProcess.catch_exceptions` is
+# set (as `catch caught`)
+JDB_CAUGHT_EXCEPTIONS_CLASS = "java.lang.Throwable"
+
+# The maximum number of characters read from `jdb` at once, which are then
+# split into events (see `events.JdbEventStream`)
+JDB_READ_CHUNK_SIZE = 65536
+
+# The maximum number of seconds to wait, when closing a session, for the
+# thread which reads the output of the target to end
+JDB_TARGET_READER_JOIN_TIMEOUT = 5
+
+# With address=0, the JVM picks a free port, which it then reports when it
+# starts listening
+JAVA_DEBUG_DEFAULT_PORT = 0
 JAVA_DEBUG_CMD = "java -Xdebug -Xrunjdwp:transport=dt_socket,address={port},server=y,suspend=y"
 
 REGEXP_PATT_VERSION = r"^[0-9]+(\.[0-9]+(\.[0-9]+)?)?$"
@@ -20,7 +73,7 @@ REGEXP_PATT_STEP_EXPECT = (r"(Exception occurred:|((Step completed:|Method enter
                            r"Step completed:|Method entered: )"
                            r"|Method exited: [^,]+, ))[^\r\n]+\r\n([^\r\n]+\r\n)*")
 
-REGEXP_PATT_STEP_COMPLETED = (r"(Step completed:|Method entered:|"
+REGEXP_PATT_STEP_COMPLETED = (r"(Step completed:|Method entered:|Breakpoint hit:|Field \([^)]+\)[^\"\r\n]*:|"
                               r"Method exited: return value = ([^,]+),) "
                               r"\"thread=([^\"]*)\", "
                               r"([^.]+(\.[^.]+)+\(\)), "
@@ -28,11 +81,82 @@ REGEXP_PATT_STEP_COMPLETED = (r"(Step completed:|Method entered:|"
 
 REGEXP_PATT_LINE_LISTING = r"\n([0-9]+)\s+([^\r\n]+)\r\n"
 
+# Watchpoints, for instance "Field (Node.value) is 0, will be 3: " or
+# "Field (Node.value) access encountered: ", followed by the location
+REGEXP_PATT_WATCH = r"Field \(([^)]+)\) (?:is (.*?), will be (.*?)|access encountered): \""
+
+# Printed by the target JVM once it accepts debugger connections, for instance
+# "Listening for transport dt_socket at address: 8899" (or "*:8899")
+REGEXP_PATT_LISTENING = r"Listening for transport [^ ]+ at address: (?:[^\s:]*:)?([0-9]+)"
+
+# Prompts printed by jdb once it is ready for a new command: "> " while the
+# VM is running (or not yet started), "thread[frame] " while a thread is
+# suspended
+
+REGEXP_PATT_PROMPT = r"(> |([^\s\[\]>]+)\[([0-9]+)\] )"
+
+# Source lines which may assign local variables: assignments (but not
+# comparisons), increments and decrements, and the headers of `for` loops and
+# `catch` clauses (which may bind a variable without an '=' sign)
+REGEXP_PATT_ASSIGNMENT = r"(?<![=!<>])=(?!=)|\+\+|--|\bfor\b|\bcatch\b"
+
+# Items of jdb arrays: quoted strings and characters (in which a backslash-
+# escaped quote does not end the item), and bare values such as "1.5", "null"
+# or "instance of Node(id=501)"; nested arrays are tokenized with their braces
+REGEXP_PATT_VALUE_ITEM = (r"\"[^\"\\]*(?:\\.[^\"\\]*)*\"|'[^'\\]*(?:\\.[^'\\]*)*'|"
+                          r"[^\s,{}](?:[^,{}]*[^\s,{}])?")
+REGEXP_PATT_VALUE_TOKEN = r"(\{)|(\})|(" + REGEXP_PATT_VALUE_ITEM + ")"
+
+# References to objects, for instance "instance of Node(id=501)" or
+# "instance of int[3] (id=12)"
+REGEXP_PATT_REFERENCE = r"instance of ([^\s(]+) ?\(id=([0-9]+)\)"
+
+# Exceptions, for instance "Exception occurred: java.lang.ArithmeticException
+# (uncaught)" or "... (to be caught at: Foo.main(), line=10 bci=20)", followed
+# by the location at which they were thrown
+REGEXP_PATT_EXCEPTION = (r"Exception occurred: (\S+) \((?:uncaught|to be caught at: ([^\s(),]+\(\)), "
+                         r"line=(-?[0-9]+) bci=([0-9]+))\)")
+REGEXP_PATT_LOCATION = r"\"thread=([^\"]*)\", ([^\s(),]+\(\)), line=(-?[0-9]+) bci=([0-9]+)"
+
+# Frames listed by the `where` command, innermost first, for instance
+# "  [1] Foo.bar (Foo.java:5)" or "  [2] java.lang.Thread.run (native method)"
+REGEXP_PATT_WHERE = r"^\s*\[([0-9]+)\] (\S+)\.([^\s.]+) \(([^:)]+)(?::([0-9]+))?\)"
+
+# Listing of threads (by the `threads` command), for instance "Group main:"
+# followed by "  (java.lang.Thread)0x1 main   running (at breakpoint)"
+REGEXP_PATT_THREAD_GROUP = r"^\s*Group (.+):\s*$"
+REGEXP_PATT_THREAD = (r"^\s*\(([^)]+)\)(\S+)\s+(.*?)\s+(running|sleeping|unknown|zombie|not started|"
+                      r"waiting in a monitor|cond\. waiting)( \(at breakpoint\))?\s*$")
+
 # Compiled regular expressions
 
 REGEXP_CSV = _re.compile(REGEXP_PATT_CSV)
 REGEXP_STEP_COMPLETED = _re.compile(REGEXP_PATT_STEP_COMPLETED)
 REGEXP_LINE_LISTING = _re.compile(REGEXP_PATT_LINE_LISTING)
+REGEXP_PROMPT = _re.compile(REGEXP_PATT_PROMPT)
+REGEXP_WATCH = _re.compile(REGEXP_PATT_WATCH)
+REGEXP_ASSIGNMENT = _re.compile(REGEXP_PATT_ASSIGNMENT)
+REGEXP_VALUE_ITEM = _re.compile(REGEXP_PATT_VALUE_ITEM)
+REGEXP_REFERENCE = _re.compile(REGEXP_PATT_REFERENCE)
+REGEXP_VALUE_TOKEN = _re.compile(REGEXP_PATT_VALUE_TOKEN)
+REGEXP_EXCEPTION = _re.compile(REGEXP_PATT_EXCEPTION)
+REGEXP_LOCATION = _re.compile(REGEXP_PATT_LOCATION)
+REGEXP_WHERE = _re.compile(REGEXP_PATT_WHERE, _re.MULTILINE)
+REGEXP_THREAD_GROUP = _re.compile(REGEXP_PATT_THREAD_GROUP)
+REGEXP_THREAD = _re.compile(REGEXP_PATT_THREAD)
+
+# Values which jdb prints as keywords
+JDB_VALUE_CONSTANTS = {
+    "null": None,
+    "true": True,
+    "false": False,
+    "<void value>": None,
+    "NaN": float("nan"),
+    "Infinity": float("inf"),
+}
+
+# The characters with which a number may start
+JDB_NUMBER_START = frozenset("0123456789+-.")
 
 
 def make_matcher(regexp: str) -> _typ.Callable[[str], bool]:
@@ -109,11 +233,82 @@ def parse_jdb_version() -> _typ.Optional[str]:
     return version
 
 
+def _parse_jdb_scalar(value: str) -> _typ.Any:
+    # Parse a value which is not an array, dispatching on its first character
+    if value == "":
+        return value
+
+    first = value[0]
+
+    # Numbers (integers being the most frequent)
+    if first in JDB_NUMBER_START:
+        try:
+            return int(value)
+        except ValueError:
+            pass
+
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+    # Quoted string or character
+    if first == "\"" or first == "'":
+        if len(value) >= 2 and value[-1] == first:
+            return value[1:-1]
+        return value
+
+    # Keywords; objects (which are not modified for the moment) and unknown
+    # types are returned as is
+    return JDB_VALUE_CONSTANTS.get(value, value)
+
+
+def _parse_jdb_array(value: str) -> _typ.List[_typ.Any]:
+    # Parse an array, possibly nested, in a single pass over its tokens
+    data = value[1:-1]
+
+    if "{" not in data:
+        # Flat arrays without strings can simply be split
+        if "\"" not in data and "'" not in data:
+            if data.strip() == "":
+                return []
+
+            items = data.split(",")
+            try:
+                return [int(item) for item in items]
+            except ValueError:
+                return [_parse_jdb_scalar(item.strip()) for item in items]
+
+        return [_parse_jdb_scalar(item) for item in REGEXP_VALUE_ITEM.findall(data)]
+
+    stack = [[]]
+
+    for (opening, closing, token) in REGEXP_VALUE_TOKEN.findall(value):
+        if opening:
+            array = []
+            stack[-1].append(array)
+            stack.append(array)
+
+        elif closing:
+            if len(stack) > 1:
+                stack.pop()
+
+        elif token:
+            stack[-1].append(_parse_jdb_scalar(token))
+
+    return stack[0][0]
+
+
 def parse_jdb_value(value: str) -> _typ.Any:
     """
     Returns a Python-typed value given a string parsed from `jdb`
-    output. Supports strings, characters, integers, floats and
-    boolean values.
+    output. Supports strings, characters, integers, floats, boolean
+    values, `null` and (possibly nested) arrays; objects, such as
+    "instance of Node(id=501)", are returned as strings.
+
+    Values are dispatched on their first character, and arrays are
+    parsed in a single pass by a compiled tokenizer, as this function
+    is called for every variable at every step.
 
     :param value: The `jdb` value as a string.
     :return: The value as a Python type.
@@ -123,53 +318,59 @@ def parse_jdb_value(value: str) -> _typ.Any:
     if type(value) is not str:
         return value
 
-    # Void value
-    if value == "<void value>":
-        return None
+    # Arrays
+    if value[:1] == "{" and value[-1:] == "}":
+        return _parse_jdb_array(value)
 
-    # Objects should not be modified for the moment
-    # NOTE: Could expand arrays (or simple types of arrays)
-    if value[0:8] == "instance":
-        return value
+    return _parse_jdb_scalar(value)
 
-    # Arrays
-    if value[0] == "{" and value[-1] == "}":
 
-        # NOTE: below did not work, because quotes were not saved
-        # which interfered with the string vs int detection
-        # #csv_like_data = [value[1:-1].strip()]
-        # #csv_reader = _csv.reader(csv_like_data, skipinitialspace=True)
-        # #return list(map(parse_jdb_value, _itertools.chain(*csv_reader)))
+def parse_jdb_reference(value: _typ.Any) -> _typ.Optional[_typ.Tuple[str, int]]:
+    """
+    Returns the type and identifier of the object referenced by a value,
+    as left unparsed by `parse_jdb_value` (for instance, "instance of
+    Node(id=501)").
 
-        data = value[1:-1].strip()
-        values = map(str.strip, REGEXP_CSV.findall(data))
-        return list(map(parse_jdb_value, values))
+    :param value: A value returned by `parse_jdb_value`.
+    :return: A tuple of the type name and the object id, or `None` if the
+             value is not a reference.
+    """
 
-    # NoneType
-    if value == "null":
+    if type(value) is not str or value[:12] != "instance of ":
         return None
 
-    # Quoted string
-    if len(value) >= 2 and value[0] == value[-1] and value[0] in ["'", '"']:
-        return value[1:-1]
+    res_reference = REGEXP_REFERENCE.fullmatch(value)
+    if res_reference is None:
+        return None
 
-    # Boolean type
-    if value in ["true", "false"]:
-        return value == "true"
+    return res_reference.group(1), int(res_reference.group(2))
 
-    # We may have an int or a float, so test in least restrictive order
-    try:
-        return int(value)
-    except ValueError:
-        pass
 
-    try:
-        return float(value)
-    except ValueError:
-        pass
+def parse_jdb_dump(text: str) -> _typ.Any:
+    """
+    Returns a Python-typed value given the output of the `jdb` command
+    `dump` (after the equal sign): objects, which are printed with one
+    "name: value" line per field, are returned as a dictionary of their
+    fields; any other value is parsed by `parse_jdb_value`.
+
+    :param text: The output from `jdb`.
+    :return: The value as a Python type.
+    """
 
-    # Unknown type
-    return value
+    text = text.strip()
+
+    if text[:1] != "{" or text[-1:] != "}" or "\n" not in text:
+        return parse_jdb_value(text)
+
+    fields = {}
+    for line in text[1:-1].splitlines():
+        (name, sep, value) = line.strip().partition(": ")
+        if sep == "":
+            continue
+
+        fields[name] = parse_jdb_value(value.strip())
+
+    return fields
 
 
 def parse_jdb_values(text: str) -> _typ.Dict[str, _typ.Any]:
@@ -212,6 +413,258 @@ def parse_jdb_values(text: str) -> _typ.Dict[str, _typ.Any]:
     return variables_dict
 
 
+def parse_jdb_locals(
+        text: str
+) -> _typ.Tuple[_typ.Dict[str, _typ.Any], _typ.Dict[str, _typ.Any]]:
+    """
+    Returns the method arguments and local variables, given the output of
+    the `jdb` command `locals`. If the output indicates that no variables
+    (or no debug information) are available, both dictionaries are empty.
+
+    :param text: The output from `jdb`.
+    :return: A tuple of the dictionaries of arguments and local variables.
+    """
+
+    args_start = text.find("Method arguments:")
+    locals_start = text.find("Local variables:")
+
+    if args_start < 0 or locals_start < 0:
+        return {}, {}
+
+    args = parse_jdb_values(text[args_start + len("Method arguments:"):locals_start])
+    local = parse_jdb_values(text[locals_start + len("Local variables:"):])
+
+    return args, local
+
+
+def parse_jdb_watch(text: str) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+    """
+    Returns the field, and the current and next values of the field (for a
+    modification) given the output of `jdb` when a watchpoint is hit.
+
+    :param text: The output from `jdb`.
+    :return: A dictionary describing the access, or `None` if there is none.
+    """
+
+    res_watch = REGEXP_WATCH.search(text)
+    if res_watch is None:
+        return None
+
+    watch = {"field": res_watch.group(1)}
+
+    if res_watch.group(2) is not None:
+        watch["value"] = parse_jdb_value(res_watch.group(2))
+        watch["new_value"] = parse_jdb_value(res_watch.group(3))
+
+    return watch
+
+
+def may_assign_variables(instruction: _typ.Optional[str]) -> bool:
+    """
+    Returns whether executing a source line may change the value of local
+    variables. This is a conservative, textual test: it may report lines
+    which do not assign anything, but not the reverse. Lines without source
+    are assumed to assign variables.
+
+    :param instruction: The source line, as listed by `jdb`.
+    :return: Whether the line may assign local variables.
+    """
+
+    if instruction is None:
+        return True
+
+    return REGEXP_ASSIGNMENT.search(instruction) is not None
+
+
+def match_class_pattern(name: str, pattern: str) -> bool:
+    """
+    Returns whether a class name matches a pattern, with the syntax of the
+    `exclude` command of `jdb`: a name, possibly starting or ending with a
+    wildcard (e.g. "java.*" or "*.Node").
+
+    :param name: The fully qualified name of the class.
+    :param pattern: The pattern.
+    :return: Whether the class matches the pattern.
+    """
+
+    if pattern.endswith("*"):
+        return name.startswith(pattern[:-1])
+
+    if pattern.startswith("*"):
+        return name.endswith(pattern[1:])
+
+    return name == pattern
+
+
+def is_method_included(
+        class_method: _typ.Optional[str],
+        include_classes: _typ.Optional[_typ.Iterable[str]] = None,
+        include_methods: _typ.Optional[_typ.Iterable[str]] = None,
+) -> bool:
+    """
+    Returns whether a method belongs to the set of traced methods: its class
+    must match one of `include_classes` (if provided), and the method must be
+    one of `include_methods` (if provided), given either by name (e.g. "sort")
+    or with a class pattern (e.g. "Sorter.sort" or "pkg.*.sort").
+
+    :param class_method: The method, as in step records (e.g. "Foo.bar()").
+    :param include_classes: Patterns of the traced classes.
+    :param include_methods: The traced methods.
+    :return: Whether the method is traced.
+    """
+
+    if class_method is None:
+        return True
+
+    (class_name, _, method_name) = class_method.rstrip("()").rpartition(".")
+
+    if include_classes is not None:
+        if not any(match_class_pattern(class_name, pattern) for pattern in include_classes):
+            return False
+
+    if include_methods is not None:
+        for method in include_methods:
+            (pattern, _, name) = method.rpartition(".")
+            if name in (method_name, "*") and (pattern == "" or match_class_pattern(class_name, pattern)):
+                return True
+        return False
+
+    return True
+
+
+def parse_jdb_exception(text: str) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+    """
+    Parses an exception event of `jdb` into a step record (with the keys of
+    `parse_jdb_step`) describing the location at which the exception was
+    thrown, with the key "exception": a dictionary of the "class" of the
+    exception, whether it is "caught", and the location of the handler which
+    will "catch" it (or `None`).
+
+    :param text: The text of the event.
+    :return: The step record, or `None` if the text is not an exception.
+    """
+
+    res_exception = REGEXP_EXCEPTION.search(text)
+    if res_exception is None:
+        return None
+
+    info = {}
+
+    res_location = REGEXP_LOCATION.search(text, res_exception.end())
+    if res_location is not None:
+        info["thread"] = res_location.group(1)
+        info["class.method"] = res_location.group(2)
+        info["method"] = res_location.group(2)[:-len("()")].rpartition(".")[2]
+        info["line"] = int(res_location.group(3))
+        info["bci"] = int(res_location.group(4))
+
+    res_line = head(REGEXP_LINE_LISTING.findall(text))
+    if res_line is not None:
+        info["line"] = int(res_line[0])
+        info["instruction"] = res_line[1]
+
+    catch = None
+    if res_exception.group(2) is not None:
+        catch = {
+            "class.method": res_exception.group(2),
+            "line": int(res_exception.group(3)),
+            "bci": int(res_exception.group(4)),
+        }
+
+    info["exception"] = {
+        "class": res_exception.group(1),
+        "caught": catch is not None,
+        "catch": catch,
+    }
+
+    return info
+
+
+def parse_jdb_where(text: str) -> _typ.List[_typ.Dict[str, _typ.Any]]:
+    """
+    Parses the output of the `where` command of `jdb`.
+
+    :param text: The output of the command.
+    :return: The frames of the thread, innermost first, as dictionaries of
+             the "class.method" (as in step records), the "source" file (or
+             "native method") and the "line" (or `None`).
+    """
+
+    return [
+        {
+            "class.method": "{}.{}()".format(match.group(2), match.group(3)),
+            "source": match.group(4),
+            "line": int(match.group(5)) if match.group(5) is not None else None,
+        }
+        for match in REGEXP_WHERE.finditer(text)
+    ]
+
+
+def is_class_excluded(class_name: str, exclude_classes: _typ.Optional[_typ.Iterable[str]] = None) -> bool:
+    """
+    Returns whether a class is excluded from tracing: classes of the standard
+    library, and those matching `exclude_classes`.
+
+    :param class_name: The fully qualified name of the class.
+    :param exclude_classes: Additional patterns of excluded classes.
+    :return: Whether the class is excluded.
+    """
+
+    return any(
+        match_class_pattern(class_name, pattern)
+        for pattern in _itertools.chain(JDB_DEFAULT_EXCLUDED, exclude_classes or [])
+    )
+
+
+def parse_jdb_threads(text: str) -> _typ.List[_typ.Dict[str, _typ.Any]]:
+    """
+    Parses the output of the `threads` command of `jdb`.
+
+    :param text: The output of the command.
+    :return: A list of dictionaries describing each thread: its "id" (as
+             accepted by the `thread` command), "type", "name", "group",
+             "status" and whether it is "at_breakpoint".
+    """
+
+    threads = []
+    group = None
+
+    for line in text.splitlines():
+        match = REGEXP_THREAD_GROUP.match(line)
+        if match is not None:
+            group = match.group(1)
+            continue
+
+        match = REGEXP_THREAD.match(line)
+        if match is not None:
+            threads.append({
+                "id": match.group(2),
+                "type": match.group(1),
+                "name": match.group(3),
+                "group": group,
+                "status": match.group(4),
+                "at_breakpoint": match.group(5) is not None,
+            })
+
+    return threads
+
+
+def is_program_thread(thread: _typ.Mapping[str, _typ.Any]) -> bool:
+    """
+    Returns whether a thread (as listed by `parse_jdb_threads`) runs code of
+    the program, rather than of the JVM, and can be stepped.
+
+    :param thread: The description of the thread.
+    :return: Whether the thread is traced.
+    """
+
+    return (
+        thread.get("group") not in JDB_SYSTEM_THREAD_GROUPS and
+        thread.get("name") not in JDB_SYSTEM_THREADS and
+        thread.get("status") not in JDB_INACTIVE_THREAD_STATUSES
+    )
+
+
 def parse_jdb_step(text: str) -> _typ.Dict[str, _typ.Any]:
     """
 
@@ -1,20 +1,66 @@
+import collections as _collections
+import itertools as _itertools
+import threading as _threading
+import time as _time
 import typing as _typ
 
 import pexpect as _pexpect
 
 from pyjdb.core import helpers as _helpers, exceptions as _exceptions
+from pyjdb.core import events as _events
+from pyjdb.core import stats as _stats
+from pyjdb.core import objects as _objects
+from pyjdb.core import sinks as _sinks
+from pyjdb.core import trace as _trace
+
+
+# The name given to the requests by which an operation (see `JdbProcess._run`)
+# produces a record for its caller, rather than asking for a command
+_OPERATION_RECORD = None
 
 
 class JdbProcess(object):
-    def __init__(self, class_name, class_path=None, entry_method="main", exclude_classes=None):
+    def __init__(self, class_name, class_path=None, entry_method="main", exclude_classes=None,
+                 include_classes=None, include_methods=None):
         self.pty = None
+        self.events = None
         self.target = None
+        self._target_output = []
+        self._target_reader = None
+        self.port = None
         self.class_name = class_name
         self.class_path = class_path
         self.entry_method = entry_method
         self.trace = None
-        self.trace_max = 10000
+        self._trace_max = 10000
+        self._trace_columnar = False
+        self.trace_sinks = []
+        self.keep_trace = True
         self.exclude_classes = exclude_classes
+        self.include_classes = include_classes
+        self.include_methods = include_methods
+        self.max_depth = None
+        self.skip_policy = _helpers.SKIP_POLICY_UP
+        self.call_depth = 1
+        self._depths = {}
+        self._entry_thread = None
+        self._entry_thread_name = None
+        self._selected_thread = None
+        self._thread_ids = {}
+        self._dead_threads = set()
+        self._trace_threads = False
+        self._catch_exceptions = False
+        self._thread_queue = _collections.deque()
+        self.thread_traces = {}
+        self._step_index = 0
+        self._command_timeout = 30
+        self.truncated = None
+        self.cwd = None
+        self.current_locals = None
+        self._previous_step = None
+        self.object_depth = 3
+        self._objects = {}
+        self.stats = _stats.JdbStats()
 
     @property
     def active(self) -> bool:
@@ -27,6 +73,132 @@ class JdbProcess(object):
 
         return not (self.pty is None or self.pty.closed or self.pty.eof())
 
+    @property
+    def command_timeout(self) -> _typ.Optional[float]:
+        """
+        Provides the number of seconds to wait for the outcome of each
+        command, after which a `JdbTimeoutException` is raised, or `None` to
+        wait indefinitely. Launching the session is not subject to it.
+
+        :return: The command timeout.
+        """
+
+        return self._command_timeout
+
+    @command_timeout.setter
+    def command_timeout(self, value: _typ.Optional[float]) -> _typ.NoReturn:
+        self._command_timeout = value
+        self._apply_command_timeout()
+
+    def _apply_command_timeout(self) -> _typ.NoReturn:
+        if self.pty is not None:
+            self.pty.timeout = self._command_timeout
+
+    @property
+    def trace_threads(self) -> bool:
+        """
+        Provides whether all the threads of the program are traced, rather
+        than only the thread which reached the entry method. Threads then
+        take turns to make steps, the method entries and exits of every
+        thread are reported, and each step record is given an "index" (its
+        position among the steps of all threads), and also added to the
+        trace of its thread, in `thread_traces`.
+
+        :return: Whether all threads are traced.
+        """
+
+        return self._trace_threads
+
+    @trace_threads.setter
+    def trace_threads(self, value: bool) -> _typ.NoReturn:
+        self._trace_threads = value
+        if self.active:
+            self._apply_trace_threads()
+
+    def _trace_methods_command(self) -> str:
+        # Report method entries and exits of all threads, or of the main one
+        return "trace methods" if self._trace_threads else "trace methods 1"
+
+    def _apply_trace_threads(self) -> _typ.NoReturn:
+        # The entry thread is still the current one, and must be identified
+        # before other threads step
+        if self._trace_threads:
+            self._list_threads()
+
+        self._send_setup_command("untrace methods")
+        self._send_setup_command(self._trace_methods_command())
+
+    @property
+    def catch_exceptions(self) -> bool:
+        """
+        Provides whether the exceptions which the program catches are
+        reported, as those which it does not catch always are: steps then
+        stop where such exceptions are thrown, with a record describing them
+        (see `step`), and tracing continues in their handler. Exceptions
+        which are thrown and caught within excluded classes are ignored.
+
+        :return: Whether caught exceptions are reported.
+        """
+
+        return self._catch_exceptions
+
+    @catch_exceptions.setter
+    def catch_exceptions(self, value: bool) -> _typ.NoReturn:
+        self._catch_exceptions = value
+        if self.active:
+            self._apply_catch_exceptions()
+
+    def _catch_command(self) -> str:
+        # Report (or stop reporting) exceptions which are caught
+        return "{} caught {}".format(
+            "catch" if self._catch_exceptions else "ignore", _helpers.JDB_CAUGHT_EXCEPTIONS_CLASS)
+
+    def _apply_catch_exceptions(self) -> _typ.NoReturn:
+        self._send_setup_command(self._catch_command())
+
+    @property
+    def trace_max(self) -> _typ.Optional[int]:
+        """
+        Provides the maximum number of steps kept in the trace history, or
+        `None` if the history is unbounded.
+
+        :return: The maximum number of steps in the trace history.
+        """
+
+        return self._trace_max
+
+    @trace_max.setter
+    def trace_max(self, value: _typ.Optional[int]) -> _typ.NoReturn:
+        self._trace_max = value
+
+        if self.trace is not None and not self._trace_columnar:
+            self.trace.maxlen = value
+
+    @property
+    def trace_columnar(self) -> bool:
+        """
+        Provides whether the trace history is stored in a compact, columnar
+        `Trace` (which is never culled, regardless of `trace_max`) rather
+        than in a `TraceHistory` of dictionaries.
+
+        :return: A `Boolean` representing the storage of the trace history.
+        """
+
+        return self._trace_columnar
+
+    @trace_columnar.setter
+    def trace_columnar(self, value: bool) -> _typ.NoReturn:
+        if value == self._trace_columnar:
+            return
+
+        self._trace_columnar = value
+
+        # Convert the records recorded so far
+        if self.trace is not None:
+            items = self.trace
+            self._reset_trace_history()
+            self.trace.extend(items)
+
     def _build_call_base(
             self,
             args: _typ.Optional[_typ.Union[_typ.AnyStr, list]] = None,
@@ -115,6 +287,13 @@ class JdbProcess(object):
         )
 
     def close(self):
+        for sink in self.trace_sinks:
+            # noinspection PyBroadException
+            try:
+                sink.flush()
+            except:
+                pass
+
         if self.pty is not None:
             # noinspection PyBroadException
             try:
@@ -125,60 +304,136 @@ class JdbProcess(object):
         if self.target is not None:
             # noinspection PyBroadException
             try:
+                self._stop_target_reader()
                 self.target.close()
             except:
                 pass
             finally:
                 self.target = None
 
-    def spawn(self, args: _typ.Optional[str] = None, capture_target=False) -> _typ.NoReturn:
+    def spawn(
+            self,
+            args: _typ.Optional[str] = None,
+            capture_target=False,
+            port: _typ.Optional[int] = None,
+    ) -> _typ.NoReturn:
         """
 
         :param args:
+        :param capture_target: Whether to launch the target separately, so that
+                               its input and output can be accessed.
+        :param port: The port on which the target listens for the debugger, when
+                     `capture_target` is set; by default, a free port is picked
+                     by the JVM, which allows many concurrent sessions.
         :return:
         """
 
-        # In case we have a live process going: Terminate it
-        self.close()
+        with self.stats.timer(_stats.PHASE_SPAWN):
+            # In case we have a live process going: Terminate it
+            self.close()
 
-        if capture_target:
-            # Pick a port
-            port = 8899
+            if capture_target:
+                # Pick a port (with port 0, the JVM binds any free port)
+                if port is None:
+                    port = _helpers.JAVA_DEBUG_DEFAULT_PORT
 
-            # Launch the class separately on a port
-            self.target = _pexpect.spawnu(self._build_java_call(args=args, port=port))
-            self.target.expect("Listening[^:]*: \d+")
+                # Launch the class separately on a port
+                self.target = _pexpect.spawnu(self._build_java_call(args=args, port=port), cwd=self.cwd)
 
-            # Connect JDB
-            self.pty = _pexpect.spawnu(self._build_jdb_call(port=port))
-        else:
-            # Launch the class through JDB
-            self.pty = _pexpect.spawnu(self._build_jdb_call(args=args))
+                try:
+                    self.target.expect(_helpers.REGEXP_PATT_LISTENING)
 
-        self.pty.sendline(
-            "stop in {class_name}.{entry_method}".format(
-                class_name=self.class_name, entry_method=self.entry_method
-            )
-        )
+                except _pexpect.EOF as e:
+                    e.__class__ = _exceptions.JdbHostErrorException
+                    raise e
 
-        self.pty.expect(".*Deferring breakpoint.*")
-        self.pty.sendline("run")
-        self.pty.expect(".*Breakpoint hit:")
+                # Retrieve the port that was actually bound
+                self.port = int(self.target.match.group(1))
+                self._start_target_reader()
 
-        # Activate precise tracing information:
-        # - exclude standard library from events
-        exclude_list = _helpers.JDB_DEFAULT_EXCLUDED[:] + [""]
-        if self.exclude_classes is not None:
-            exclude_list = exclude_list + self.exclude_classes
-        self.pty.sendline("exclude {}".format(",".join(exclude_list)))
-        # - provide information on methods being entered, exited (and return value)
-        self.pty.sendline("trace methods 1")
+                # Connect JDB
+                self.pty = _pexpect.spawnu(self._build_jdb_call(port=self.port), cwd=self.cwd)
+            else:
+                # Launch the class through JDB
+                self.port = None
+                self.pty = _pexpect.spawnu(self._build_jdb_call(args=args), cwd=self.cwd)
 
-        # Run dummy method to clear
-        self.locals()
+            # Read the output of jdb as a stream of events
+            self.events = _events.JdbEventStream(self.pty, stats=self.stats)
 
-        # Reset trace
-        self._reset_trace_history()
+            self.pty.sendline(
+                "stop in {class_name}.{entry_method}".format(
+                    class_name=self.class_name, entry_method=self.entry_method
+                )
+            )
+
+            event = self.events.expect_event([_events.EVENT_OUTPUT])
+            while "breakpoint" not in event.text:
+                event = self.events.expect_event([_events.EVENT_OUTPUT])
+
+            self.pty.sendline("run")
+            event = self.events.expect_event([_events.EVENT_BREAKPOINT])
+            self.events.read_until_prompt()
+
+            # Remember the thread which reached the entry method; its id is
+            # only needed (and listed) when all threads are traced
+            self._reset_threads((event.info or {}).get("thread"))
+            if self._trace_threads:
+                self._list_threads()
+
+            # Activate precise tracing information:
+            # - exclude standard library from events
+            self.pty.sendline(self._build_exclude_command())
+            # - provide information on methods being entered, exited (and return value)
+            self.pty.sendline(self._trace_methods_command())
+            # - stop where caught exceptions are thrown, if requested
+            if self._catch_exceptions:
+                self.pty.sendline(self._catch_command())
+
+            # Run dummy method to clear
+            self.locals()
+            self._previous_step = None
+            self._reset_call_depth()
+            self._apply_command_timeout()
+
+            # Reset trace
+            self._reset_trace_history()
+
+    @property
+    def target_output(self) -> str:
+        """
+        The output of the target so far, when it was launched separately
+        (with `capture_target`).
+        """
+        return "".join(self._target_output)
+
+    def _start_target_reader(self) -> _typ.NoReturn:
+        # Read the output of the target as it is written: otherwise, once the
+        # terminal buffer is full, the target blocks on its next print (and
+        # `jdb` on the next step)
+        self._target_output = [self.target.buffer]
+        self.target.buffer = ""
+
+        def read_target(target, output):
+            while True:
+                try:
+                    output.append(target.read_nonblocking(_helpers.JDB_READ_CHUNK_SIZE, timeout=None))
+                except (_pexpect.EOF, OSError, ValueError):
+                    break
+
+        self._target_reader = _threading.Thread(
+            target=read_target, args=(self.target, self._target_output), daemon=True)
+        self._target_reader.start()
+
+    def _stop_target_reader(self) -> _typ.NoReturn:
+        if self._target_reader is None:
+            return
+
+        # Killing the target closes its terminal, which ends the reader (its
+        # descriptor must not be closed, and reused, while it is being read)
+        self.target.terminate(force=True)
+        self._target_reader.join(_helpers.JDB_TARGET_READER_JOIN_TIMEOUT)
+        self._target_reader = None
 
     def target_send_line(self, line):
         if self.target is not None:
@@ -195,68 +450,1197 @@ class JdbProcess(object):
         return self.target_send_line(open(file_name).read())
 
     def _reset_trace_history(self) -> _typ.NoReturn:
-        self.trace = list()
+        if self._trace_columnar:
+            self.trace = _trace.Trace()
+        else:
+            self.trace = _trace.TraceHistory(maxlen=self.trace_max)
+
+        self.thread_traces = {}
+        self._step_index = 0
+
+    def add_trace_sink(self, sink: _sinks.TraceSink) -> _sinks.TraceSink:
+        """
+        Registers a sink to which each step record is written as soon as it
+        is parsed. Combined with `keep_trace = False`, this allows tracing
+        programs of any length in constant memory.
+
+        :param sink: The sink (for instance, a `JsonLinesTraceSink`).
+        :return: The sink.
+        """
+
+        self.trace_sinks.append(sink)
+        return sink
 
     def _append_trace_history(self, info: _typ.Mapping) -> _typ.NoReturn:
         if self.trace is None:
             self._reset_trace_history()
 
-        # Add the info to the list
-        self.trace.append(info)
+        # The program has moved on: objects must be dumped again
+        self._objects.clear()
 
-        # Cull the excess frames
-        if self.trace_max is not None and self.trace_max > 0:
-            if len(self.trace) > self.trace_max:
-                self.trace = self.trace[-self.trace_max:]
+        with self.stats.timer(_stats.PHASE_HISTORY):
+            # Order the steps of all threads, and keep a trace per thread
+            if self._trace_threads:
+                info["index"] = self._step_index
+                self._step_index += 1
 
-    def step(self, modifier: str = " in", include_locals: bool = False) -> _typ.Dict[str, _typ.Any]:
+                thread = info.get("thread")
+                if thread not in self.thread_traces:
+                    self.thread_traces[thread] = _trace.TraceHistory(maxlen=self.trace_max)
+                self.thread_traces[thread].append(info)
+
+            # Stream the info out
+            for sink in self.trace_sinks:
+                sink.write(info)
+
+            # Add the info to the history (which culls the excess frames)
+            if self.keep_trace:
+                self.trace.append(info)
+
+    def _build_exclude_command(self) -> str:
+        # Exclude the standard library (and requested classes) from events
+        exclude_list = _helpers.JDB_DEFAULT_EXCLUDED[:] + [""]
+        if self.exclude_classes is not None:
+            exclude_list = exclude_list + self.exclude_classes
+        return "exclude {}".format(",".join(exclude_list))
+
+    def _run(self, operation: _typ.Generator) -> _typ.Any:
+        """
+        Runs an operation of the session: a generator which holds the logic
+        of a command (such as `step`), independently of how `jdb` is reached.
+        It yields requests, tuples of the name of a method of the process and
+        of its arguments (or the name of a property, such as `active`, which
+        is read), and is sent back their result, or thrown their exception.
+        Methods are requested by name, so that subclasses can replace them;
+        `AsyncJdbProcess` runs the same operations with its coroutines.
+
+        :param operation: The generator of the operation.
+        :return: The value returned by the operation.
         """
 
-        :return:
+        (result, error) = (None, None)
+
+        while True:
+            try:
+                request = operation.send(result) if error is None else operation.throw(error)
+            except StopIteration as stop:
+                return stop.value
+
+            (result, error) = self._perform(request)
+
+    def _iterate(self, operation: _typ.Generator) -> _typ.Iterator[_typ.Any]:
         """
+        Runs an operation (see `_run`) which also produces records, with the
+        requests `(_OPERATION_RECORD, record)`, and yields them.
 
-        if not self.active:
-            return None
+        :param operation: The generator of the operation.
+        :return: An iterator of the records.
+        """
 
-        # Make a step
-        self.pty.sendline("step{}".format(modifier))
+        (result, error) = (None, None)
 
-        # Collect location
         try:
-            self.pty.expect(_helpers.REGEXP_PATT_STEP_EXPECT)
+            while True:
+                try:
+                    request = operation.send(result) if error is None else operation.throw(error)
+                except StopIteration:
+                    return
+
+                if request[0] is _OPERATION_RECORD:
+                    (result, error) = (None, None)
+                    yield request[1]
+                else:
+                    (result, error) = self._perform(request)
 
-        except _pexpect.EOF as e:
-            e.__class__ = _exceptions.JdbHostExitedException
-            raise e
+        finally:
+            # Let the operation clean up when the caller stops early
+            operation.close()
 
-        except _pexpect.TIMEOUT as e:
-            e.__class__ = _exceptions.JdbException
-            raise e
+    def _perform(self, request: _typ.Tuple) -> _typ.Tuple[_typ.Any, _typ.Optional[Exception]]:
+        # Perform a request of an operation (see `_run`), returning either
+        # its result or its exception
+        (name, *args) = request
 
-        info = _helpers.parse_jdb_step(self.pty.after)
+        try:
+            attribute = getattr(self, name)
+            return (attribute(*args) if callable(attribute) else attribute), None
+
+        except Exception as e:
+            return None, e
+
+    def _sendline(self, line: str) -> _typ.NoReturn:
+        self.pty.sendline(line)
+
+    def _expect_event(self, kinds: _typ.Iterable[str]) -> _events.JdbEvent:
+        return self.events.expect_event(kinds)
+
+    @staticmethod
+    def _step_event_info(event: _events.JdbEvent) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        """
+        Interprets the event that answered a `step` command.
+
+        :param event: The event, one of `events.STEP_OUTCOME_EVENTS`.
+        :return: The parsed step information (describing the exception, for
+                 exception events), or `None` if `jdb` rejected the command
+                 because no thread was suspended.
+        """
+
+        if event.kind == _events.EVENT_NOT_SUSPENDED:
+            return None
+
+        info = event.info
         if info is None or len(info) == 0:
-            # print("Error")
-            # print(self.pty.after)
-            raise _exceptions.JdbHostErrorException("Unexpected error: '{}'".format(self.pty.after))
+            raise _exceptions.JdbHostErrorException("Unexpected error: '{}'".format(event.text))
+
+        # Remember whether this step entered a new method, so that the
+        # calling arguments can be attached once the locals are known
+        if event.kind == _events.EVENT_METHOD_ENTERED:
+            info["call"] = None
+
+        return info
+
+    @staticmethod
+    def _step_command(modifier: str) -> str:
+        # Steps over calls are made with `next`
+        if modifier == _helpers.JDB_STEP_OVER:
+            return "next"
+        return "step{}".format(modifier)
+
+    def _send_step(self, modifier: str) -> _typ.NoReturn:
+        self.pty.sendline(self._step_command(modifier))
+
+    def _expect_step(self) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        """
+        Waits for the outcome of a `step` command that has already been sent
+        to `jdb`, and parses the location at which the thread stopped.
+
+        :return: The parsed step information, or `None` if `jdb` rejected the
+                 command because no thread was suspended.
+        """
+
+        with self.stats.timer(_stats.PHASE_STEP):
+            event = self.events.expect_event(_events.STEP_OUTCOME_EVENTS)
+
+            if event.kind == _events.EVENT_EXITED:
+                raise _exceptions.JdbHostExitedException(event.text)
+
+            # Seek forward to prompt
+            self.events.expect_event([_events.EVENT_PROMPT])
+
+        return self._step_event_info(event)
+
+    def _resume_step(self) -> _typ.NoReturn:
+        # Let the thread run until its pending step completes
+        self.pty.sendline("cont")
+
+    def _exception_ignored(self, info: _typ.Dict[str, _typ.Any]) -> bool:
+        """
+        Decides whether a step stopped at an exception which is not reported:
+        one which is thrown and caught within excluded classes (as happens,
+        for instance, while classes are loaded).
+
+        :param info: The step record, as returned by `_expect_step`.
+        :return: Whether the exception must be ignored.
+        """
+
+        exception = info.get("exception")
+        if exception is None or not exception["caught"]:
+            return False
+
+        return all(
+            _helpers.is_class_excluded((class_method or "").rpartition(".")[0], self.exclude_classes)
+            for class_method in (info.get("class.method"), exception["catch"]["class.method"])
+        )
+
+    def _expect_traced_step_operation(self) -> _typ.Generator:
+        """
+        Waits for the outcome of a `step` command, as `_expect_step`, letting
+        the thread run past the exceptions which are ignored, and follows the
+        depth of its frame. Exceptions are given their "stack" (see `where`).
+
+        :return: The operation (see `_run`), which returns the step record.
+        """
+
+        info = yield ("_expect_step",)
+        while info is not None and self._exception_ignored(info):
+            yield ("_resume_step",)
+            info = yield ("_expect_step",)
+
+        if info is None:
+            raise _exceptions.JdbHostErrorException("Unexpected error: no thread suspended")
+
+        if "exception" in info:
+            info["exception"]["stack"] = yield ("where",)
+
+        self._track_call_depth(info)
+
+        return info
+
+    def _expect_locals(
+        self,
+        strict: bool = False,
+    ) -> _typ.Optional[_typ.Tuple[_typ.Dict[str, _typ.Any], _typ.Dict[str, _typ.Any]]]:
+        """
+        Waits for the output of a `locals` command that has already been sent
+        to `jdb`, and parses the method arguments and local variables.
+
+        :param strict: Whether to raise a `JdbHostErrorException` on events
+                       other than output and prompts before the variables,
+                       rather than skipping them (as a step event, when the
+                       next `step` has already been sent).
+        :return: A tuple of the arguments and local variables, or `None` if
+                 `jdb` rejected the command because no thread was suspended.
+        """
+
+        skipped = _events.NEUTRAL_EVENTS if strict else None
 
-        # Obtain local variables (or attempt to)
-        loc = self.locals()
+        with self.stats.timer(_stats.PHASE_LOCALS):
+            event = self.events.expect_event(_events.LOCALS_OUTCOME_EVENTS, skipped=skipped)
+
+            if event.kind == _events.EVENT_EXITED:
+                raise _exceptions.JdbHostExitedException(event.text)
+
+            # Seek forward to prompt
+            self.events.expect_event([_events.EVENT_PROMPT], skipped=skipped)
+
+        # Keep the variables, which remain valid until the next step
+        if event.kind == _events.EVENT_NOT_SUSPENDED:
+            self.current_locals = None
+            return None
+
+        self.current_locals = event.info
+        return event.info
+
+    @staticmethod
+    def _merge_step_locals(
+            info: _typ.Dict[str, _typ.Any],
+            loc: _typ.Optional[_typ.Tuple[_typ.Dict[str, _typ.Any], _typ.Dict[str, _typ.Any]]],
+            include_locals: bool,
+    ) -> _typ.Dict[str, _typ.Any]:
+        """
+        Completes a step record with the variables obtained by `locals`.
+
+        :param info: The step record, as returned by `_expect_step`.
+        :param loc: The output of `_expect_locals` for the same step.
+        :param include_locals: Whether to record the local variables.
+        :return: The completed step record.
+        """
+
+        # The placeholder is only filled if the arguments are known
+        entered = "call" in info
+        info.pop("call", None)
 
         if loc is not None:
             args, vars = loc
 
             # Detect if method was just called and fill calling information if so
-            if "Method entered" in self.pty.before and args is not None:
+            if entered and args is not None:
                 info["call"] = args
 
             if include_locals and vars is not None:
                 info["locals"] = vars
 
+        return info
+
+    def _reset_call_depth(self) -> _typ.NoReturn:
+        # The thread is suspended in the entry method
+        self.call_depth = 1
+        self._depths = {}
+
+    def _thread_depth(self, thread: _typ.Any) -> _typ.Tuple[int, bool]:
+        # The depth of a thread (by id), and whether it is returning from a
+        # method; the entry thread starts in the entry method, others have
+        # not entered any traced method yet
+        return self._depths.get(thread, (1 if thread == self._entry_thread else 0, False))
+
+    def _step_thread(self, info: _typ.Mapping[str, _typ.Any]) -> _typ.Any:
+        """
+        Identifies the thread which made a step. Step records only name their
+        thread: the name is resolved with the last list of threads (see
+        `_list_threads`), preferring the thread that is selected.
+
+        :param info: The step record, as returned by `_expect_step`.
+        :return: The id of the thread (or its name, if it is ambiguous).
+        """
+
+        # Only the entry thread is traced
+        if not self._trace_threads:
+            return self._entry_thread
+
+        name = info.get("thread")
+        selected = self._selected_thread
+        if selected is not None and selected["name"] == name:
+            return selected["id"]
+
+        ids = self._thread_ids.get(name, [])
+        return ids[0] if len(ids) == 1 else name
+
+    def _track_call_depth(self, info: _typ.Dict[str, _typ.Any]) -> _typ.NoReturn:
+        """
+        Follows the depth of the frame in which the thread is suspended, from
+        the method entries and exits reported by steps (for each thread).
+        Only the methods of classes which are not excluded are counted.
+
+        :param info: The step record, as returned by `_expect_step`.
+        """
+
+        thread = self._step_thread(info)
+        (depth, returning) = self._thread_depth(thread)
+
+        # A method exit is reported before returning to the caller
+        if returning:
+            depth -= 1
+
+        if "call" in info:
+            depth += 1
+
+        self._depths[thread] = (depth, "return" in info)
+        self.call_depth = depth
+
+    def _step_modifier(self, modifier: str) -> str:
+        # Calls made at the maximum depth are stepped over
+        if self.max_depth is not None and self.call_depth >= self.max_depth and modifier == " in":
+            return _helpers.JDB_STEP_OVER
+        return modifier
+
+    def _skip_modifier(self, info: _typ.Dict[str, _typ.Any]) -> _typ.Optional[str]:
+        """
+        Decides whether a step stopped outside of the traced methods (see
+        `step`), and if so, how to leave them.
+
+        :param info: The step record, as returned by `_expect_step`.
+        :return: The modifier of the step which skips the frame, or `None`
+                 if the frame is traced.
+        """
+
+        # Uncaught exceptions end the trace, wherever they are thrown
+        if "exception" in info and not info["exception"]["caught"]:
+            return None
+
+        if self.max_depth is not None and self.call_depth > self.max_depth:
+            return " up"
+
+        if _helpers.is_method_included(info.get("class.method"), self.include_classes, self.include_methods):
+            return None
+
+        # The entry method has no caller to return to
+        if self.skip_policy == _helpers.SKIP_POLICY_UP and self.call_depth > 1:
+            return " up"
+
+        return _helpers.JDB_STEP_OVER
+
+    def _locals_needed(self, info: _typ.Dict[str, _typ.Any], locals_policy: str) -> bool:
+        """
+        Decides whether the local variables must be retrieved after a step,
+        according to a policy (see `step`), and remembers the step so that
+        the next one can be compared to it.
+
+        :param info: The step record, as returned by `_expect_step`.
+        :param locals_policy: One of the `LOCALS_POLICY_*` values of `helpers`.
+        :return: Whether `locals` must be sent to `jdb`.
+        """
+
+        previous = self._previous_step
+        self._previous_step = info
+
+        if locals_policy == _helpers.LOCALS_POLICY_ALWAYS:
+            return True
+
+        # Method entries are always inspected, to record their arguments
+        if "call" in info:
+            return True
+
+        if locals_policy != _helpers.LOCALS_POLICY_CHANGES:
+            return False
+
+        # The variables can only have changed if the previous step (which has
+        # now been executed) was in another frame, or may have assigned them
+        return (
+            self.current_locals is None or
+            previous is None or
+            "return" in previous or
+            previous.get("thread") != info.get("thread") or
+            previous.get("class.method") != info.get("class.method") or
+            _helpers.may_assign_variables(previous.get("instruction"))
+        )
+
+    def step(
+            self,
+            modifier: str = " in",
+            include_locals: bool = False,
+            locals_policy: _typ.Optional[str] = None,
+    ) -> _typ.Dict[str, _typ.Any]:
+        """
+        Makes a step, and returns its record.
+
+        The local variables are only retrieved (with a round trip to `jdb`)
+        when needed, as decided by `locals_policy`:
+
+        - `LOCALS_POLICY_ALWAYS`: after every step (the default when
+          `include_locals` is set);
+        - `LOCALS_POLICY_ENTRY`: only when a method is entered, to record its
+          arguments (the default otherwise); the variables of any other step
+          can still be obtained on demand by calling `locals`;
+        - `LOCALS_POLICY_CHANGES`: when a method is entered, when the frame
+          changes, or when the line that was just executed may have assigned
+          a variable; otherwise the variables last retrieved are reused;
+        - `LOCALS_POLICY_NEVER`: never, so that the arguments of calls are
+          not recorded either.
+
+        The variables last retrieved are available as `current_locals`.
+
+        Tracing can be restricted to some methods, with `include_classes`
+        (patterns of class names, as "pkg.*") and `include_methods` (names,
+        as "sort" or "Sorter.sort"), and to frames up to `max_depth` calls
+        deep (the entry method being at depth 1). Steps which stop outside of
+        them are not recorded: the methods are left with `step up`, or, with
+        `skip_policy` set to `SKIP_POLICY_NEXT` (and for the entry method),
+        their lines are stepped over, so that the traced methods which they
+        call are still found; calls made at the maximum depth are stepped
+        over.
+
+        Steps which stop at an exception (where it is thrown) are recorded
+        with the key "exception": a dictionary of its "class", whether it is
+        "caught", the location of the handler which will "catch" it (or
+        `None`), and the "stack" of frames of the thread (see `where`). The
+        program stops at uncaught exceptions, and at caught exceptions when
+        `catch_exceptions` is set; after recording an uncaught exception, a
+        `JdbUncaughtException` is raised, unless all threads are traced and
+        the exception kills neither the entry thread nor the last live one.
+
+        :param modifier: The modifier of the `step` command (e.g. " in", " up").
+        :param include_locals: Whether to record the local variables.
+        :param locals_policy: When to retrieve the local variables.
+        :return: The step record.
+        """
+
+        return self._run(self._step_operation(modifier, include_locals, locals_policy))
+
+    def _step_operation(
+            self,
+            modifier: str,
+            include_locals: bool,
+            locals_policy: _typ.Optional[str],
+    ) -> _typ.Generator:
+        # See `step` and `_run`
+        if not (yield ("active",)):
+            return None
+
+        if locals_policy is None:
+            locals_policy = (_helpers.LOCALS_POLICY_ALWAYS if include_locals
+                             else _helpers.LOCALS_POLICY_ENTRY)
+
+        # Threads take turns
+        if self._trace_threads:
+            yield ("_select_next_thread",)
+
+        # Make a step
+        yield ("_send_step", self._step_modifier(modifier))
+        info = yield from self._expect_traced_step_operation()
+
+        # Skip the frames which are not traced, without recording them
+        skip = self._skip_modifier(info)
+        while skip is not None:
+            yield ("_send_step", skip)
+            info = yield from self._expect_traced_step_operation()
+            skip = self._skip_modifier(info)
+
+        # Obtain local variables (or attempt to), only if needed
+        if self._locals_needed(info, locals_policy):
+            loc = yield ("locals",)
+        elif locals_policy == _helpers.LOCALS_POLICY_CHANGES:
+            loc = self.current_locals
+        else:
+            loc = self.current_locals = None
+
+        info = self._merge_step_locals(info, loc, include_locals)
+
         # Add to record
         self._append_trace_history(info)
 
+        # The thread of an uncaught exception terminates
+        if "exception" in info and not info["exception"]["caught"]:
+            if (yield from self._uncaught_ends_trace_operation(info)):
+                raise _exceptions.JdbUncaughtException(info)
+
+        return info
+
+    def _uncaught_ends_trace(self, info: _typ.Dict[str, _typ.Any]) -> bool:
+        """
+        Decides whether an uncaught exception ends the trace: it always does
+        when only the entry thread is traced; when all threads are, only if
+        it kills the entry thread or the last live thread of the program.
+        Other threads are otherwise left to die, and are no longer selected.
+
+        :param info: The step record of the exception.
+        :return: Whether `JdbUncaughtException` must be raised.
+        """
+
+        return self._run(self._uncaught_ends_trace_operation(info))
+
+    def _uncaught_ends_trace_operation(self, info: _typ.Dict[str, _typ.Any]) -> _typ.Generator:
+        # See `_uncaught_ends_trace` and `_run`
+        if not self._leave_thread_to_die(info):
+            return True
+
+        return len((yield ("_live_threads",))) == 0
+
+    def _leave_thread_to_die(self, info: _typ.Dict[str, _typ.Any]) -> bool:
+        # Mark the thread of an uncaught exception as dead, unless the trace
+        # ends with it (see `_uncaught_ends_trace`)
+        thread = self._step_thread(info)
+        if not self._trace_threads or thread == self._entry_thread:
+            return False
+
+        self._dead_threads.add(thread)
+        return True
+
+    def _live_threads(self) -> _typ.List[_typ.Any]:
+        # The ids of the threads of the program which are still running
+        return self._run(self._live_threads_operation())
+
+    def _live_threads_operation(self) -> _typ.Generator:
+        # See `_live_threads` and `_run`
+        threads = yield ("_list_threads",)
+        return [thread["id"] for thread in self._steppable_threads(threads)]
+
+    def _steppable_threads(
+            self,
+            threads: _typ.Iterable[_typ.Dict[str, _typ.Any]],
+    ) -> _typ.List[_typ.Dict[str, _typ.Any]]:
+        # The listed threads which run code of the program, and which were
+        # not killed by an uncaught exception (those are left to die)
+        return [
+            thread for thread in threads
+            if _helpers.is_program_thread(thread) and thread["id"] not in self._dead_threads
+        ]
+
+    def step_many(
+            self,
+            n: _typ.Optional[int],
+            modifier: str = " in",
+            include_locals: bool = False,
+    ) -> _typ.List[_typ.Dict[str, _typ.Any]]:
+        """
+        Makes up to `n` steps (or steps until the program terminates, if `n`
+        is `None`), retrieving the local variables of each one, with a single
+        round trip to `jdb` per step: once a step has completed (and the
+        thread is suspended), its `locals` command and the next `step` are
+        written together, as `jdb` runs them in order.
+
+        No command is ever written while the VM runs, since `jdb` would
+        reject it (with "Nothing suspended."), and the outcome of each
+        command is matched strictly, so that no step event can be lost.
+        Steps are restricted to the traced methods and exceptions are
+        handled as in `step` (which is used when all threads are traced, as
+        threads take turns between steps).
+
+        :param n: The number of steps to make, or `None`.
+        :param modifier: The modifier of the `step` command (e.g. " in", " up").
+        :param include_locals: Whether to record the local variables of each step.
+        :return: The list of step records, in the same format as `step`.
+        """
+
+        return self._run(self._step_many_operation(n, modifier, include_locals))
+
+    def _step_many_operation(
+            self,
+            n: _typ.Optional[int],
+            modifier: str,
+            include_locals: bool,
+    ) -> _typ.Generator:
+        # See `step_many` and `_run`
+        records = []
+
+        if not (yield ("active",)) or (n is not None and n <= 0):
+            return records
+
+        # Threads take turns, which needs commands between steps
+        if self._trace_threads:
+            while (n is None or len(records) < n) and (yield ("active",)):
+                try:
+                    records.append((yield ("step", modifier, include_locals, _helpers.LOCALS_POLICY_ALWAYS)))
+
+                except _exceptions.JdbHostExitedException:
+                    break
+
+            return records
+
+        yield ("_send_step", self._step_modifier(modifier))
+
+        while True:
+            try:
+                info = yield from self._expect_traced_step_operation()
+
+                # Skip the frames which are not traced, without recording them
+                skip = self._skip_modifier(info)
+                while skip is not None:
+                    yield ("_send_step", skip)
+                    info = yield from self._expect_traced_step_operation()
+                    skip = self._skip_modifier(info)
+
+                self._previous_step = info
+
+                # The thread of an uncaught exception terminates
+                uncaught = "exception" in info and not info["exception"]["caught"]
+                last = uncaught or (n is not None and len(records) + 1 >= n)
+
+                # List the variables, and make the next step in the same round trip
+                yield ("_sendline", "locals")
+                if not last:
+                    yield ("_send_step", self._step_modifier(modifier))
+
+                loc = yield ("_expect_locals", True)
+
+            except _exceptions.JdbHostExitedException:
+                return records
+
+            info = self._merge_step_locals(info, loc, include_locals)
+
+            # Add to record
+            self._append_trace_history(info)
+            records.append(info)
+
+            if uncaught:
+                raise _exceptions.JdbUncaughtException(info)
+
+            if last:
+                return records
+
+    def run_steps(
+            self,
+            modifier: str = " in",
+            include_locals: bool = False,
+    ) -> _typ.List[_typ.Dict[str, _typ.Any]]:
+        """
+        Makes steps until the program terminates, retrieving the local
+        variables of each one with the same round trip as the next step (see
+        `step_many`).
+
+        :param modifier: The modifier of the `step` command (e.g. " in", " up").
+        :param include_locals: Whether to record the local variables of each step.
+        :return: The list of step records, in the same format as `step`.
+        """
+
+        return self.step_many(None, modifier=modifier, include_locals=include_locals)
+
+    def iter_steps(
+            self,
+            modifier: str = " in",
+            include_locals: bool = False,
+            until: _typ.Optional[_typ.Callable[[_typ.Dict[str, _typ.Any]], bool]] = None,
+            locals_policy: _typ.Optional[str] = None,
+            max_steps: _typ.Optional[int] = None,
+            max_wall_time: _typ.Optional[float] = None,
+    ) -> _typ.Iterator[_typ.Dict[str, _typ.Any]]:
+        """
+        Makes steps lazily, yielding each step record (which is also added to
+        the trace history) until the program terminates, so that a trace can
+        be consumed as a stream, and abandoned at any point.
+
+        Iteration also stops, leaving the trace truncated, once `max_steps`
+        steps have been made, once `max_wall_time` seconds have been spent
+        stepping (no single command may then outlast the deadline), or when
+        a command exceeds `command_timeout`; the reason is then available as
+        `truncated` (one of the `TRUNCATED_*` values of `helpers`), which is
+        `None` otherwise. After a timeout, the session should be closed.
+
+        :param modifier: The modifier of the `step` command (e.g. " in", " up").
+        :param include_locals: Whether to record the local variables of each step.
+        :param until: An optional predicate on step records; iteration stops
+                      after the first record for which it returns `True`.
+        :param locals_policy: When to retrieve the local variables (see `step`).
+        :param max_steps: The maximum number of steps to make.
+        :param max_wall_time: The maximum number of seconds spent stepping.
+        :return: An iterator of step records, in the same format as `step`.
+        """
+
+        return self._iterate(self._iter_steps_operation(
+            modifier, include_locals, until, locals_policy, max_steps, max_wall_time))
+
+    def _iter_steps_operation(
+            self,
+            modifier: str,
+            include_locals: bool,
+            until: _typ.Optional[_typ.Callable[[_typ.Dict[str, _typ.Any]], bool]],
+            locals_policy: _typ.Optional[str],
+            max_steps: _typ.Optional[int],
+            max_wall_time: _typ.Optional[float],
+    ) -> _typ.Generator:
+        # See `iter_steps` and `_iterate`
+        self.truncated = None
+        count = 0
+
+        deadline = None if max_wall_time is None else _time.monotonic() + max_wall_time
+        command_timeout = self.command_timeout
+
+        try:
+            while (yield ("active",)):
+                if max_steps is not None and count >= max_steps:
+                    self.truncated = _helpers.TRUNCATED_MAX_STEPS
+                    return
+
+                # No command may outlast the deadline
+                if deadline is not None:
+                    remaining = deadline - _time.monotonic()
+                    if remaining <= 0:
+                        self.truncated = _helpers.TRUNCATED_MAX_WALL_TIME
+                        return
+
+                    self.command_timeout = (
+                        remaining if command_timeout is None else min(command_timeout, remaining))
+
+                try:
+                    info = yield ("step", modifier, include_locals, locals_policy)
+
+                except _exceptions.JdbHostExitedException:
+                    return
+
+                except _exceptions.JdbTimeoutException:
+                    if deadline is not None and _time.monotonic() >= deadline:
+                        self.truncated = _helpers.TRUNCATED_MAX_WALL_TIME
+                    else:
+                        self.truncated = _helpers.TRUNCATED_TIMEOUT
+                    return
+
+                if info is None:
+                    return
+
+                count += 1
+                yield _OPERATION_RECORD, info
+
+                if until is not None and until(info):
+                    return
+
+        finally:
+            if deadline is not None:
+                self.command_timeout = command_timeout
+
+    def _send_setup_command(self, command: str) -> _typ.List[str]:
+        """
+        Sends a command which configures `jdb` (such as `stop` or `watch`),
+        and checks that `jdb` accepted it.
+
+        :param command: The command.
+        :return: The lines of output of the command.
+        """
+
+        self.pty.sendline(command)
+
+        return self._setup_output(command, self.events.read_until_prompt())
+
+    @staticmethod
+    def _setup_output(command: str, events: _typ.Iterable[_events.JdbEvent]) -> _typ.List[str]:
+        """
+        Checks the output of a command which configures `jdb`.
+
+        :param command: The command.
+        :param events: The events which preceded the next prompt.
+        :return: The lines of output of the command.
+        """
+
+        lines = [event.text for event in events if event.kind == _events.EVENT_OUTPUT]
+
+        for line in lines:
+            if line.strip().startswith(_helpers.JDB_SETUP_ERRORS):
+                raise _exceptions.JdbHostErrorException(
+                    "Command '{}' failed: '{}'".format(command, line.strip()))
+
+        return lines
+
+    def where(self) -> _typ.Optional[_typ.List[_typ.Dict[str, _typ.Any]]]:
+        """
+        Lists the frames of the thread in which the program is suspended.
+
+        :return: The frames, innermost first, as dictionaries of the
+                 "class.method" (as in step records), the "source" file and
+                 the "line" (see `helpers.parse_jdb_where`).
+        """
+
+        if not self.active:
+            return None
+
+        return _helpers.parse_jdb_where("\n".join(self._send_setup_command("where")))
+
+    def threads(self) -> _typ.Optional[_typ.List[_typ.Dict[str, _typ.Any]]]:
+        """
+        Lists the threads of the program (see `helpers.parse_jdb_threads`).
+
+        :return: A list of dictionaries describing each thread.
+        """
+
+        if not self.active:
+            return None
+
+        return _helpers.parse_jdb_threads("\n".join(self._send_setup_command("threads")))
+
+    def select_thread(self, thread: _typ.Any) -> _typ.NoReturn:
+        """
+        Makes a thread the current thread, which the next steps, `locals`
+        and `dump` apply to.
+
+        :param thread: The id of the thread, as listed by `threads`.
+        """
+
+        self._send_setup_command("thread {}".format(thread))
+
+    def suspend_thread(self, thread: _typ.Any) -> _typ.NoReturn:
+        """
+        Suspends a thread, so that it does not run while other threads step.
+
+        :param thread: The id of the thread, as listed by `threads`.
+        """
+
+        self._send_setup_command("suspend {}".format(thread))
+
+    def resume_thread(self, thread: _typ.Any) -> _typ.NoReturn:
+        """
+        Resumes a thread which was suspended with `suspend_thread`.
+
+        :param thread: The id of the thread, as listed by `threads`.
+        """
+
+        self._send_setup_command("resume {}".format(thread))
+
+    def _reset_threads(self, entry_thread_name: _typ.Optional[str]) -> _typ.NoReturn:
+        # Forget the threads of a previous session
+        self._entry_thread = None
+        self._entry_thread_name = entry_thread_name
+        self._selected_thread = None
+        self._thread_ids = {}
+        self._dead_threads = set()
+        self._thread_queue.clear()
+
+    def _list_threads(self) -> _typ.List[_typ.Dict[str, _typ.Any]]:
+        """
+        Lists the threads of the program (see `threads`), remembering their
+        ids by name, and the id of the thread which reached the entry method
+        the first time it is listed (while it is still at the breakpoint, if
+        all threads were traced from the start).
+
+        :return: The threads, as listed by `threads`.
+        """
+
+        return self._run(self._list_threads_operation())
+
+    def _list_threads_operation(self) -> _typ.Generator:
+        # See `_list_threads` and `_run`
+        threads = (yield ("threads",)) or []
+        self._remember_threads(threads)
+        return threads
+
+    def _remember_threads(self, threads: _typ.List[_typ.Dict[str, _typ.Any]]) -> _typ.NoReturn:
+        # Remember the ids of listed threads by name, and identify the entry
+        # thread (see `_list_threads`)
+        self._thread_ids = {}
+        for thread in threads:
+            self._thread_ids.setdefault(thread["name"], []).append(thread["id"])
+
+        if self._entry_thread is None:
+            candidates = sorted(
+                (thread for thread in threads if thread["name"] == self._entry_thread_name),
+                key=lambda thread: not thread.get("at_breakpoint"),
+            )
+            if len(candidates) > 0:
+                self._entry_thread = candidates[0]["id"]
+
+                # Its depth was followed before its id was known
+                if None in self._depths:
+                    self._depths[self._entry_thread] = self._depths.pop(None)
+
+    def _select_next_thread(self) -> _typ.NoReturn:
+        """
+        Selects the next thread to make a step, in turn; the list of threads
+        is refreshed once every thread has made a step.
+        """
+
+        self._run(self._select_next_thread_operation())
+
+    def _select_next_thread_operation(self) -> _typ.Generator:
+        # See `_select_next_thread` and `_run`
+        refreshed = False
+
+        while True:
+            if len(self._thread_queue) == 0:
+                if refreshed:
+                    return
+                refreshed = True
+
+                self._thread_queue.extend(self._steppable_threads((yield ("_list_threads",))))
+
+                if len(self._thread_queue) == 0:
+                    return
+
+            thread = self._thread_queue.popleft()
+
+            # The thread may have terminated since it was listed
+            try:
+                yield ("select_thread", thread["id"])
+            except _exceptions.JdbHostErrorException:
+                continue
+
+            self._thread_selected(thread)
+            return
+
+    def _thread_selected(self, thread: _typ.Dict[str, _typ.Any]) -> _typ.NoReturn:
+        # The next steps are made by a thread (as listed by `threads`)
+        self._selected_thread = thread
+        self.call_depth = self._thread_depth(thread["id"])[0]
+
+    def add_breakpoint(self, location: str) -> _typ.NoReturn:
+        """
+        Sets a breakpoint, which can be either a line (`Class:line`) or the
+        entry of a method (`Class.method`).
+
+        :param location: The location of the breakpoint.
+        """
+
+        if not self.active:
+            return
+
+        if ":" in location:
+            self._send_setup_command("stop at {}".format(location))
+        else:
+            self._send_setup_command("stop in {}".format(location))
+
+    def add_watch(self, field: str, access: bool = False) -> _typ.NoReturn:
+        """
+        Sets a watchpoint on a field (`Class.field`), which is hit whenever
+        the field is modified (or, if `access` is set, also read).
+
+        :param field: The fully qualified name of the field.
+        :param access: Whether to also stop when the field is read.
+        """
+
+        if not self.active:
+            return
+
+        self._send_setup_command("watch {}{}".format("all " if access else "", field))
+
+    def iter_samples(
+            self,
+            breakpoints: _typ.Iterable[str] = (),
+            watches: _typ.Iterable[str] = (),
+            include_locals: bool = True,
+            until: _typ.Optional[_typ.Callable[[_typ.Dict[str, _typ.Any]], bool]] = None,
+    ) -> _typ.Iterator[_typ.Dict[str, _typ.Any]]:
+        """
+        Lets the program run freely between breakpoints and watchpoints, and
+        yields a record for each hit, rather than stepping through every line.
+        Records have the format of step records, with the key "watch" for
+        watchpoints (the field, and its current and next values on a
+        modification), and "exception" for exceptions (see `step`); they are
+        also added to the trace history.
+
+        Method tracing is turned off, since it would otherwise stop the
+        program on every method entry and exit.
+
+        :param breakpoints: The breakpoints to set (see `add_breakpoint`).
+        :param watches: The fields to watch for modifications (see `add_watch`).
+        :param include_locals: Whether to record the local variables of each hit.
+        :param until: An optional predicate on records; iteration stops after
+                      the first record for which it returns `True`.
+        :return: An iterator of records, one per hit.
+        """
+
+        return self._iterate(self._iter_samples_operation(breakpoints, watches, include_locals, until))
+
+    def _iter_samples_operation(
+            self,
+            breakpoints: _typ.Iterable[str],
+            watches: _typ.Iterable[str],
+            include_locals: bool,
+            until: _typ.Optional[_typ.Callable[[_typ.Dict[str, _typ.Any]], bool]],
+    ) -> _typ.Generator:
+        # See `iter_samples` and `_iterate`
+        if not (yield ("active",)):
+            return
+
+        for location in breakpoints:
+            yield ("add_breakpoint", location)
+
+        for field in watches:
+            yield ("add_watch", field)
+
+        yield ("_send_setup_command", "untrace methods")
+
+        # Breakpoints are not consecutive steps: never reuse variables
+        self._previous_step = None
+
+        while (yield ("active",)):
+            yield ("_sendline", "cont")
+
+            try:
+                event = yield ("_expect_event", _events.STEP_OUTCOME_EVENTS)
+
+                if event.kind == _events.EVENT_EXITED:
+                    return
+
+                # Seek forward to prompt
+                yield ("_expect_event", [_events.EVENT_PROMPT])
+
+                info = self._sample_event_info(event)
+                if info is None:
+                    continue
+
+                loc = (yield ("locals",)) if include_locals or "call" in info else None
+                info = self._merge_step_locals(info, loc, include_locals)
+
+            except _exceptions.JdbHostExitedException:
+                return
+
+            # Add to record
+            self._append_trace_history(info)
+
+            yield _OPERATION_RECORD, info
+
+            if until is not None and until(info):
+                return
+
+    def _sample_event_info(self, event: _events.JdbEvent) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        """
+        Interprets the event at which the program stopped between samples
+        (see `iter_samples`).
+
+        :param event: The event, one of `events.STEP_OUTCOME_EVENTS`.
+        :return: The record of the sample, or `None` if it is not recorded.
+        """
+
+        return self._sample_info(self._step_event_info(event))
+
+    def _sample_info(self, info: _typ.Optional[_typ.Dict[str, _typ.Any]]) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        """
+        Completes the record of a sample (see `_sample_event_info`).
+
+        :param info: The location at which the program stopped.
+        :return: The record of the sample, or `None` if it is not recorded.
+        """
+
+        if info is None or self._exception_ignored(info):
+            return None
+
+        # Breakpoints at the entry of a method report its arguments
+        if info.get("bci") == 0 and "exception" not in info:
+            info["call"] = None
+
         return info
 
+    def trace_calls(self, include_arguments: bool = True) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        """
+        Lets the program run until it terminates, only tracing method entries
+        and exits (rather than stepping through every line), and builds the
+        tree of calls. Each node of the tree is a dictionary with the keys of
+        step records ("thread", "class.method", "method", "line", "bci"), as
+        well as "call" (the arguments), "return" (the return value) and
+        "calls" (the list of nodes of the nested calls). The root is the
+        current method (usually the entry method).
+
+        Entries and exits, and the exceptions at which the program stops, are
+        also added to the trace history, as records in the format of `step`.
+
+        :param include_arguments: Whether to retrieve the arguments of each
+                                  call, which requires suspending the program
+                                  at each method entry; otherwise, the program
+                                  runs without interruption.
+        :return: The root of the call tree.
+        """
+
+        return self._run(self._trace_calls_operation(include_arguments))
+
+    def _trace_calls_operation(self, include_arguments: bool) -> _typ.Generator:
+        # See `trace_calls` and `_run`
+        if not (yield ("active",)):
+            return None
+
+        root = {"method": self.entry_method, "call": None, "calls": []}
+        stacks = {}
+
+        self._previous_step = None
+
+        if include_arguments:
+            # Method tracing suspends the program at each entry and exit
+            yield ("_send_setup_command", "trace methods 1")
+        else:
+            yield ("_send_setup_command", "untrace methods")
+            yield ("_send_setup_command", "trace go methods 1")
+
+            # Events are then printed while the program keeps running
+            yield ("_sendline", "cont")
+
+        try:
+            while (yield ("active",)):
+                if include_arguments:
+                    yield ("_sendline", "cont")
+
+                event = yield ("_expect_event", _events.STEP_OUTCOME_EVENTS)
+
+                if event.kind == _events.EVENT_EXITED:
+                    break
+
+                if include_arguments or event.kind == _events.EVENT_EXCEPTION:
+                    # Seek forward to prompt
+                    yield ("_expect_event", [_events.EVENT_PROMPT])
+
+                info = self._step_event_info(event)
+
+                # The program stops where exceptions are thrown
+                if info is not None and "exception" in info:
+                    if not self._exception_ignored(info):
+                        self._append_trace_history(info)
+                    if not include_arguments:
+                        yield ("_sendline", "cont")
+                    continue
+
+                if info is None or event.kind not in (_events.EVENT_METHOD_ENTERED,
+                                                      _events.EVENT_METHOD_EXITED):
+                    continue
+
+                entered = event.kind == _events.EVENT_METHOD_ENTERED
+
+                if entered and include_arguments:
+                    info = self._merge_step_locals(info, (yield ("locals",)), include_locals=False)
+                else:
+                    info.pop("call", None)
+
+                self._record_call(root, stacks, info, entered)
+
+        except _exceptions.JdbHostExitedException:
+            pass
+
+        return root
+
+    def _record_call(
+            self,
+            root: _typ.Dict[str, _typ.Any],
+            stacks: _typ.Dict[str, _typ.List[_typ.Dict[str, _typ.Any]]],
+            info: _typ.Dict[str, _typ.Any],
+            entered: bool,
+    ) -> _typ.NoReturn:
+        """
+        Adds a method entry or exit to a call tree (see `trace_calls`).
+
+        :param root: The root of the tree.
+        :param stacks: The nodes of the calls in progress, by thread.
+        :param info: The record of the entry or exit.
+        :param entered: Whether the method was entered.
+        """
+
+        stack = stacks.setdefault(info.get("thread"), [root])
+
+        if entered:
+            node = dict(info)
+            node.setdefault("call", None)
+            node["calls"] = []
+            stack[-1]["calls"].append(node)
+            stack.append(node)
+
+        else:
+            stack[-1]["return"] = info.get("return")
+            if len(stack) > 1:
+                stack.pop()
+
+        self._append_trace_history(info)
+
     def locals(
         self
     ) -> _typ.Optional[_typ.Tuple[_typ.Dict[str, _typ.Any], _typ.Dict[str, _typ.Any]]]:
@@ -271,62 +1655,295 @@ class JdbProcess(object):
         # Print out all local variables
         self.pty.sendline("locals")
 
-        # Expect the variables from method arguments (or a message that we don't have
-        # debug information for this frame).
-        self.pty.expect(
-            "(No local variables[^\r\n]*|.*ocal variable "
-            "information not available[^\r\n]*|Method arguments:)")
+        return self._expect_locals()
+
+    @staticmethod
+    def _parse_print_events(
+            names: _typ.Iterable[str],
+            events: _typ.Iterable[_events.JdbEvent],
+    ) -> _typ.Dict[str, _typ.Any]:
+        """
+        Parses the output of `print` commands.
 
-        # If there is debug information, which we detect by the presence of the message
-        # "Method", then also look for local variables.
-        if "Method" in self.pty.after:
-            self.pty.expect("Local variables:")
+        :param names: The variables that were printed.
+        :param events: The events read before the prompts that followed `print`.
+        :return: The parsed values of the variables that were found.
+        """
 
-        raw_str_args = self.pty.before
+        text = "\n".join(event.text for event in events if event.kind == _events.EVENT_OUTPUT)
 
-        # Seek forward to prompt
-        self.pty.expect(r".*\[.*\] ")
+        # Unknown variables (reported as a `ParseException`) are left out
+        values = _helpers.parse_jdb_values(text)
 
-        raw_str_locals = self.pty.after
+        return {name: values[name] for name in names if name in values}
 
-        # Parse the strings
-        args = _helpers.parse_jdb_values(raw_str_args)
-        local = _helpers.parse_jdb_values(raw_str_locals)
+    def print_values(self, names: _typ.Iterable[str]) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        """
+        Retrieves the value of some variables only, using the `print` command
+        of `jdb`, which is cheaper than `locals` for methods with many (or
+        large) variables. The commands are sent together, and their output
+        parsed in a single pass.
 
-        return args, local
+        :param names: The names of the variables (or fields, such as `this.x`).
+        :return: A dictionary of the values of the variables that were found.
+        """
 
-    def dump(self, obj: str) -> _typ.Optional[str]:
         if not self.active:
             return None
 
-        # First get a prompt
-        self.pty.sendline("")
-        self.pty.expect(r".*\[.*\] ")
-        rawstr_prompt = self.pty.after.strip()
+        names = list(names)
+
+        for name in names:
+            self.pty.sendline("print {}".format(name))
+
+        events = []
+        for _ in names:
+            events += self.events.read_until_prompt()
+
+        return self._parse_print_events(names, events)
+
+    @staticmethod
+    def _parse_dump_events(obj: str, events: _typ.Iterable[_events.JdbEvent]) -> _typ.Any:
+        """
+        Parses the output of a `dump` command.
+
+        :param obj: The expression that was dumped.
+        :param events: The events read before the prompt that followed `dump`.
+        :return: The parsed value (a dictionary of fields for objects), or
+                 `None` if it could not be found.
+        """
+
+        lines = [event.text for event in events if event.kind == _events.EVENT_OUTPUT]
+        prefix = "{} =".format(obj)
+
+        # Find the line of the obj name and equal sign (skipping the echo)
+        for (index, line) in enumerate(lines):
+            line = line.strip()
+            if not line.startswith(prefix):
+                continue
 
-        # Escape prompt
-        esc_prompt = rawstr_prompt
-        esc_prompt = esc_prompt.replace("[", r"\[")
-        esc_prompt = esc_prompt.replace("]", r"\]")
+            text = line[len(prefix):].strip()
+
+            # Objects are printed with one field per line, up to a brace
+            if text == "{":
+                text = "\n".join(["{"] + lines[index + 1:])
+
+            return _helpers.parse_jdb_dump(text)
+
+        return None
+
+    def dump(self, obj: str) -> _typ.Any:
+        """
+        Dumps the value of an expression, with the `dump` command of `jdb`:
+        objects are returned as a dictionary of their fields (in which other
+        objects are left as references), and arrays as lists.
+
+        :param obj: The expression to dump (e.g. a variable name).
+        :return: The parsed value, or `None` if it could not be dumped.
+        """
+
+        if not self.active:
+            return None
 
         # Send command
         self.pty.sendline("dump {}".format(obj))
 
-        # Expect output
-        pattern = "{obj} = .*{prompt}".format(obj=obj, prompt=esc_prompt)
-        self.pty.expect(pattern)
+        # Collect output until the next prompt
+        with self.stats.timer(_stats.PHASE_DUMP):
+            return self._parse_dump_events(obj, self.events.read_until_prompt())
+
+    def dump_many(self, objs: _typ.Iterable[str]) -> _typ.Optional[_typ.List[_typ.Any]]:
+        """
+        Dumps the values of several expressions (see `dump`), sending all the
+        commands before reading their output.
+
+        :param objs: The expressions to dump.
+        :return: The list of parsed values, in the same order.
+        """
+
+        if not self.active:
+            return None
+
+        objs = list(objs)
+
+        for obj in objs:
+            self.pty.sendline("dump {}".format(obj))
+
+        with self.stats.timer(_stats.PHASE_DUMP):
+            return [self._parse_dump_events(obj, self.events.read_until_prompt()) for obj in objs]
+
+    @staticmethod
+    def _find_references(
+            values: _typ.Iterable[_typ.Tuple[_typ.Any, _typ.Any]],
+            container: _typ.Any,
+            expr: _typ.Callable[[_typ.Any], str],
+    ) -> _typ.List[_typ.Tuple[_typ.Any, _typ.Any, str, _objects.JdbReference]]:
+        # List the (container, key, expression, reference) of the values
+        # which reference objects, and still have to be resolved
+        pending = []
+
+        for (key, value) in values:
+            if isinstance(value, _objects.JdbReference):
+                reference = value
+            else:
+                reference = _helpers.parse_jdb_reference(value)
+                if reference is None:
+                    continue
+                reference = _objects.JdbReference(*reference)
+
+            pending.append((container, key, expr(key), reference))
+
+        return pending
+
+    def _object_references(
+            self,
+            obj: _objects.JdbObject,
+            expr: str,
+    ) -> _typ.List[_typ.Tuple[_typ.Any, _typ.Any, str, _objects.JdbReference]]:
+        # Inherited fields are printed with their class ("Base.field"), but
+        # are accessed by their name
+        if obj.elements is not None:
+            return self._find_references(
+                enumerate(obj.elements), obj.elements, lambda index: "{}[{}]".format(expr, index))
+
+        if obj.fields is not None:
+            return self._find_references(
+                obj.fields.items(), obj.fields, lambda name: "{}.{}".format(expr, name.split(".")[-1]))
+
+        return []
+
+    def _resolve_level(
+            self,
+            pending: _typ.List[_typ.Tuple[_typ.Any, _typ.Any, str, _objects.JdbReference]],
+            dumped: _typ.Dict[int, _typ.Tuple[str, _objects.JdbReference, _typ.Any]],
+    ) -> _typ.List[_typ.Tuple[_typ.Any, _typ.Any, str, _objects.JdbReference]]:
+        # Build the objects that were just dumped, replace the references by
+        # the objects, and return the references of the next level
+        for (expr, reference, value) in dumped.values():
+            obj = _objects.JdbObject(reference.type_name, reference.id)
+
+            if isinstance(value, dict):
+                obj.fields = value
+            elif isinstance(value, list):
+                obj.elements = value
+
+            self._objects[reference.id] = obj
+
+        next_pending = []
+        expanded = set()
 
-        # Parse output
-        ret = self.pty.after
+        for (container, key, expr, reference) in pending:
+            obj = self._objects.get(reference.id)
+            if obj is None:
+                continue
 
-        # - remove last line break and prompt that follows
-        last_line_break = ret.rfind("\n")
-        ret = ret[:last_line_break].strip()
+            container[key] = obj
 
-        # - remove obj name and equal sign
-        ret = ret.replace("{} =".format(obj), "").strip()
+            # Objects found in the cache may have unresolved references too
+            if reference.id not in expanded:
+                expanded.add(reference.id)
+                next_pending += self._object_references(obj, expr)
 
-        # Parse the value
-        parsed_ret = _helpers.parse_jdb_value(ret)
+        return next_pending
+
+    def _references_to_dump(
+            self,
+            pending: _typ.List[_typ.Tuple[_typ.Any, _typ.Any, str, _objects.JdbReference]],
+    ) -> _typ.Dict[int, _typ.Tuple[str, _objects.JdbReference]]:
+        # Objects are dumped once, through the first expression reaching them
+        to_dump = {}
+
+        for (_, _, expr, reference) in pending:
+            if reference.id not in self._objects and reference.id not in to_dump:
+                to_dump[reference.id] = (expr, reference)
+
+        return to_dump
+
+    def resolve_objects(
+            self,
+            values: _typ.Mapping[str, _typ.Any],
+            depth: _typ.Optional[int] = None,
+    ) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        """
+        Resolves the objects referenced by some variables into `JdbObject`
+        instances, with their fields (or elements), following references up
+        to a maximum depth; references beyond it are left as `JdbReference`.
+
+        Objects are dumped one level at a time, the `dump` commands of a level
+        being sent together, and each object is dumped at most once per step:
+        they are cached by id until the next step, so that objects which are
+        shared, or reached again through a cycle, are not dumped again.
+
+        :param values: The variables, by name (e.g. as returned by `locals`).
+        :param depth: The maximum number of references followed from the
+                      variables; by default, `object_depth`.
+        :return: A copy of `values`, in which references are resolved.
+        """
+
+        return self._run(self._resolve_objects_operation(values, depth))
+
+    def _resolve_objects_operation(
+            self,
+            values: _typ.Mapping[str, _typ.Any],
+            depth: _typ.Optional[int],
+    ) -> _typ.Generator:
+        # See `resolve_objects` and `_run`
+        if not (yield ("active",)):
+            return None
+
+        if depth is None:
+            depth = self.object_depth
+
+        result = dict(values)
+        pending = self._find_references(result.items(), result, lambda name: name)
+
+        for _ in range(depth):
+            if len(pending) == 0:
+                break
+
+            to_dump = self._references_to_dump(pending)
+            dumped = (yield ("dump_many", [expr for (expr, _) in to_dump.values()])) or []
+
+            pending = self._resolve_level(pending, {
+                id: (expr, reference, value)
+                for ((id, (expr, reference)), value) in zip(to_dump.items(), dumped)
+            })
+
+        # Leave the references beyond the maximum depth unresolved, unless
+        # they point back to objects that were already dumped
+        for (container, key, _, reference) in pending:
+            container[key] = self._objects.get(reference.id, reference)
+
+        return result
+
+    def snapshot_locals(
+            self,
+            depth: _typ.Optional[int] = None,
+    ) -> _typ.Optional[_typ.Tuple[_typ.Dict[str, _typ.Any], _typ.Dict[str, _typ.Any]]]:
+        """
+        Retrieves the method arguments and local variables (reusing those of
+        the current step, if they were already retrieved), and resolves the
+        objects they reference (see `resolve_objects`).
+
+        :param depth: The maximum number of references followed.
+        :return: A tuple of the arguments and local variables.
+        """
+
+        return self._run(self._snapshot_locals_operation(depth))
+
+    def _snapshot_locals_operation(self, depth: _typ.Optional[int]) -> _typ.Generator:
+        # See `snapshot_locals` and `_run`
+        loc = self.current_locals
+        if loc is None:
+            loc = yield ("locals",)
+            if loc is None:
+                return None
+
+        (args, local) = loc
+
+        # Resolve both at once, as they may reference the same objects
+        values = yield ("resolve_objects", dict(_itertools.chain(args.items(), local.items())), depth)
+        if values is None:
+            return None
 
-        return parsed_ret
+        return {name: values[name] for name in args}, {name: values[name] for name in local}
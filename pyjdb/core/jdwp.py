@@ -0,0 +1,480 @@
+import collections as _collections
+import socket as _socket
+import struct as _struct
+import typing as _typ
+
+from pyjdb.core import exceptions as _exceptions
+from pyjdb.core import stats as _stats
+
+
+# See the specification of the Java Debug Wire Protocol:
+# https://docs.oracle.com/javase/8/docs/platform/jpda/jdwp/jdwp-protocol.html
+
+JDWP_HANDSHAKE = b"JDWP-Handshake"
+
+JDWP_HEADER = _struct.Struct(">IIB")
+JDWP_COMMAND = _struct.Struct(">BB")
+JDWP_ERROR = _struct.Struct(">H")
+
+JDWP_FLAG_REPLY = 0x80
+
+# Error code of commands on classes compiled without debugging information
+JDWP_ERROR_ABSENT_INFORMATION = 101
+
+# Modifier bit of static fields and methods
+JDWP_ACC_STATIC = 0x0008
+
+# Status bit of classes whose methods and fields can be inspected
+JDWP_CLASS_STATUS_PREPARED = 0x0002
+
+# Command sets and commands (as (command set, command) tuples)
+
+CMD_VM_CLASSES_BY_SIGNATURE = (1, 2)
+CMD_VM_ALL_THREADS = (1, 4)
+CMD_VM_DISPOSE = (1, 6)
+CMD_VM_ID_SIZES = (1, 7)
+CMD_VM_RESUME = (1, 9)
+
+CMD_REFERENCE_TYPE_SIGNATURE = (2, 1)
+CMD_REFERENCE_TYPE_FIELDS = (2, 4)
+CMD_REFERENCE_TYPE_METHODS = (2, 5)
+CMD_REFERENCE_TYPE_GET_VALUES = (2, 6)
+CMD_REFERENCE_TYPE_SOURCE_FILE = (2, 7)
+
+CMD_CLASS_TYPE_SUPERCLASS = (3, 1)
+
+CMD_METHOD_LINE_TABLE = (6, 1)
+CMD_METHOD_VARIABLE_TABLE = (6, 2)
+
+CMD_OBJECT_REFERENCE_TYPE = (9, 1)
+CMD_OBJECT_REFERENCE_GET_VALUES = (9, 2)
+
+CMD_STRING_REFERENCE_VALUE = (10, 1)
+
+CMD_THREAD_REFERENCE_NAME = (11, 1)
+CMD_THREAD_REFERENCE_SUSPEND = (11, 2)
+CMD_THREAD_REFERENCE_RESUME = (11, 3)
+CMD_THREAD_REFERENCE_STATUS = (11, 4)
+CMD_THREAD_REFERENCE_THREAD_GROUP = (11, 5)
+CMD_THREAD_REFERENCE_FRAMES = (11, 6)
+
+CMD_THREAD_GROUP_REFERENCE_NAME = (12, 1)
+
+CMD_ARRAY_REFERENCE_LENGTH = (13, 1)
+CMD_ARRAY_REFERENCE_GET_VALUES = (13, 2)
+
+CMD_EVENT_REQUEST_SET = (15, 1)
+CMD_EVENT_REQUEST_CLEAR = (15, 2)
+
+CMD_STACK_FRAME_GET_VALUES = (16, 1)
+CMD_STACK_FRAME_THIS_OBJECT = (16, 3)
+
+CMD_EVENT_COMPOSITE = (64, 100)
+
+# Event kinds
+
+EVENT_KIND_SINGLE_STEP = 1
+EVENT_KIND_BREAKPOINT = 2
+EVENT_KIND_EXCEPTION = 4
+EVENT_KIND_THREAD_START = 6
+EVENT_KIND_THREAD_DEATH = 7
+EVENT_KIND_CLASS_PREPARE = 8
+EVENT_KIND_FIELD_ACCESS = 20
+EVENT_KIND_FIELD_MODIFICATION = 21
+EVENT_KIND_METHOD_ENTRY = 40
+EVENT_KIND_METHOD_EXIT = 41
+EVENT_KIND_METHOD_EXIT_WITH_RETURN_VALUE = 42
+EVENT_KIND_VM_START = 90
+EVENT_KIND_VM_DEATH = 99
+
+# Event request modifiers, suspend policies and step sizes and depths
+
+MOD_COUNT = 1
+MOD_THREAD_ONLY = 3
+MOD_CLASS_MATCH = 5
+MOD_CLASS_EXCLUDE = 6
+MOD_LOCATION_ONLY = 7
+MOD_EXCEPTION_ONLY = 8
+MOD_FIELD_ONLY = 9
+MOD_STEP = 10
+
+SUSPEND_NONE = 0
+SUSPEND_EVENT_THREAD = 1
+SUSPEND_ALL = 2
+
+STEP_SIZE_LINE = 1
+
+STEP_DEPTH_INTO = 0
+STEP_DEPTH_OVER = 1
+STEP_DEPTH_OUT = 2
+
+# Statuses of threads, as printed by the `threads` command of `jdb`
+JDWP_THREAD_STATUSES = {
+    0: "zombie",
+    1: "running",
+    2: "sleeping",
+    3: "waiting in a monitor",
+    4: "cond. waiting",
+}
+
+# Type tags of references, and tags of values
+
+TYPE_TAG_CLASS = 1
+
+TAG_ARRAY = ord("[")
+TAG_BYTE = ord("B")
+TAG_CHAR = ord("C")
+TAG_OBJECT = ord("L")
+TAG_FLOAT = ord("F")
+TAG_DOUBLE = ord("D")
+TAG_INT = ord("I")
+TAG_LONG = ord("J")
+TAG_SHORT = ord("S")
+TAG_VOID = ord("V")
+TAG_BOOLEAN = ord("Z")
+TAG_STRING = ord("s")
+
+# Formats of primitive values (other tags are followed by an object id)
+JDWP_PRIMITIVES = {
+    TAG_BYTE: _struct.Struct(">b"),
+    TAG_CHAR: _struct.Struct(">H"),
+    TAG_FLOAT: _struct.Struct(">f"),
+    TAG_DOUBLE: _struct.Struct(">d"),
+    TAG_INT: _struct.Struct(">i"),
+    TAG_LONG: _struct.Struct(">q"),
+    TAG_SHORT: _struct.Struct(">h"),
+    TAG_BOOLEAN: _struct.Struct(">?"),
+}
+
+JDWP_PRIMITIVE_NAMES = {
+    "B": "byte",
+    "C": "char",
+    "D": "double",
+    "F": "float",
+    "I": "int",
+    "J": "long",
+    "S": "short",
+    "Z": "boolean",
+    "V": "void",
+}
+
+_U8 = _struct.Struct(">B")
+_I32 = _struct.Struct(">i")
+_I64 = _struct.Struct(">q")
+
+
+# A location in the bytecode: the class, the method and the bytecode index
+JdwpLocation = _collections.namedtuple("JdwpLocation", ["type_tag", "class_id", "method_id", "index"])
+
+# A value, with its tag (for objects, the value is the object id)
+JdwpValue = _collections.namedtuple("JdwpValue", ["tag", "value"])
+
+# An event of a composite event packet; `value` is the return value of a
+# method exit, the exception of an exception event, or the value about to be
+# assigned by a field modification, and `catch_location` the handler of an
+# exception (with a `class_id` of 0 if it is uncaught); field events also
+# carry the class (`type_id`), the field and the object (0 if it is static)
+JdwpEvent = _collections.namedtuple(
+    "JdwpEvent",
+    ["kind", "request_id", "thread", "location", "value", "type_id", "signature", "catch_location", "field_id",
+     "object_id"],
+    defaults=[None, None],
+)
+
+
+def signature_to_name(signature: str) -> str:
+    """
+    Returns the name of a type (as printed by `jdb`) given its JNI signature,
+    for instance "java.lang.String[]" for "[Ljava/lang/String;".
+
+    :param signature: The signature of the type.
+    :return: The name of the type.
+    """
+
+    dimensions = len(signature) - len(signature.lstrip("["))
+    base = signature[dimensions:]
+
+    if base[:1] == "L":
+        name = base[1:].rstrip(";").replace("/", ".")
+    else:
+        name = JDWP_PRIMITIVE_NAMES.get(base, base)
+
+    return name + "[]" * dimensions
+
+
+class JdwpReader(object):
+    """
+    Decodes the data of a JDWP packet, given the sizes of the identifiers
+    negotiated with the VM.
+    """
+
+    def __init__(self, data: bytes, id_sizes: _typ.Optional[_typ.Dict[str, int]] = None):
+        self.data = data
+        self.offset = 0
+        self.id_sizes = id_sizes or {}
+
+    def _unpack(self, fmt: _struct.Struct) -> _typ.Any:
+        (value,) = fmt.unpack_from(self.data, self.offset)
+        self.offset += fmt.size
+        return value
+
+    def u8(self) -> int:
+        return self._unpack(_U8)
+
+    def i32(self) -> int:
+        return self._unpack(_I32)
+
+    def i64(self) -> int:
+        return self._unpack(_I64)
+
+    def id(self, kind: str = "object") -> int:
+        size = self.id_sizes.get(kind, 8)
+        value = int.from_bytes(self.data[self.offset:self.offset + size], "big")
+        self.offset += size
+        return value
+
+    def string(self) -> str:
+        length = self.i32()
+        value = self.data[self.offset:self.offset + length].decode("utf-8", "replace")
+        self.offset += length
+        return value
+
+    def location(self) -> JdwpLocation:
+        return JdwpLocation(self.u8(), self.id("reference_type"), self.id("method"), self.i64())
+
+    def untagged_value(self, tag: int) -> JdwpValue:
+        if tag == TAG_VOID:
+            return JdwpValue(tag, None)
+
+        fmt = JDWP_PRIMITIVES.get(tag)
+        if fmt is not None:
+            return JdwpValue(tag, self._unpack(fmt))
+
+        return JdwpValue(tag, self.id("object"))
+
+    def value(self) -> JdwpValue:
+        return self.untagged_value(self.u8())
+
+
+class JdwpWriter(object):
+    """
+    Encodes the data of a JDWP command packet.
+    """
+
+    def __init__(self, id_sizes: _typ.Optional[_typ.Dict[str, int]] = None):
+        self.parts = []
+        self.id_sizes = id_sizes or {}
+
+    def u8(self, value: int) -> "JdwpWriter":
+        self.parts.append(_U8.pack(value))
+        return self
+
+    def i32(self, value: int) -> "JdwpWriter":
+        self.parts.append(_I32.pack(value))
+        return self
+
+    def i64(self, value: int) -> "JdwpWriter":
+        self.parts.append(_I64.pack(value))
+        return self
+
+    def id(self, value: int, kind: str = "object") -> "JdwpWriter":
+        self.parts.append(value.to_bytes(self.id_sizes.get(kind, 8), "big"))
+        return self
+
+    def string(self, value: str) -> "JdwpWriter":
+        data = value.encode("utf-8")
+        self.parts.append(_I32.pack(len(data)))
+        self.parts.append(data)
+        return self
+
+    def location(self, location: JdwpLocation) -> "JdwpWriter":
+        self.u8(location.type_tag)
+        self.id(location.class_id, "reference_type")
+        self.id(location.method_id, "method")
+        return self.i64(location.index)
+
+    def getvalue(self) -> bytes:
+        return b"".join(self.parts)
+
+
+class JdwpConnection(object):
+    """
+    Connection to the JDWP agent of a JVM: sends commands and waits for their
+    replies, queueing the events which the VM sends in the meantime.
+    """
+
+    def __init__(
+            self,
+            host: str,
+            port: int,
+            timeout: _typ.Optional[float] = 30,
+            stats: _typ.Optional[_stats.JdbStats] = None,
+    ):
+        self.stats = stats
+        self.socket = _socket.create_connection((host, port), timeout=timeout)
+        self.socket.setsockopt(_socket.IPPROTO_TCP, _socket.TCP_NODELAY, 1)
+        self.file = self.socket.makefile("rb")
+        self.events = _collections.deque()
+        self.closed = False
+        self._next_id = 1
+
+        # Both sides start by sending the same handshake
+        self.socket.sendall(JDWP_HANDSHAKE)
+        if self._read_exactly(len(JDWP_HANDSHAKE)) != JDWP_HANDSHAKE:
+            raise _exceptions.JdbException("Invalid JDWP handshake.")
+
+        # Identifiers may have different sizes depending on the VM
+        self.id_sizes = {}
+        reply = self.command(CMD_VM_ID_SIZES)
+        for kind in ["field", "method", "object", "reference_type", "frame"]:
+            self.id_sizes[kind] = reply.i32()
+
+    def _read_exactly(self, size: int) -> bytes:
+        try:
+            data = self.file.read(size)
+        except _socket.timeout:
+            raise _exceptions.JdbTimeoutException("Timeout exceeded while waiting for the VM.")
+        except OSError:
+            data = b""
+
+        if len(data) < size:
+            self.closed = True
+            raise _exceptions.JdbHostExitedException("The VM has disconnected.")
+
+        return data
+
+    def _read_packet(self) -> _typ.Tuple[int, int, bytes, bytes]:
+        # Returns the id, flags, command or error code, and data of a packet
+        if self.stats is None:
+            (length, packet_id, flags) = JDWP_HEADER.unpack(self._read_exactly(JDWP_HEADER.size))
+            rest = self._read_exactly(length - JDWP_HEADER.size)
+        else:
+            with self.stats.timer(_stats.PHASE_READ):
+                (length, packet_id, flags) = JDWP_HEADER.unpack(self._read_exactly(JDWP_HEADER.size))
+                rest = self._read_exactly(length - JDWP_HEADER.size)
+            self.stats.record_read(length)
+
+        return packet_id, flags, rest[:2], rest[2:]
+
+    def writer(self) -> JdwpWriter:
+        return JdwpWriter(self.id_sizes)
+
+    def send(self, command: _typ.Tuple[int, int], data: bytes = b"") -> int:
+        """
+        Sends a command, without waiting for its reply.
+
+        :param command: The command set and command.
+        :param data: The data of the command.
+        :return: The id of the command packet.
+        """
+
+        packet_id = self._next_id
+        self._next_id += 1
+
+        header = JDWP_HEADER.pack(JDWP_HEADER.size + JDWP_COMMAND.size + len(data), packet_id, 0)
+        self.socket.sendall(header + JDWP_COMMAND.pack(*command) + data)
+
+        return packet_id
+
+    def _queue_event(self, data: bytes) -> _typ.NoReturn:
+        reader = JdwpReader(data, self.id_sizes)
+        suspend_policy = reader.u8()
+        events = [self._read_event(reader) for _ in range(reader.i32())]
+        self.events.append((suspend_policy, events))
+
+        if self.stats is not None:
+            self.stats.events += len(events)
+
+    def _read_event(self, reader: JdwpReader) -> JdwpEvent:
+        kind = reader.u8()
+        request_id = reader.i32()
+        thread = location = value = type_id = signature = catch_location = field_id = object_id = None
+
+        if kind == EVENT_KIND_VM_DEATH:
+            pass
+
+        elif kind == EVENT_KIND_CLASS_PREPARE:
+            thread = reader.id()
+            reader.u8()
+            type_id = reader.id("reference_type")
+            signature = reader.string()
+            reader.i32()
+
+        elif kind in (EVENT_KIND_VM_START, EVENT_KIND_THREAD_START, EVENT_KIND_THREAD_DEATH):
+            thread = reader.id()
+
+        else:
+            thread = reader.id()
+            location = reader.location()
+
+            if kind == EVENT_KIND_METHOD_EXIT_WITH_RETURN_VALUE:
+                value = reader.value()
+            elif kind == EVENT_KIND_EXCEPTION:
+                value = reader.value()
+                catch_location = reader.location()
+            elif kind in (EVENT_KIND_FIELD_ACCESS, EVENT_KIND_FIELD_MODIFICATION):
+                reader.u8()
+                type_id = reader.id("reference_type")
+                field_id = reader.id("field")
+                object_id = reader.value().value
+                if kind == EVENT_KIND_FIELD_MODIFICATION:
+                    value = reader.value()
+
+        return JdwpEvent(
+            kind, request_id, thread, location, value, type_id, signature, catch_location, field_id, object_id)
+
+    def command(self, command: _typ.Tuple[int, int], data: bytes = b"") -> JdwpReader:
+        """
+        Sends a command and waits for its reply; events received in the
+        meantime are queued.
+
+        :param command: The command set and command.
+        :param data: The data of the command.
+        :return: A reader of the data of the reply.
+        """
+
+        packet_id = self.send(command, data)
+
+        while True:
+            (reply_id, flags, code, data) = self._read_packet()
+
+            if flags & JDWP_FLAG_REPLY:
+                if reply_id != packet_id:
+                    continue
+
+                (error,) = JDWP_ERROR.unpack(code)
+                if error != 0:
+                    raise _exceptions.JdwpErrorException(command, error)
+
+                return JdwpReader(data, self.id_sizes)
+
+            if tuple(code) == CMD_EVENT_COMPOSITE:
+                self._queue_event(data)
+
+    def wait_event(self) -> _typ.Tuple[int, _typ.List[JdwpEvent]]:
+        """
+        Waits for the next composite event sent by the VM.
+
+        :return: A tuple of the suspend policy and the list of events.
+        """
+
+        if self.stats is not None:
+            self.stats.expects += 1
+
+        while len(self.events) == 0:
+            (_, flags, code, data) = self._read_packet()
+            if not flags & JDWP_FLAG_REPLY and tuple(code) == CMD_EVENT_COMPOSITE:
+                self._queue_event(data)
+
+        return self.events.popleft()
+
+    def close(self) -> _typ.NoReturn:
+        self.closed = True
+
+        # noinspection PyBroadException
+        try:
+            self.file.close()
+            self.socket.close()
+        except:
+            pass
+
@@ -0,0 +1,1426 @@
+import bisect as _bisect
+import functools as _functools
+import os as _os
+import re as _re
+import typing as _typ
+
+import pexpect as _pexpect
+
+from pyjdb.core import helpers as _helpers, exceptions as _exceptions
+from pyjdb.core import jdb_process as _jdb_process
+from pyjdb.core import jdwp as _jdwp
+from pyjdb.core import stats as _stats
+
+
+# Depths of the steps made with each modifier of the `step` command of `jdb`
+JDWP_STEP_DEPTHS = {
+    "": _jdwp.STEP_DEPTH_INTO,
+    " in": _jdwp.STEP_DEPTH_INTO,
+    " over": _jdwp.STEP_DEPTH_OVER,
+    " up": _jdwp.STEP_DEPTH_OUT,
+}
+
+# Events at which a step stops, by order of precedence (a single step may
+# trigger several of them, for instance a method entry and a line step)
+JDWP_STEP_EVENTS = (
+    _jdwp.EVENT_KIND_METHOD_EXIT_WITH_RETURN_VALUE,
+    _jdwp.EVENT_KIND_METHOD_ENTRY,
+    _jdwp.EVENT_KIND_SINGLE_STEP,
+    _jdwp.EVENT_KIND_BREAKPOINT,
+)
+
+# Events of method entries and exits (see `trace_calls`)
+JDWP_METHOD_EVENTS = (
+    _jdwp.EVENT_KIND_METHOD_ENTRY,
+    _jdwp.EVENT_KIND_METHOD_EXIT_WITH_RETURN_VALUE,
+)
+
+# Events at which the program stops between samples (see `iter_samples`), by
+# order of precedence
+JDWP_SAMPLE_EVENTS = (
+    _jdwp.EVENT_KIND_EXCEPTION,
+    _jdwp.EVENT_KIND_BREAKPOINT,
+    _jdwp.EVENT_KIND_FIELD_MODIFICATION,
+    _jdwp.EVENT_KIND_FIELD_ACCESS,
+)
+
+# Expressions which can be evaluated: a variable (or `this`), followed by
+# fields and array elements (e.g. "this.nodes[2].next")
+REGEXP_PATT_JDWP_EXPRESSION = r"\s*([A-Za-z_$][\w$]*)((?:\s*\.\s*[A-Za-z_$][\w$]*|\s*\[\s*[0-9]+\s*\])*)\s*"
+REGEXP_PATT_JDWP_ACCESSOR = r"\.\s*([A-Za-z_$][\w$]*)|\[\s*([0-9]+)\s*\]"
+
+
+def _shortest_float(value: float) -> float:
+    # Floats are sent with single precision: keep the shortest decimal which
+    # rounds to the same single, as printed by `jdb` (e.g. 0.1, rather than
+    # 0.10000000149011612)
+    packed = _jdwp.JDWP_PRIMITIVES[_jdwp.TAG_FLOAT].pack(value)
+
+    for precision in range(1, 10):
+        candidate = float("{:.{}g}".format(value, precision))
+        if _jdwp.JDWP_PRIMITIVES[_jdwp.TAG_FLOAT].pack(candidate) == packed:
+            return candidate
+
+    return value
+
+
+class JdwpProcess(_jdb_process.JdbProcess):
+    """
+    Debugging session which talks to the JDWP agent of the target JVM
+    directly, instead of scraping the output of `jdb`: a step, or `locals`,
+    is then a few binary commands on a socket rather than a line of text
+    whose output must be read up to the next prompt and parsed. Step records
+    and values are in the same format as with `JdbProcess`.
+
+    The target is always launched separately (as with `capture_target`).
+    Stepping, breakpoints, watches, samples, call trees, `locals`,
+    `print_values` and `dump` (of variables, fields and array elements) are
+    supported.
+    """
+
+    def __init__(self, class_name, class_path=None, entry_method="main", exclude_classes=None,
+                 include_classes=None, include_methods=None):
+        super().__init__(
+            class_name,
+            class_path=class_path,
+            entry_method=entry_method,
+            exclude_classes=exclude_classes,
+            include_classes=include_classes,
+            include_methods=include_methods,
+        )
+        self.connection = None
+        self.timeout = 30
+        self._reset_session()
+
+    def _reset_session(self) -> _typ.NoReturn:
+        # The thread being traced (and the thread which reached the entry
+        # method), its current frame, the pending step of each thread, and
+        # the requests of method entries and exits
+        self._thread = None
+        self._entry_thread = None
+        self._dead_threads = set()
+        self._frame = None
+        self._step_requests = {}
+        self._method_requests = []
+        self._exception_request = None
+
+        # The breakpoints and watches set in classes which are not loaded yet,
+        # by class: the request of the class being prepared, and the setups
+        # to retry then
+        self._deferred = {}
+
+        # Information on the classes, methods and objects of the VM, which
+        # does not change during a session
+        self._signatures = {}
+        self._methods = {}
+        self._line_tables = {}
+        self._variable_tables = {}
+        self._fields = {}
+        self._class_fields = {}
+        self._sources = {}
+        self._source_files = {}
+        self._thread_names = {}
+        self._thread_groups = {}
+        self._object_types = {}
+        self._array_lengths = {}
+
+    @property
+    def active(self) -> bool:
+        """
+        Provides whether the `JdwpProcess` is active. If it is not, it must be
+        reset using the `spawn` method.
+
+        :return: A `Boolean` representing the status of the `JdwpProcess`.
+        """
+
+        return self.connection is not None and not self.connection.closed
+
+    def close(self):
+        if self.connection is not None:
+            # noinspection PyBroadException
+            try:
+                if not self.connection.closed:
+                    self.connection.send(_jdwp.CMD_VM_DISPOSE)
+            except:
+                pass
+            finally:
+                self.connection.close()
+
+        super().close()
+
+    def _apply_command_timeout(self) -> _typ.NoReturn:
+        if self.connection is not None and not self.connection.closed:
+            self.connection.socket.settimeout(self.command_timeout)
+
+    def _command(self, command: _typ.Tuple[int, int], writer: _typ.Optional[_jdwp.JdwpWriter] = None):
+        return self.connection.command(command, b"" if writer is None else writer.getvalue())
+
+    def _writer(self) -> _jdwp.JdwpWriter:
+        return self.connection.writer()
+
+    def _excluded_patterns(self) -> _typ.List[str]:
+        return _helpers.JDB_DEFAULT_EXCLUDED + list(self.exclude_classes or [])
+
+    def _set_request(
+            self,
+            kind: int,
+            modifiers: _typ.List[_jdwp.JdwpWriter],
+            suspend_policy: int = _jdwp.SUSPEND_ALL,
+    ) -> int:
+        """
+        Sets an event request (the equivalent of `stop`, `catch`, `trace` or
+        `step` commands).
+
+        :param kind: The kind of events (one of `EVENT_KIND_*`).
+        :param modifiers: The modifiers filtering the events, in order.
+        :param suspend_policy: The threads suspended when an event occurs.
+        :return: The id of the request.
+        """
+
+        writer = self._writer().u8(kind).u8(suspend_policy).i32(len(modifiers))
+        writer.parts += [part for modifier in modifiers for part in modifier.parts]
+
+        return self._command(_jdwp.CMD_EVENT_REQUEST_SET, writer).i32()
+
+    def _clear_request(self, kind: int, request_id: int) -> _typ.NoReturn:
+        # Requests which have expired may already have been deleted
+        try:
+            self._command(_jdwp.CMD_EVENT_REQUEST_CLEAR, self._writer().u8(kind).i32(request_id))
+        except _exceptions.JdwpErrorException:
+            pass
+
+    def _class_modifiers(self) -> _typ.List[_jdwp.JdwpWriter]:
+        modifiers = [
+            self._writer().u8(_jdwp.MOD_CLASS_EXCLUDE).string(pattern)
+            for pattern in self._excluded_patterns()
+        ]
+
+        # The VM can filter events itself when a single pattern of classes
+        # is traced (as the modifiers of a request must all match); other
+        # filters are applied as the steps are made (see `step`)
+        if self.include_classes is not None and len(self.include_classes) == 1:
+            modifiers.append(self._writer().u8(_jdwp.MOD_CLASS_MATCH).string(self.include_classes[0]))
+
+        return modifiers
+
+    def _resume(self) -> _typ.NoReturn:
+        # Frames are only valid while the thread is suspended
+        self._frame = None
+        self._command(_jdwp.CMD_VM_RESUME)
+
+    def _wait_for(self, kind: int) -> _jdwp.JdwpEvent:
+        # Wait for an event of a kind, resuming the VM after the others
+        while True:
+            (suspend_policy, events) = self.connection.wait_event()
+
+            for event in events:
+                if event.kind == kind:
+                    return event
+                if event.kind == _jdwp.EVENT_KIND_VM_DEATH:
+                    self.connection.close()
+                    raise _exceptions.JdbHostExitedException("The application exited")
+
+            if suspend_policy != _jdwp.SUSPEND_NONE:
+                self._resume()
+
+    def spawn(
+            self,
+            args: _typ.Optional[str] = None,
+            capture_target=True,
+            port: _typ.Optional[int] = None,
+    ) -> _typ.NoReturn:
+        """
+        Launches the target with its JDWP agent listening, connects to it, and
+        stops at the entry method of the class (as `JdbProcess.spawn`), with
+        exceptions and method entries and exits reported.
+
+        :param args: The command-line arguments of the program.
+        :param capture_target: Ignored: the target is always launched
+                               separately, so that its input and output can be
+                               accessed.
+        :param port: The port on which the target listens for the debugger; by
+                     default, a free port is picked by the JVM.
+        """
+
+        with self.stats.timer(_stats.PHASE_SPAWN):
+            # In case we have a live process going: Terminate it
+            self.close()
+            self._reset_session()
+
+            if port is None:
+                port = _helpers.JAVA_DEBUG_DEFAULT_PORT
+
+            # Launch the class separately on a port
+            self.target = _pexpect.spawnu(self._build_java_call(args=args, port=port), cwd=self.cwd)
+
+            try:
+                self.target.expect(_helpers.REGEXP_PATT_LISTENING)
+
+            except _pexpect.EOF as e:
+                e.__class__ = _exceptions.JdbHostErrorException
+                raise e
+
+            # Retrieve the port that was actually bound, and connect to it
+            self.port = int(self.target.match.group(1))
+            self._start_target_reader()
+            self.connection = _jdwp.JdwpConnection("localhost", self.port, timeout=self.timeout, stats=self.stats)
+
+            # The VM is suspended before loading the class (which is announced
+            # by a `VM_START` event)
+            self._wait_for(_jdwp.EVENT_KIND_VM_START)
+
+            self._set_request(_jdwp.EVENT_KIND_CLASS_PREPARE, [
+                self._writer().u8(_jdwp.MOD_CLASS_MATCH).string(self.class_name),
+                self._writer().u8(_jdwp.MOD_COUNT).i32(1),
+            ])
+            self._resume()
+            class_id = self._wait_for(_jdwp.EVENT_KIND_CLASS_PREPARE).type_id
+
+            # Stop in the entry method (as `stop in` and `run`)
+            location = self._entry_location(class_id)
+            breakpoint = self._set_request(_jdwp.EVENT_KIND_BREAKPOINT, [
+                self._writer().u8(_jdwp.MOD_LOCATION_ONLY).location(location),
+            ])
+            self._resume()
+            self._entry_thread = self._thread = self._wait_for(_jdwp.EVENT_KIND_BREAKPOINT).thread
+            self._clear_request(_jdwp.EVENT_KIND_BREAKPOINT, breakpoint)
+
+            # Activate precise tracing information (as `catch` and `trace
+            # methods`): exceptions, and methods being entered and exited
+            # (with their return value), excluding the standard library
+            self._set_exception_request()
+            self._set_method_requests()
+
+            # Run dummy method to clear
+            self.locals()
+            self._previous_step = None
+            self._reset_call_depth()
+            self._apply_command_timeout()
+
+            # Reset trace
+            self._reset_trace_history()
+
+    def _set_exception_request(self) -> _typ.NoReturn:
+        # Report uncaught exceptions, and caught ones if requested
+        self._exception_request = self._set_request(_jdwp.EVENT_KIND_EXCEPTION, [
+            self._writer().u8(_jdwp.MOD_EXCEPTION_ONLY).id(0, "reference_type")
+            .u8(int(self._catch_exceptions)).u8(1),
+        ])
+
+    def _apply_catch_exceptions(self) -> _typ.NoReturn:
+        if self._exception_request is not None:
+            self._clear_request(_jdwp.EVENT_KIND_EXCEPTION, self._exception_request)
+        self._set_exception_request()
+
+    def _clear_method_requests(self) -> _typ.NoReturn:
+        # As `untrace methods`
+        for (kind, request_id) in self._method_requests:
+            self._clear_request(kind, request_id)
+
+        self._method_requests = []
+
+    def _set_method_requests(self, suspend_policy: int = _jdwp.SUSPEND_ALL) -> _typ.NoReturn:
+        # Report the method entries and exits of all threads, or of the main
+        # one (as `trace methods`, or `trace go methods` without suspending)
+        self._clear_method_requests()
+
+        threads = [] if self.trace_threads else [
+            self._writer().u8(_jdwp.MOD_THREAD_ONLY).id(self._entry_thread)]
+
+        self._method_requests = [
+            (kind, self._set_request(kind, threads + self._class_modifiers(), suspend_policy))
+            for kind in JDWP_METHOD_EVENTS
+        ]
+
+    def _clear_step_requests(self) -> _typ.NoReturn:
+        # Steps still pending would stop the program when it runs freely
+        for request_id in self._step_requests.values():
+            self._clear_request(_jdwp.EVENT_KIND_SINGLE_STEP, request_id)
+
+        self._step_requests = {}
+
+    def _apply_trace_threads(self) -> _typ.NoReturn:
+        self._set_method_requests()
+
+    def _entry_location(self, class_id: int) -> _jdwp.JdwpLocation:
+        # The first location of the entry method (preferring the usual
+        # signature of `main`)
+        candidates = [
+            (signature != "([Ljava/lang/String;)V", method_id)
+            for (method_id, (name, signature, _)) in self._class_methods(class_id).items()
+            if name == self.entry_method
+        ]
+
+        if len(candidates) == 0:
+            raise _exceptions.JdbHostErrorException(
+                "No method {}.{} to stop in.".format(self.class_name, self.entry_method))
+
+        method_id = min(candidates)[1]
+        (start, _) = self._line_table(class_id, method_id)
+
+        return _jdwp.JdwpLocation(_jdwp.TYPE_TAG_CLASS, class_id, method_id, start)
+
+    # Information on classes and methods (cached)
+
+    def _class_name(self, class_id: int) -> str:
+        signature = self._signatures.get(class_id)
+        if signature is None:
+            signature = self._command(
+                _jdwp.CMD_REFERENCE_TYPE_SIGNATURE,
+                self._writer().id(class_id, "reference_type"),
+            ).string()
+            self._signatures[class_id] = signature
+
+        return _jdwp.signature_to_name(signature)
+
+    def _class_methods(self, class_id: int) -> _typ.Dict[int, _typ.Tuple[str, str, int]]:
+        methods = self._methods.get(class_id)
+        if methods is None:
+            reply = self._command(_jdwp.CMD_REFERENCE_TYPE_METHODS, self._writer().id(class_id, "reference_type"))
+            methods = {}
+            for _ in range(reply.i32()):
+                method_id = reply.id("method")
+                methods[method_id] = (reply.string(), reply.string(), reply.i32())
+            self._methods[class_id] = methods
+
+        return methods
+
+    def _line_table(self, class_id: int, method_id: int) -> _typ.Tuple[int, _typ.List[_typ.Tuple[int, int]]]:
+        # The first bytecode index of a method, and its (index, line) entries
+        key = (class_id, method_id)
+        table = self._line_tables.get(key)
+
+        if table is None:
+            try:
+                reply = self._command(
+                    _jdwp.CMD_METHOD_LINE_TABLE,
+                    self._writer().id(class_id, "reference_type").id(method_id, "method"),
+                )
+                start = reply.i64()
+                reply.i64()
+                lines = sorted((reply.i64(), reply.i32()) for _ in range(reply.i32()))
+                table = (start, lines)
+
+            except _exceptions.JdwpErrorException:
+                # Native methods, and classes without line numbers
+                table = (0, [])
+
+            self._line_tables[key] = table
+
+        return table
+
+    def _line_number(self, location: _jdwp.JdwpLocation) -> _typ.Optional[int]:
+        (_, lines) = self._line_table(location.class_id, location.method_id)
+
+        position = _bisect.bisect_right(lines, (location.index, float("inf"))) - 1
+        if position < 0:
+            return None
+
+        return lines[position][1]
+
+    def _variable_table(
+            self,
+            class_id: int,
+            method_id: int,
+    ) -> _typ.Optional[_typ.Tuple[int, _typ.List[_typ.Tuple[int, str, str, int, int]]]]:
+        # The number of argument slots of a method, and its variables, as
+        # (index, name, signature, length, slot), or `None` if the class was
+        # compiled without debugging information
+        key = (class_id, method_id)
+
+        if key not in self._variable_tables:
+            try:
+                reply = self._command(
+                    _jdwp.CMD_METHOD_VARIABLE_TABLE,
+                    self._writer().id(class_id, "reference_type").id(method_id, "method"),
+                )
+                arg_count = reply.i32()
+                variables = [
+                    (reply.i64(), reply.string(), reply.string(), reply.i32(), reply.i32())
+                    for _ in range(reply.i32())
+                ]
+                self._variable_tables[key] = (arg_count, variables)
+
+            except _exceptions.JdwpErrorException as e:
+                if e.error != _jdwp.JDWP_ERROR_ABSENT_INFORMATION:
+                    raise
+                self._variable_tables[key] = None
+
+        return self._variable_tables[key]
+
+    def _source_file(self, class_id: int) -> _typ.Optional[str]:
+        # The name of the source file of a class, if it was compiled with it
+        if class_id not in self._source_files:
+            try:
+                self._source_files[class_id] = self._command(
+                    _jdwp.CMD_REFERENCE_TYPE_SOURCE_FILE,
+                    self._writer().id(class_id, "reference_type"),
+                ).string()
+
+            except _exceptions.JdwpErrorException:
+                self._source_files[class_id] = None
+
+        return self._source_files[class_id]
+
+    def _source_line(self, location: _jdwp.JdwpLocation, line: int) -> _typ.Optional[str]:
+        # The source is looked up, as by `jdb`, relative to the current
+        # folder (and to the class path)
+        lines = self._sources.get(location.class_id)
+
+        if lines is None:
+            lines = []
+
+            source = self._source_file(location.class_id)
+            if source is not None:
+                package = self._class_name(location.class_id).rpartition(".")[0]
+                relative = _os.path.join(*(package.split(".") + [source])) if package else source
+                cwd = self.cwd if self.cwd is not None else _os.getcwd()
+
+                for folder in ["."] + list(self.class_path or []):
+                    path = _os.path.join(cwd, folder, relative)
+                    if _os.path.isfile(path):
+                        with open(path, errors="replace") as f:
+                            lines = f.read().splitlines()
+                        break
+
+            self._sources[location.class_id] = lines
+
+        if 0 < line <= len(lines):
+            return lines[line - 1].lstrip()
+
+        return None
+
+    def _thread_name(self, thread: int) -> str:
+        name = self._thread_names.get(thread)
+        if name is None:
+            name = self._command(_jdwp.CMD_THREAD_REFERENCE_NAME, self._writer().id(thread)).string()
+            self._thread_names[thread] = name
+
+        return name
+
+    # Threads
+
+    def _thread_group(self, thread: int) -> str:
+        group = self._thread_groups.get(thread)
+        if group is None:
+            group_id = self._command(_jdwp.CMD_THREAD_REFERENCE_THREAD_GROUP, self._writer().id(thread)).id()
+            group = self._command(_jdwp.CMD_THREAD_GROUP_REFERENCE_NAME, self._writer().id(group_id)).string()
+            self._thread_groups[thread] = group
+
+        return group
+
+    def _all_threads(self) -> _typ.List[int]:
+        reply = self._command(_jdwp.CMD_VM_ALL_THREADS)
+        return [reply.id() for _ in range(reply.i32())]
+
+    def threads(self) -> _typ.Optional[_typ.List[_typ.Dict[str, _typ.Any]]]:
+        """
+        Lists the threads of the program, in the same format as `JdbProcess`
+        (the ids being those of the VM).
+
+        :return: A list of dictionaries describing each thread.
+        """
+
+        if not self.active:
+            return None
+
+        threads = []
+
+        for thread in self._all_threads():
+            status = self._command(_jdwp.CMD_THREAD_REFERENCE_STATUS, self._writer().id(thread)).i32()
+            threads.append({
+                "id": thread,
+                "type": self._object_type_name(thread),
+                "name": self._thread_name(thread),
+                "group": self._thread_group(thread),
+                "status": _jdwp.JDWP_THREAD_STATUSES.get(status, "unknown"),
+                "at_breakpoint": thread == self._thread,
+            })
+
+        return threads
+
+    def select_thread(self, thread: _typ.Any) -> _typ.NoReturn:
+        self._thread = int(thread)
+        self._frame = None
+        self.call_depth = self._thread_depth(self._thread)[0]
+
+    def suspend_thread(self, thread: _typ.Any) -> _typ.NoReturn:
+        self._command(_jdwp.CMD_THREAD_REFERENCE_SUSPEND, self._writer().id(int(thread)))
+
+    def resume_thread(self, thread: _typ.Any) -> _typ.NoReturn:
+        self._command(_jdwp.CMD_THREAD_REFERENCE_RESUME, self._writer().id(int(thread)))
+
+    def _select_next_thread(self) -> _typ.NoReturn:
+        # All threads step at once (see `_send_step`)
+        pass
+
+    def _step_thread(self, info: _typ.Mapping[str, _typ.Any]) -> _typ.Any:
+        # Events carry the id of their thread (see `_expect_step`)
+        return self._thread
+
+    def _live_threads(self) -> _typ.List[int]:
+        return [thread for thread in self._program_threads() if thread not in self._dead_threads]
+
+    def _program_threads(self) -> _typ.List[int]:
+        # The threads running code of the program (see `is_program_thread`)
+        return [
+            thread for thread in self._all_threads()
+            if _helpers.is_program_thread({"name": self._thread_name(thread), "group": self._thread_group(thread)})
+        ]
+
+    # Stepping
+
+    def _set_step_request(self, thread: int, depth: int) -> _typ.NoReturn:
+        # A step which ended on another event (e.g. a method entry) is still
+        # pending, and must be replaced
+        if thread in self._step_requests:
+            self._clear_request(_jdwp.EVENT_KIND_SINGLE_STEP, self._step_requests.pop(thread))
+
+        self._step_requests[thread] = self._set_request(
+            _jdwp.EVENT_KIND_SINGLE_STEP,
+            [self._writer().u8(_jdwp.MOD_STEP).id(thread).i32(_jdwp.STEP_SIZE_LINE).i32(depth)] +
+            self._class_modifiers() +
+            [self._writer().u8(_jdwp.MOD_COUNT).i32(1)],
+        )
+
+    def _send_step(self, modifier: str) -> _typ.NoReturn:
+        depth = JDWP_STEP_DEPTHS.get(modifier)
+        if depth is None:
+            raise ValueError("Unsupported step modifier: {!r}".format(modifier))
+
+        # A thread killed by an uncaught exception is left to die
+        if self._thread not in self._dead_threads:
+            self._set_step_request(self._thread, depth)
+
+        # When all threads are traced, each thread has a pending step, and
+        # the VM reports whichever completes first
+        if self.trace_threads:
+            for thread in self._live_threads():
+                if thread not in self._step_requests:
+                    self._set_step_request(thread, _jdwp.STEP_DEPTH_INTO)
+
+        self._resume()
+
+    def _expect_step(self) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        """
+        Waits for the outcome of a step that has already been requested, and
+        describes the location at which the thread stopped.
+
+        :return: The step information.
+        """
+
+        with self.stats.timer(_stats.PHASE_STEP):
+            while True:
+                (suspend_policy, events) = self.connection.wait_event()
+                kinds = {event.kind: event for event in events}
+
+                if _jdwp.EVENT_KIND_VM_DEATH in kinds:
+                    self.connection.close()
+                    raise _exceptions.JdbHostExitedException("The application exited")
+
+                # The thread stops where exceptions are thrown, its step
+                # still pending
+                if _jdwp.EVENT_KIND_EXCEPTION in kinds:
+                    event = kinds[_jdwp.EVENT_KIND_EXCEPTION]
+                    self._thread = event.thread
+                    return self._exception_event_info(event)
+
+                located = [kinds[kind] for kind in JDWP_STEP_EVENTS if kind in kinds]
+                if len(located) > 0:
+                    break
+
+                # Events of other threads, or of requests that were cleared
+                self._prepare_deferred(events)
+                if suspend_policy != _jdwp.SUSPEND_NONE:
+                    self._resume()
+
+            # Step requests expire once they have occurred
+            for event in events:
+                if self._step_requests.get(event.thread) == event.request_id:
+                    del self._step_requests[event.thread]
+
+            event = located[0]
+            self._thread = event.thread
+
+            return self._step_event_info(event, _jdwp.EVENT_KIND_METHOD_ENTRY in kinds)
+
+    def _step_event_info(self, event: _jdwp.JdwpEvent, entered: bool) -> _typ.Dict[str, _typ.Any]:
+        # Build a step record, with the same keys as those parsed from `jdb`
+        location = event.location
+        info = {}
+
+        if event.kind == _jdwp.EVENT_KIND_METHOD_EXIT_WITH_RETURN_VALUE:
+            info["return"] = self._python_value(event.value)
+
+        info["thread"] = self._thread_name(event.thread)
+        info["class.method"] = self._location_method(location)
+        info["method"] = info["class.method"][:-len("()")].rpartition(".")[2]
+
+        line = self._line_number(location)
+        if line is not None:
+            info["line"] = line
+        info["bci"] = location.index
+
+        instruction = None if line is None else self._source_line(location, line)
+        if instruction is not None:
+            info["instruction"] = instruction
+
+        # Remember whether this step entered a new method, so that the
+        # calling arguments can be attached once the locals are known
+        if entered:
+            info["call"] = None
+
+        return info
+
+    def _location_method(self, location: _jdwp.JdwpLocation) -> str:
+        # The method of a location, as "class.method" in step records
+        (method_name, _, _) = self._class_methods(location.class_id)[location.method_id]
+        return "{}.{}()".format(self._class_name(location.class_id), method_name)
+
+    def _exception_event_info(self, event: _jdwp.JdwpEvent) -> _typ.Dict[str, _typ.Any]:
+        # Build a step record at the location where the exception was thrown,
+        # as parsed from `jdb` (see `helpers.parse_jdb_exception`)
+        info = self._step_event_info(event, False)
+
+        catch = None
+        if event.catch_location.class_id != 0:
+            catch = {
+                "class.method": self._location_method(event.catch_location),
+                "line": self._line_number(event.catch_location),
+                "bci": event.catch_location.index,
+            }
+
+        info["exception"] = {
+            "class": self._object_type_name(event.value.value),
+            "caught": catch is not None,
+            "catch": catch,
+        }
+
+        return info
+
+    def _resume_step(self) -> _typ.NoReturn:
+        self._resume()
+
+    def where(self) -> _typ.Optional[_typ.List[_typ.Dict[str, _typ.Any]]]:
+        """
+        Lists the frames of the thread being traced; see `JdbProcess.where`.
+
+        :return: The frames, innermost first.
+        """
+
+        if not self.active:
+            return None
+
+        reply = self._command(
+            _jdwp.CMD_THREAD_REFERENCE_FRAMES,
+            self._writer().id(self._thread).i32(0).i32(-1),
+        )
+
+        frames = []
+        for _ in range(reply.i32()):
+            reply.id("frame")
+            location = reply.location()
+
+            # Native methods have no bytecode index
+            native = location.index < 0
+
+            frames.append({
+                "class.method": self._location_method(location),
+                "source": "native method" if native else self._source_file(location.class_id),
+                "line": None if native else self._line_number(location),
+            })
+
+        return frames
+
+    def step_many(
+            self,
+            n: _typ.Optional[int],
+            modifier: str = " in",
+            include_locals: bool = False,
+    ) -> _typ.List[_typ.Dict[str, _typ.Any]]:
+        """
+        Makes up to `n` steps, retrieving the local variables of each one. The
+        round trips of JDWP commands being cheap, steps are simply made one
+        at a time.
+
+        :param n: The number of steps to make, or `None` to step until the
+                  program terminates.
+        :param modifier: The modifier of the `step` command (e.g. " in", " up").
+        :param include_locals: Whether to record the local variables of each step.
+        :return: The list of step records, in the same format as `step`.
+        """
+
+        records = []
+
+        while (n is None or len(records) < n) and self.active:
+            try:
+                info = self.step(
+                    modifier=modifier,
+                    include_locals=include_locals,
+                    locals_policy=_helpers.LOCALS_POLICY_ALWAYS,
+                )
+
+            except _exceptions.JdbHostExitedException:
+                break
+
+            records.append(info)
+
+        return records
+
+    # Breakpoints, watches and samples
+
+    def _loaded_class(self, class_name: str) -> _typ.Optional[int]:
+        # The class of a name, if it was loaded and prepared
+        signature = "L{};".format(class_name.replace(".", "/"))
+        reply = self._command(_jdwp.CMD_VM_CLASSES_BY_SIGNATURE, self._writer().string(signature))
+
+        for _ in range(reply.i32()):
+            reply.u8()
+            class_id = reply.id("reference_type")
+            if reply.i32() & _jdwp.JDWP_CLASS_STATUS_PREPARED:
+                self._signatures[class_id] = signature
+                return class_id
+
+        return None
+
+    def _defer(self, class_name: str, setup: _typ.Callable[[], _typ.Any]) -> _typ.NoReturn:
+        # Retry a setup once its class is prepared (as `jdb` defers
+        # breakpoints in classes which are not loaded yet)
+        if class_name not in self._deferred:
+            request_id = self._set_request(_jdwp.EVENT_KIND_CLASS_PREPARE, [
+                self._writer().u8(_jdwp.MOD_CLASS_MATCH).string(class_name),
+            ])
+            self._deferred[class_name] = (request_id, [])
+
+        self._deferred[class_name][1].append(setup)
+
+    def _prepare_deferred(self, events: _typ.Iterable[_jdwp.JdwpEvent]) -> _typ.NoReturn:
+        # Apply the setups deferred until the classes of the events were
+        # prepared (while the VM is still suspended)
+        for event in events:
+            if event.kind != _jdwp.EVENT_KIND_CLASS_PREPARE:
+                continue
+
+            deferred = self._deferred.pop(_jdwp.signature_to_name(event.signature), None)
+            if deferred is None:
+                continue
+
+            (request_id, setups) = deferred
+            self._clear_request(_jdwp.EVENT_KIND_CLASS_PREPARE, request_id)
+
+            for setup in setups:
+                setup()
+
+    def _breakpoint_locations(self, class_id: int, location: str) -> _typ.List[_jdwp.JdwpLocation]:
+        # The first location of a line in each method which contains it, or
+        # the first location of each method of a name
+        methods = self._class_methods(class_id)
+        locations = []
+
+        if ":" in location:
+            line = location.rpartition(":")[2].strip()
+            if not line.isdigit():
+                return []
+
+            for method_id in methods:
+                indices = [index for (index, number) in self._line_table(class_id, method_id)[1] if number == int(line)]
+                if len(indices) > 0:
+                    locations.append(_jdwp.JdwpLocation(_jdwp.TYPE_TAG_CLASS, class_id, method_id, min(indices)))
+
+        else:
+            name = location.partition("(")[0].rpartition(".")[2]
+
+            for (method_id, (method_name, _, _)) in methods.items():
+                if method_name == name:
+                    (start, _) = self._line_table(class_id, method_id)
+                    locations.append(_jdwp.JdwpLocation(_jdwp.TYPE_TAG_CLASS, class_id, method_id, start))
+
+        return locations
+
+    def add_breakpoint(self, location: str) -> _typ.NoReturn:
+        """
+        Sets a breakpoint, which can be either a line (`Class:line`) or the
+        entry of a method (`Class.method`, on all its overloads). Breakpoints
+        in classes which are not loaded yet are set once they are.
+
+        :param location: The location of the breakpoint.
+        """
+
+        if not self.active:
+            return
+
+        if ":" in location:
+            class_name = location.partition(":")[0]
+        else:
+            class_name = location.partition("(")[0].rpartition(".")[0]
+
+        class_id = self._loaded_class(class_name)
+        if class_id is None:
+            self._defer(class_name, _functools.partial(self.add_breakpoint, location))
+            return
+
+        locations = self._breakpoint_locations(class_id, location)
+        if len(locations) == 0:
+            raise _exceptions.JdbHostErrorException("No location {} to stop at.".format(location))
+
+        for breakpoint in locations:
+            self._set_request(_jdwp.EVENT_KIND_BREAKPOINT, [
+                self._writer().u8(_jdwp.MOD_LOCATION_ONLY).location(breakpoint),
+            ])
+
+    def add_watch(self, field: str, access: bool = False) -> _typ.NoReturn:
+        """
+        Sets a watchpoint on a field (`Class.field`), which is hit whenever
+        the field is modified (or, if `access` is set, also read). Watches in
+        classes which are not loaded yet are set once they are.
+
+        :param field: The fully qualified name of the field.
+        :param access: Whether to also stop when the field is read.
+        """
+
+        if not self.active:
+            return
+
+        (class_name, _, name) = field.rpartition(".")
+
+        class_id = self._loaded_class(class_name)
+        if class_id is None:
+            self._defer(class_name, _functools.partial(self.add_watch, field, access))
+            return
+
+        field_ids = [field_id for (field_id, field_name, _, _) in self._declared_fields(class_id) if field_name == name]
+        if len(field_ids) == 0:
+            raise _exceptions.JdbHostErrorException("No field {} to watch.".format(field))
+
+        kinds = [_jdwp.EVENT_KIND_FIELD_MODIFICATION] + ([_jdwp.EVENT_KIND_FIELD_ACCESS] if access else [])
+        for kind in kinds:
+            self._set_request(kind, [
+                self._writer().u8(_jdwp.MOD_FIELD_ONLY).id(class_id, "reference_type").id(field_ids[0], "field"),
+            ])
+
+    def _watch_info(self, event: _jdwp.JdwpEvent) -> _typ.Dict[str, _typ.Any]:
+        # Describe a watchpoint hit, as parsed from `jdb` (see
+        # `helpers.parse_jdb_watch`)
+        name = [
+            field_name for (field_id, field_name, _, _) in self._declared_fields(event.type_id)
+            if field_id == event.field_id
+        ][0]
+        watch = {"field": "{}.{}".format(self._class_name(event.type_id), name)}
+
+        if event.kind == _jdwp.EVENT_KIND_FIELD_MODIFICATION:
+            # The field is not assigned yet: read its current value
+            if event.object_id:
+                writer = self._writer().id(event.object_id).i32(1).id(event.field_id, "field")
+                reply = self._command(_jdwp.CMD_OBJECT_REFERENCE_GET_VALUES, writer)
+            else:
+                writer = self._writer().id(event.type_id, "reference_type").i32(1).id(event.field_id, "field")
+                reply = self._command(_jdwp.CMD_REFERENCE_TYPE_GET_VALUES, writer)
+
+            reply.i32()
+            watch["value"] = self._python_value(reply.value())
+            watch["new_value"] = self._python_value(event.value)
+
+        return watch
+
+    def _expect_sample_event(self) -> _jdwp.JdwpEvent:
+        """
+        Waits for the program, running freely, to stop at a breakpoint, a
+        watchpoint or an exception (see `iter_samples`).
+
+        :return: The event at which the program stopped.
+        """
+
+        while True:
+            (suspend_policy, events) = self.connection.wait_event()
+            kinds = {event.kind: event for event in events}
+
+            if _jdwp.EVENT_KIND_VM_DEATH in kinds:
+                self.connection.close()
+                raise _exceptions.JdbHostExitedException("The application exited")
+
+            self._prepare_deferred(events)
+
+            located = [kinds[kind] for kind in JDWP_SAMPLE_EVENTS if kind in kinds]
+            if len(located) > 0:
+                self._thread = located[0].thread
+                return located[0]
+
+            if suspend_policy != _jdwp.SUSPEND_NONE:
+                self._resume()
+
+    def _sample_event_info(self, event: _jdwp.JdwpEvent) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        """
+        Interprets the event at which the program stopped between samples
+        (see `iter_samples`).
+
+        :param event: The event, one of `JDWP_SAMPLE_EVENTS`.
+        :return: The record of the sample, or `None` if it is not recorded.
+        """
+
+        if event.kind == _jdwp.EVENT_KIND_EXCEPTION:
+            info = self._exception_event_info(event)
+        else:
+            info = self._step_event_info(event, False)
+            if event.kind in (_jdwp.EVENT_KIND_FIELD_MODIFICATION, _jdwp.EVENT_KIND_FIELD_ACCESS):
+                info["watch"] = self._watch_info(event)
+
+        return self._sample_info(info)
+
+    def iter_samples(
+            self,
+            breakpoints: _typ.Iterable[str] = (),
+            watches: _typ.Iterable[str] = (),
+            include_locals: bool = True,
+            until: _typ.Optional[_typ.Callable[[_typ.Dict[str, _typ.Any]], bool]] = None,
+    ) -> _typ.Iterator[_typ.Dict[str, _typ.Any]]:
+        """
+        Lets the program run freely between breakpoints and watchpoints, and
+        yields a record for each hit; see `JdbProcess.iter_samples`.
+
+        :param breakpoints: The breakpoints to set (see `add_breakpoint`).
+        :param watches: The fields to watch for modifications (see `add_watch`).
+        :param include_locals: Whether to record the local variables of each hit.
+        :param until: An optional predicate on records; iteration stops after
+                      the first record for which it returns `True`.
+        :return: An iterator of records, one per hit.
+        """
+
+        if not self.active:
+            return
+
+        for location in breakpoints:
+            self.add_breakpoint(location)
+
+        for field in watches:
+            self.add_watch(field)
+
+        # Only breakpoints, watchpoints and exceptions stop the program (as
+        # after `untrace methods`)
+        self._clear_method_requests()
+        self._clear_step_requests()
+
+        # Breakpoints are not consecutive steps: never reuse variables
+        self._previous_step = None
+
+        while self.active:
+            try:
+                self._resume()
+
+                info = self._sample_event_info(self._expect_sample_event())
+                if info is None:
+                    continue
+
+                loc = self.locals() if include_locals or "call" in info else None
+                info = self._merge_step_locals(info, loc, include_locals)
+
+            except _exceptions.JdbHostExitedException:
+                return
+
+            # Add to record
+            self._append_trace_history(info)
+
+            yield info
+
+            if until is not None and until(info):
+                return
+
+    def trace_calls(self, include_arguments: bool = True) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        """
+        Lets the program run until it terminates, only tracing method entries
+        and exits, and builds the tree of calls; see `JdbProcess.trace_calls`.
+
+        :param include_arguments: Whether to retrieve the arguments of each
+                                  call, which requires suspending the program
+                                  at each method entry and exit; otherwise,
+                                  the VM reports them without suspending it.
+        :return: The root of the call tree.
+        """
+
+        if not self.active:
+            return None
+
+        root = {"method": self.entry_method, "call": None, "calls": []}
+        stacks = {}
+
+        self._previous_step = None
+        self._clear_step_requests()
+        self._set_method_requests(_jdwp.SUSPEND_ALL if include_arguments else _jdwp.SUSPEND_NONE)
+
+        suspended = True
+
+        try:
+            while self.active:
+                if suspended:
+                    self._resume()
+
+                (suspend_policy, events) = self.connection.wait_event()
+                suspended = suspend_policy != _jdwp.SUSPEND_NONE
+
+                self._prepare_deferred(events)
+
+                for event in events:
+                    if event.kind == _jdwp.EVENT_KIND_VM_DEATH:
+                        self.connection.close()
+                        raise _exceptions.JdbHostExitedException("The application exited")
+
+                    # The program stops where exceptions are thrown
+                    if event.kind == _jdwp.EVENT_KIND_EXCEPTION:
+                        info = self._exception_event_info(event)
+                        if not self._exception_ignored(info):
+                            self._append_trace_history(info)
+                        continue
+
+                    if event.kind not in JDWP_METHOD_EVENTS:
+                        continue
+
+                    entered = event.kind == _jdwp.EVENT_KIND_METHOD_ENTRY
+                    info = self._step_event_info(event, entered)
+
+                    if entered and include_arguments:
+                        self._thread = event.thread
+                        self._frame = None
+                        info = self._merge_step_locals(info, self.locals(), include_locals=False)
+                    else:
+                        info.pop("call", None)
+
+                    self._record_call(root, stacks, info, entered)
+
+        except _exceptions.JdbHostExitedException:
+            pass
+
+        return root
+
+    # Values
+
+    def _current_frame(self) -> _typ.Tuple[int, _jdwp.JdwpLocation]:
+        # The top frame of the thread being traced (valid until it resumes)
+        if self._frame is None:
+            reply = self._command(
+                _jdwp.CMD_THREAD_REFERENCE_FRAMES,
+                self._writer().id(self._thread).i32(0).i32(1),
+            )
+            reply.i32()
+            self._frame = (reply.id("frame"), reply.location())
+
+        return self._frame
+
+    def _visible_variables(self) -> _typ.Optional[_typ.Tuple[int, _typ.List[_typ.Tuple[int, str, str, int, int]]]]:
+        # The variables of the current frame in scope at its bytecode index
+        (_, location) = self._current_frame()
+
+        table = self._variable_table(location.class_id, location.method_id)
+        if table is None:
+            return None
+
+        (arg_count, variables) = table
+
+        return arg_count, [
+            variable for variable in variables
+            if variable[0] <= location.index < variable[0] + variable[3]
+        ]
+
+    def _frame_values(self, variables: _typ.List[_typ.Tuple[int, str, str, int, int]]) -> _typ.List[_jdwp.JdwpValue]:
+        (frame, _) = self._current_frame()
+
+        writer = self._writer().id(self._thread).id(frame, "frame").i32(len(variables))
+        for (_, _, signature, _, slot) in variables:
+            writer.i32(slot).u8(ord(signature[0]))
+
+        reply = self._command(_jdwp.CMD_STACK_FRAME_GET_VALUES, writer)
+
+        return [reply.value() for _ in range(reply.i32())]
+
+    def _object_type(self, object_id: int) -> int:
+        type_id = self._object_types.get(object_id)
+        if type_id is None:
+            reply = self._command(_jdwp.CMD_OBJECT_REFERENCE_TYPE, self._writer().id(object_id))
+            reply.u8()
+            type_id = self._object_types[object_id] = reply.id("reference_type")
+
+        return type_id
+
+    def _object_type_name(self, object_id: int) -> str:
+        return self._class_name(self._object_type(object_id))
+
+    def _array_length(self, array_id: int) -> int:
+        length = self._array_lengths.get(array_id)
+        if length is None:
+            length = self._command(_jdwp.CMD_ARRAY_REFERENCE_LENGTH, self._writer().id(array_id)).i32()
+            self._array_lengths[array_id] = length
+
+        return length
+
+    def _python_value(self, value: _jdwp.JdwpValue) -> _typ.Any:
+        """
+        Converts a value to the value which `jdb` would have printed, once
+        parsed: primitives, strings, `None` for `null` (and `void`), and
+        references as "instance of Node(id=501)".
+
+        :param value: The value.
+        :return: The converted value.
+        """
+
+        (tag, data) = value
+
+        if tag in _jdwp.JDWP_PRIMITIVES:
+            if tag == _jdwp.TAG_CHAR:
+                return chr(data)
+            if tag == _jdwp.TAG_FLOAT:
+                return _shortest_float(data)
+            return data
+
+        if data is None or data == 0:
+            return None
+
+        if tag == _jdwp.TAG_STRING:
+            return self._command(_jdwp.CMD_STRING_REFERENCE_VALUE, self._writer().id(data)).string()
+
+        type_name = self._object_type_name(data)
+
+        if tag == _jdwp.TAG_ARRAY:
+            type_name = type_name.replace("[]", "[{}]".format(self._array_length(data)), 1)
+            return "instance of {} (id={})".format(type_name, data)
+
+        return "instance of {}(id={})".format(type_name, data)
+
+    def locals(
+        self
+    ) -> _typ.Optional[_typ.Tuple[_typ.Dict[str, _typ.Any], _typ.Dict[str, _typ.Any]]]:
+        """
+
+        :return:
+        """
+
+        if not self.active:
+            return None
+
+        with self.stats.timer(_stats.PHASE_LOCALS):
+            visible = self._visible_variables()
+
+            # As `jdb`, without debugging information no variable is known
+            if visible is None:
+                self.current_locals = ({}, {})
+                return self.current_locals
+
+            (arg_count, variables) = visible
+            variables = [variable for variable in variables if variable[1] != "this"]
+            values = self._frame_values(variables)
+
+            args = {}
+            local = {}
+            for (variable, value) in zip(variables, values):
+                (_, name, _, _, slot) = variable
+                (args if slot < arg_count else local)[name] = self._python_value(value)
+
+        self.current_locals = (args, local)
+        return self.current_locals
+
+    def _declared_fields(self, class_id: int) -> _typ.List[_typ.Tuple[int, str, str, int]]:
+        # The fields declared by a class (static or not), as (id, name,
+        # signature, modifiers)
+        fields = self._class_fields.get(class_id)
+
+        if fields is None:
+            reply = self._command(_jdwp.CMD_REFERENCE_TYPE_FIELDS, self._writer().id(class_id, "reference_type"))
+            fields = [(reply.id("field"), reply.string(), reply.string(), reply.i32()) for _ in range(reply.i32())]
+            self._class_fields[class_id] = fields
+
+        return fields
+
+    def _fields_of(self, class_id: int) -> _typ.List[_typ.Tuple[int, str, str]]:
+        # The instance fields of a class, as (id, name, signature), followed
+        # by those it inherits (named "Base.field", as printed by `jdb`)
+        fields = self._fields.get(class_id)
+
+        if fields is None:
+            fields = [
+                (field_id, name, signature)
+                for (field_id, name, signature, modifiers) in self._declared_fields(class_id)
+                if not modifiers & _jdwp.JDWP_ACC_STATIC
+            ]
+
+            superclass = self._command(
+                _jdwp.CMD_CLASS_TYPE_SUPERCLASS,
+                self._writer().id(class_id, "reference_type"),
+            ).id("reference_type")
+
+            if superclass != 0:
+                base = self._class_name(superclass)
+                fields += [
+                    (field_id, name if "." in name else "{}.{}".format(base, name), signature)
+                    for (field_id, name, signature) in self._fields_of(superclass)
+                ]
+
+            self._fields[class_id] = fields
+
+        return fields
+
+    def _object_fields(self, object_id: int) -> _typ.List[_typ.Tuple[str, _jdwp.JdwpValue]]:
+        fields = self._fields_of(self._object_type(object_id))
+
+        writer = self._writer().id(object_id).i32(len(fields))
+        for (field_id, _, _) in fields:
+            writer.id(field_id, "field")
+
+        reply = self._command(_jdwp.CMD_OBJECT_REFERENCE_GET_VALUES, writer)
+        values = [reply.value() for _ in range(reply.i32())]
+
+        return [(name, value) for ((_, name, _), value) in zip(fields, values)]
+
+    def _array_elements(
+            self,
+            array_id: int,
+            first: int = 0,
+            length: _typ.Optional[int] = None,
+    ) -> _typ.List[_jdwp.JdwpValue]:
+        if length is None:
+            length = self._array_length(array_id) - first
+
+        reply = self._command(
+            _jdwp.CMD_ARRAY_REFERENCE_GET_VALUES,
+            self._writer().id(array_id).i32(first).i32(length),
+        )
+
+        # Arrays of primitives are untagged
+        tag = reply.u8()
+        count = reply.i32()
+
+        if tag in _jdwp.JDWP_PRIMITIVES:
+            return [reply.untagged_value(tag) for _ in range(count)]
+
+        return [reply.value() for _ in range(count)]
+
+    def _evaluate(self, expr: str) -> _typ.Optional[_jdwp.JdwpValue]:
+        """
+        Evaluates an expression made of a variable (or `this`, or a field of
+        `this`), followed by fields and array elements.
+
+        :param expr: The expression.
+        :return: The value, or `None` if it could not be evaluated.
+        """
+
+        match = _re.fullmatch(REGEXP_PATT_JDWP_EXPRESSION, expr)
+        if match is None:
+            return None
+
+        (name, accessors) = match.groups()
+
+        try:
+            (frame, _) = self._current_frame()
+            this = self._command(
+                _jdwp.CMD_STACK_FRAME_THIS_OBJECT,
+                self._writer().id(self._thread).id(frame, "frame"),
+            ).value()
+
+            if name == "this":
+                value = this
+            else:
+                visible = self._visible_variables()
+                variables = [] if visible is None else [
+                    variable for variable in visible[1] if variable[1] == name]
+
+                if len(variables) > 0:
+                    value = self._frame_values(variables[-1:])[0]
+                else:
+                    value = self._field_value(this, name)
+
+            for (field, index) in _re.findall(REGEXP_PATT_JDWP_ACCESSOR, accessors):
+                if value is None:
+                    return None
+                elif field:
+                    value = self._field_value(value, field)
+                else:
+                    value = self._element_value(value, int(index))
+
+            return value
+
+        except _exceptions.JdwpErrorException:
+            return None
+
+    def _field_value(self, value: _jdwp.JdwpValue, name: str) -> _typ.Optional[_jdwp.JdwpValue]:
+        (tag, object_id) = value
+
+        if tag not in (_jdwp.TAG_OBJECT, _jdwp.TAG_ARRAY) or not object_id:
+            return None
+
+        if tag == _jdwp.TAG_ARRAY:
+            if name == "length":
+                return _jdwp.JdwpValue(_jdwp.TAG_INT, self._array_length(object_id))
+            return None
+
+        for (field, field_value) in self._object_fields(object_id):
+            if field.split(".")[-1] == name:
+                return field_value
+
+        return None
+
+    def _element_value(self, value: _jdwp.JdwpValue, index: int) -> _typ.Optional[_jdwp.JdwpValue]:
+        (tag, array_id) = value
+
+        if tag != _jdwp.TAG_ARRAY or not array_id or index >= self._array_length(array_id):
+            return None
+
+        return self._array_elements(array_id, index, 1)[0]
+
+    def print_values(self, names: _typ.Iterable[str]) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        """
+        Retrieves the value of some variables only (or fields, such as
+        `this.x`, or array elements), which is cheaper than `locals` for
+        methods with many (or large) variables.
+
+        :param names: The names of the variables.
+        :return: A dictionary of the values of the variables that were found.
+        """
+
+        if not self.active:
+            return None
+
+        values = {}
+
+        for name in names:
+            value = self._evaluate(name)
+            if value is not None:
+                values[name] = self._python_value(value)
+
+        return values
+
+    def dump(self, obj: str) -> _typ.Any:
+        """
+        Dumps the value of an expression: objects are returned as a
+        dictionary of their fields (in which other objects are left as
+        references), and arrays as lists.
+
+        :param obj: The expression to dump (e.g. a variable name).
+        :return: The value, or `None` if it could not be dumped.
+        """
+
+        if not self.active:
+            return None
+
+        with self.stats.timer(_stats.PHASE_DUMP):
+            value = self._evaluate(obj)
+            if value is None:
+                return None
+
+            (tag, object_id) = value
+
+            if tag == _jdwp.TAG_ARRAY and object_id:
+                return [self._python_value(element) for element in self._array_elements(object_id)]
+
+            if tag == _jdwp.TAG_OBJECT and object_id:
+                return {name: self._python_value(field) for (name, field) in self._object_fields(object_id)}
+
+            return self._python_value(value)
+
+    def dump_many(self, objs: _typ.Iterable[str]) -> _typ.Optional[_typ.List[_typ.Any]]:
+        """
+        Dumps the values of several expressions (see `dump`).
+
+        :param objs: The expressions to dump.
+        :return: The list of values, in the same order.
+        """
+
+        if not self.active:
+            return None
+
+        return [self.dump(obj) for obj in objs]
@@ -0,0 +1,84 @@
+import collections as _collections
+import reprlib as _reprlib
+import typing as _typ
+
+
+class JdbReference(_collections.namedtuple("JdbReference", ["type_name", "id"])):
+    """
+    Reference to an object of the debugged program, as printed by `jdb`
+    (for instance, "instance of Node(id=501)"), which has not been resolved,
+    either because it was beyond the maximum depth or because it could not
+    be dumped.
+    """
+
+    __slots__ = ()
+
+    @property
+    def is_array(self) -> bool:
+        return "[" in self.type_name
+
+
+class JdbObject(object):
+    """
+    Object of the debugged program, resolved by `JdbProcess.resolve_objects`:
+    an instance has `fields`, and an array has `elements`. Values which are
+    themselves references are `JdbObject` (the same instance for the same
+    object, so that cycles and sharing are preserved), or `JdbReference` if
+    they were not resolved.
+    """
+
+    __slots__ = ("type_name", "id", "fields", "elements")
+
+    def __init__(
+            self,
+            type_name: str,
+            id: int,
+            fields: _typ.Optional[_typ.Dict[str, _typ.Any]] = None,
+            elements: _typ.Optional[_typ.List[_typ.Any]] = None,
+    ):
+        self.type_name = type_name
+        self.id = id
+        self.fields = fields
+        self.elements = elements
+
+    @property
+    def is_array(self) -> bool:
+        return "[" in self.type_name
+
+    def to_dict(self, _seen: _typ.Optional[set] = None) -> _typ.Dict[str, _typ.Any]:
+        """
+        Converts the object (and the objects it references) to dictionaries
+        and lists, for instance to serialize it as JSON. An object which is
+        reached again (through a cycle or sharing) is represented by a
+        dictionary `{"ref": id}`.
+
+        :return: A dictionary describing the object.
+        """
+
+        seen = set() if _seen is None else _seen
+        if self.id in seen:
+            return {"ref": self.id}
+        seen.add(self.id)
+
+        def convert(value):
+            if isinstance(value, JdbObject):
+                return value.to_dict(seen)
+            if isinstance(value, JdbReference):
+                return {"ref": value.id, "type": value.type_name}
+            return value
+
+        data = {"type": self.type_name, "id": self.id}
+
+        if self.fields is not None:
+            data["fields"] = {name: convert(value) for (name, value) in self.fields.items()}
+
+        if self.elements is not None:
+            data["elements"] = [convert(value) for value in self.elements]
+
+        return data
+
+    @_reprlib.recursive_repr()
+    def __repr__(self) -> str:
+        if self.elements is not None:
+            return "JdbObject({}, id={}, elements={!r})".format(self.type_name, self.id, self.elements)
+        return "JdbObject({}, id={}, fields={!r})".format(self.type_name, self.id, self.fields)
@@ -0,0 +1,129 @@
+import json as _json
+import pickle as _pickle
+import struct as _struct
+import typing as _typ
+
+
+TRACE_SINK_BUFFER_SIZE = 1 << 20
+
+# Each record of a binary trace log is prefixed by its length (unsigned,
+# 32-bit, little-endian)
+BINARY_TRACE_HEADER = _struct.Struct("<I")
+
+
+class TraceSink(object):
+    """
+    Destination to which a `JdbProcess` streams its step records as soon as
+    they are parsed (see `JdbProcess.add_trace_sink`).
+    """
+
+    def write(self, info: _typ.Mapping[str, _typ.Any]) -> _typ.NoReturn:
+        raise NotImplementedError
+
+    def flush(self) -> _typ.NoReturn:
+        pass
+
+    def close(self) -> _typ.NoReturn:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class CallbackTraceSink(TraceSink):
+    """
+    Sink which calls a function with each step record.
+    """
+
+    def __init__(self, callback: _typ.Callable[[_typ.Mapping[str, _typ.Any]], _typ.Any]):
+        self.callback = callback
+
+    def write(self, info: _typ.Mapping[str, _typ.Any]) -> _typ.NoReturn:
+        self.callback(info)
+
+
+class _FileTraceSink(TraceSink):
+
+    def __init__(self, file: _typ.Union[str, _typ.IO], mode: str, buffer_size: int):
+        # Only close the files that we opened ourselves
+        self._owned = isinstance(file, str)
+        if self._owned:
+            file = open(file, mode, buffering=buffer_size)
+        self.file = file
+
+    def flush(self) -> _typ.NoReturn:
+        if not self.file.closed:
+            self.file.flush()
+
+    def close(self) -> _typ.NoReturn:
+        self.flush()
+        if self._owned:
+            self.file.close()
+
+
+class JsonLinesTraceSink(_FileTraceSink):
+    """
+    Sink which writes each step record as a line of JSON (JSON Lines).
+    """
+
+    def __init__(self, file: _typ.Union[str, _typ.TextIO], buffer_size: int = TRACE_SINK_BUFFER_SIZE):
+        super().__init__(file, "w", buffer_size)
+
+    def write(self, info: _typ.Mapping[str, _typ.Any]) -> _typ.NoReturn:
+        self.file.write(_json.dumps(info, separators=(",", ":")))
+        self.file.write("\n")
+
+
+class BinaryTraceSink(_FileTraceSink):
+    """
+    Sink which writes each step record as a length-prefixed pickle, which
+    is more compact and faster to write than JSON.
+    """
+
+    def __init__(self, file: _typ.Union[str, _typ.BinaryIO], buffer_size: int = TRACE_SINK_BUFFER_SIZE):
+        super().__init__(file, "wb", buffer_size)
+
+    def write(self, info: _typ.Mapping[str, _typ.Any]) -> _typ.NoReturn:
+        data = _pickle.dumps(info, protocol=_pickle.HIGHEST_PROTOCOL)
+        self.file.write(BINARY_TRACE_HEADER.pack(len(data)))
+        self.file.write(data)
+
+
+def read_jsonl_trace(file_name: str) -> _typ.Iterator[_typ.Dict[str, _typ.Any]]:
+    """
+    Reads the step records written by a `JsonLinesTraceSink`.
+
+    :param file_name: The name of the file written by the sink.
+    :return: An iterator of step records.
+    """
+
+    with open(file_name) as f:
+        for line in f:
+            if line.strip() != "":
+                yield _json.loads(line)
+
+
+def read_binary_trace(file_name: str) -> _typ.Iterator[_typ.Dict[str, _typ.Any]]:
+    """
+    Reads the step records written by a `BinaryTraceSink`. A record that was
+    only partially written (for instance, if the process crashed) is ignored.
+
+    :param file_name: The name of the file written by the sink.
+    :return: An iterator of step records.
+    """
+
+    with open(file_name, "rb") as f:
+        while True:
+            header = f.read(BINARY_TRACE_HEADER.size)
+            if len(header) < BINARY_TRACE_HEADER.size:
+                return
+
+            (size,) = BINARY_TRACE_HEADER.unpack(header)
+            data = f.read(size)
+            if len(data) < size:
+                return
+
+            yield _pickle.loads(data)
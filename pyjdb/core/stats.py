@@ -0,0 +1,129 @@
+import time as _time
+import typing as _typ
+
+
+# Phases timed by a `JdbProcess`: launching the debugging session, waiting
+# for the outcome of `step`, `locals` and `dump` commands, reading from
+# `jdb` (which includes the waits for its output), parsing the blocks of
+# output, and adding records to the trace history (and sinks)
+PHASE_SPAWN = "spawn"
+PHASE_STEP = "step"
+PHASE_LOCALS = "locals"
+PHASE_DUMP = "dump"
+PHASE_READ = "read"
+PHASE_PARSE = "parse"
+PHASE_HISTORY = "history"
+
+PHASES = (PHASE_SPAWN, PHASE_STEP, PHASE_LOCALS, PHASE_DUMP, PHASE_READ, PHASE_PARSE, PHASE_HISTORY)
+
+
+class _PhaseTimer(object):
+
+    __slots__ = ("stats", "phase", "start")
+
+    def __init__(self, stats: "JdbStats", phase: str):
+        self.stats = stats
+        self.phase = phase
+        self.start = None
+
+    def __enter__(self):
+        self.start = _time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.stats.record(self.phase, _time.perf_counter() - self.start)
+
+
+class JdbStats(object):
+    """
+    Counters and timers of a `JdbProcess`: the time spent (and number of
+    occurrences) in each phase of tracing, the number of bytes and chunks
+    read from `jdb`, the number of events it produced, and the number of
+    `expect` calls. Phases may overlap: for instance, the time spent
+    reading output is also counted in the phase that waited for it.
+
+    Hooks, added with `add_hook`, are called with the name of the phase and
+    its duration (in seconds) every time a phase completes.
+    """
+
+    def __init__(self):
+        self.hooks = []
+        self.reset()
+
+    def reset(self) -> _typ.NoReturn:
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(PHASES, 0)
+        self.bytes_read = 0
+        self.reads = 0
+        self.events = 0
+        self.expects = 0
+
+    def add_hook(self, hook: _typ.Callable[[str, float], _typ.Any]) -> _typ.NoReturn:
+        """
+        Adds a function to call every time a phase completes.
+
+        :param hook: A function taking the name of a phase and its duration.
+        """
+
+        self.hooks.append(hook)
+
+    def timer(self, phase: str) -> _PhaseTimer:
+        """
+        Returns a context manager which times a phase.
+
+        :param phase: The name of the phase (one of `PHASES`).
+        :return: The context manager.
+        """
+
+        return _PhaseTimer(self, phase)
+
+    def record(self, phase: str, elapsed: float) -> _typ.NoReturn:
+        self.times[phase] = self.times.get(phase, 0.0) + elapsed
+        self.counts[phase] = self.counts.get(phase, 0) + 1
+
+        for hook in self.hooks:
+            hook(phase, elapsed)
+
+    def record_read(self, size: int) -> _typ.NoReturn:
+        self.bytes_read += size
+        self.reads += 1
+
+    def snapshot(self) -> _typ.Dict[str, _typ.Any]:
+        """
+        Returns the current values of the counters and timers, for instance
+        to be serialized, or compared with a later snapshot.
+
+        :return: A dictionary of the statistics.
+        """
+
+        return {
+            "times": dict(self.times),
+            "counts": dict(self.counts),
+            "bytes_read": self.bytes_read,
+            "reads": self.reads,
+            "events": self.events,
+            "expects": self.expects,
+        }
+
+    def summary(self) -> str:
+        """
+        Returns a human-readable table of the statistics.
+
+        :return: The table, as a string.
+        """
+
+        lines = ["{:<8} {:>8} {:>12} {:>12}".format("phase", "count", "total (ms)", "mean (ms)")]
+
+        for phase in self.times:
+            count = self.counts[phase]
+            total = self.times[phase] * 1000
+            lines.append("{:<8} {:>8} {:>12.2f} {:>12.3f}".format(
+                phase, count, total, total / count if count > 0 else 0.0))
+
+        lines.append("bytes read: {} (in {} reads), events: {}, expects: {}".format(
+            self.bytes_read, self.reads, self.events, self.expects))
+
+        return "\n".join(lines)
+
+    def __repr__(self) -> str:
+        return "JdbStats({})".format(self.snapshot())
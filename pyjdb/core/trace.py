@@ -0,0 +1,697 @@
+import array as _array
+import bisect as _bisect
+import heapq as _heapq
+import itertools as _itertools
+import typing as _typ
+
+
+class TraceHistory(object):
+    """
+    History of the step records of a `JdbProcess`. When a maximum length is
+    set, the records are stored in a preallocated ring buffer, so that
+    appending a record (and evicting the oldest one) takes constant time;
+    otherwise, they are stored in a plain list.
+
+    The history supports `len`, iteration, and indexing by integers or
+    slices (which return lists), like the list it replaces.
+    """
+
+    def __init__(self, maxlen: _typ.Optional[int] = None, items: _typ.Iterable = ()):
+        self._maxlen = None
+        self._items = []
+        self._start = 0
+        self._size = 0
+
+        self.maxlen = maxlen
+        self.extend(items)
+
+    @property
+    def maxlen(self) -> _typ.Optional[int]:
+        """
+        Provides the maximum number of records kept, or `None` if the history
+        is unbounded. Changing it keeps the most recent records.
+
+        :return: The maximum number of records.
+        """
+
+        return self._maxlen
+
+    @maxlen.setter
+    def maxlen(self, value: _typ.Optional[int]) -> _typ.NoReturn:
+        if value is not None and value <= 0:
+            value = None
+
+        items = self.snapshot()
+
+        self._maxlen = value
+        self._start = 0
+        self._size = 0
+
+        if value is None:
+            self._items = []
+        else:
+            self._items = [None] * value
+            items = items[-value:]
+
+        self.extend(items)
+
+    def append(self, info: _typ.Any) -> _typ.NoReturn:
+        """
+        Adds a record at the end of the history, evicting the oldest record
+        if the history is full.
+
+        :param info: The record to add.
+        """
+
+        if self._maxlen is None:
+            self._items.append(info)
+            self._size += 1
+
+        elif self._size < self._maxlen:
+            self._items[(self._start + self._size) % self._maxlen] = info
+            self._size += 1
+
+        else:
+            self._items[self._start] = info
+            self._start = (self._start + 1) % self._maxlen
+
+    def extend(self, items: _typ.Iterable) -> _typ.NoReturn:
+        for info in items:
+            self.append(info)
+
+    def clear(self) -> _typ.NoReturn:
+        self._items = [] if self._maxlen is None else [None] * self._maxlen
+        self._start = 0
+        self._size = 0
+
+    def snapshot(self) -> _typ.List[_typ.Any]:
+        """
+        Returns the records of the history, from oldest to most recent, as a
+        new list (the records themselves are not copied).
+
+        :return: The list of records.
+        """
+
+        if self._maxlen is None:
+            return self._items[:]
+
+        end = self._start + self._size
+        if end <= self._maxlen:
+            return self._items[self._start:end]
+
+        return self._items[self._start:] + self._items[:end - self._maxlen]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> _typ.Iterator[_typ.Any]:
+        if self._maxlen is None:
+            return iter(self._items)
+
+        end = self._start + self._size
+        if end <= self._maxlen:
+            return _itertools.islice(self._items, self._start, end)
+
+        return _itertools.chain(
+            _itertools.islice(self._items, self._start, None),
+            _itertools.islice(self._items, 0, end - self._maxlen),
+        )
+
+    def __getitem__(self, index: _typ.Union[int, slice]) -> _typ.Any:
+        if isinstance(index, slice):
+            if self._maxlen is None:
+                return self._items[index]
+            return [self[i] for i in range(*index.indices(self._size))]
+
+        if index < 0:
+            index += self._size
+        if index < 0 or index >= self._size:
+            raise IndexError("trace history index out of range")
+
+        if self._maxlen is None:
+            return self._items[index]
+
+        return self._items[(self._start + index) % self._maxlen]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, TraceHistory):
+            other = other.snapshot()
+        return self.snapshot() == other
+
+    def __repr__(self) -> str:
+        return "TraceHistory(maxlen={}, items={})".format(self._maxlen, self.snapshot())
+
+
+class Trace(object):
+    """
+    Compact, columnar store of the step records of a `JdbProcess`. Lines,
+    bytecode indexes, threads, methods and instructions are stored as arrays
+    of integers (the strings being interned in tables), and local variables
+    are delta-encoded: only the variables that changed since the previous
+    step are stored, with a full copy after every `checkpoint_interval`
+    deltas, so that the variables of any step are rebuilt from at most that
+    many deltas.
+
+    Records are reconstructed as dictionaries, in the same format as those
+    of `JdbProcess.step`, when the trace is indexed or iterated over; the
+    columns can be exported as arrays using `columns` or `to_numpy`.
+    """
+
+    # The value stored in the columns when a record has no such information
+    MISSING = -1
+
+    def __init__(self, items: _typ.Iterable = (), checkpoint_interval: int = 256):
+        self.checkpoint_interval = checkpoint_interval
+        self.threads = []
+        self.methods = []
+        self.instructions = []
+        self.clear()
+        self.extend(items)
+
+    @property
+    def maxlen(self) -> None:
+        # Columnar traces are never culled
+        return None
+
+    def clear(self) -> _typ.NoReturn:
+        self._size = 0
+
+        # Interning tables
+        self.threads = []
+        self.methods = []
+        self.instructions = []
+        self._thread_ids = {}
+        self._method_ids = {}
+        self._instruction_ids = {}
+
+        # Columns
+        self._thread = _array.array("i")
+        self._method = _array.array("i")
+        self._line = _array.array("i")
+        self._bci = _array.array("i")
+        self._instruction = _array.array("i")
+        self._has_locals = _array.array("b")
+        self._index = _array.array("i")
+
+        # Sparse information
+        self._returns = {}
+        self._calls = {}
+        self._watches = {}
+        self._exceptions = {}
+        self._locals_deltas = {}
+        self._locals_checkpoints = {}
+        self._checkpoint_indices = []
+        self._delta_indices = _array.array("i")
+        self._deltas_since_checkpoint = 0
+        self._last_locals = None
+
+    @staticmethod
+    def _intern(value, table: list, ids: dict) -> int:
+        if value is None:
+            return Trace.MISSING
+
+        index = ids.get(value)
+        if index is None:
+            index = len(table)
+            ids[value] = index
+            table.append(value)
+
+        return index
+
+    def append(self, info: _typ.Mapping[str, _typ.Any]) -> _typ.NoReturn:
+        """
+        Adds a step record at the end of the trace.
+
+        :param info: The step record, as returned by `JdbProcess.step`.
+        """
+
+        index = self._size
+
+        self._thread.append(self._intern(info.get("thread"), self.threads, self._thread_ids))
+        self._instruction.append(
+            self._intern(info.get("instruction"), self.instructions, self._instruction_ids))
+
+        method = None
+        if "class.method" in info or "method" in info:
+            method = (info.get("class.method"), info.get("method"))
+        self._method.append(self._intern(method, self.methods, self._method_ids))
+
+        line = info.get("line")
+        bci = info.get("bci")
+        self._line.append(line if type(line) is int else self.MISSING)
+        self._bci.append(bci if type(bci) is int else self.MISSING)
+
+        step_index = info.get("index")
+        self._index.append(step_index if type(step_index) is int else self.MISSING)
+
+        if "return" in info:
+            self._returns[index] = info["return"]
+
+        if "call" in info:
+            self._calls[index] = info["call"]
+
+        if "watch" in info:
+            self._watches[index] = info["watch"]
+
+        if "exception" in info:
+            self._exceptions[index] = info["exception"]
+
+        local = info.get("locals")
+        self._has_locals.append(local is not None)
+
+        if local is not None:
+            if self._last_locals is None or self._deltas_since_checkpoint >= self.checkpoint_interval:
+                self._locals_checkpoints[index] = dict(local)
+                self._checkpoint_indices.append(index)
+                self._deltas_since_checkpoint = 0
+
+            else:
+                previous = self._last_locals
+                changed = {
+                    name: value
+                    for (name, value) in local.items()
+                    if name not in previous or previous[name] != value
+                }
+                removed = tuple(name for name in previous if name not in local)
+
+                if len(changed) > 0 or len(removed) > 0:
+                    self._locals_deltas[index] = (changed, removed)
+                    self._delta_indices.append(index)
+                    self._deltas_since_checkpoint += 1
+
+            self._last_locals = local
+
+        self._size += 1
+
+    def extend(self, items: _typ.Iterable) -> _typ.NoReturn:
+        for info in items:
+            self.append(info)
+
+    def _record(self, index: int, local: _typ.Optional[dict]) -> _typ.Dict[str, _typ.Any]:
+        # Rebuild the record, with the keys in the order used by `JdbProcess`
+        info = {}
+
+        if index in self._returns:
+            info["return"] = self._returns[index]
+
+        thread = self._thread[index]
+        if thread != self.MISSING:
+            info["thread"] = self.threads[thread]
+
+        method = self._method[index]
+        if method != self.MISSING:
+            (class_method, method_name) = self.methods[method]
+            if class_method is not None:
+                info["class.method"] = class_method
+            if method_name is not None:
+                info["method"] = method_name
+
+        if self._line[index] != self.MISSING:
+            info["line"] = self._line[index]
+
+        if self._bci[index] != self.MISSING:
+            info["bci"] = self._bci[index]
+
+        instruction = self._instruction[index]
+        if instruction != self.MISSING:
+            info["instruction"] = self.instructions[instruction]
+
+        if index in self._watches:
+            info["watch"] = self._watches[index]
+
+        if index in self._exceptions:
+            info["exception"] = self._exceptions[index]
+
+        if index in self._calls:
+            info["call"] = self._calls[index]
+
+        if local is not None:
+            info["locals"] = dict(local)
+
+        if self._index[index] != self.MISSING:
+            info["index"] = self._index[index]
+
+        return info
+
+    def _apply_locals(self, index: int, local: _typ.Optional[dict]) -> _typ.Optional[dict]:
+        # Compute the local variables of step `index`, given those of the
+        # last previous step which had local variables
+        if not self._has_locals[index]:
+            return local
+
+        if index in self._locals_checkpoints:
+            return self._locals_checkpoints[index]
+
+        delta = self._locals_deltas.get(index)
+        if delta is None:
+            return local
+
+        local = dict(local)
+        self._apply_delta(local, delta)
+
+        return local
+
+    @staticmethod
+    def _apply_delta(local: dict, delta: _typ.Tuple[dict, tuple]) -> _typ.NoReturn:
+        (changed, removed) = delta
+        for name in removed:
+            del local[name]
+        local.update(changed)
+
+    def _locals_at(self, index: int) -> _typ.Optional[dict]:
+        if not self._has_locals[index]:
+            return None
+
+        # Replay the deltas (at most `checkpoint_interval`) from the closest
+        # checkpoint, skipping the steps in between which have none
+        position = _bisect.bisect_right(self._checkpoint_indices, index)
+        start = self._checkpoint_indices[position - 1]
+
+        local = dict(self._locals_checkpoints[start])
+
+        first = _bisect.bisect_right(self._delta_indices, start)
+        last = _bisect.bisect_right(self._delta_indices, index)
+        for i in self._delta_indices[first:last]:
+            self._apply_delta(local, self._locals_deltas[i])
+
+        return local
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> _typ.Iterator[_typ.Dict[str, _typ.Any]]:
+        local = None
+
+        for index in range(self._size):
+            local = self._apply_locals(index, local)
+            yield self._record(index, local if self._has_locals[index] else None)
+
+    def __getitem__(self, index: _typ.Union[int, slice]) -> _typ.Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+
+        if index < 0:
+            index += self._size
+        if index < 0 or index >= self._size:
+            raise IndexError("trace index out of range")
+
+        return self._record(index, self._locals_at(index))
+
+    def snapshot(self) -> _typ.List[_typ.Dict[str, _typ.Any]]:
+        """
+        Returns the records of the trace as a list of dictionaries, in the
+        same format as the history of a `JdbProcess`.
+
+        :return: The list of step records.
+        """
+
+        return list(self)
+
+    def columns(self) -> _typ.Dict[str, memoryview]:
+        """
+        Returns the columns of the trace, without copying them: the line and
+        bytecode index of each step, its position among the steps of all
+        threads (the "index" of records, when all threads are traced), and
+        the index of its thread, method and instruction in the `threads`,
+        `methods` and `instructions` tables.
+        Missing values are represented by `Trace.MISSING`.
+
+        The columns are read-only views of the arrays of the trace, which
+        may be wrapped by other libraries (such as NumPy or Arrow). As an
+        array cannot be resized while it is viewed, steps cannot be appended
+        to the trace until the views (and whatever wraps them) are released.
+
+        :return: A dictionary of the columns of the trace.
+        """
+
+        return {
+            "thread": memoryview(self._thread).toreadonly(),
+            "method": memoryview(self._method).toreadonly(),
+            "line": memoryview(self._line).toreadonly(),
+            "bci": memoryview(self._bci).toreadonly(),
+            "instruction": memoryview(self._instruction).toreadonly(),
+            "index": memoryview(self._index).toreadonly(),
+        }
+
+    def to_numpy(self) -> _typ.Dict[str, _typ.Any]:
+        """
+        Returns the columns of the trace (see `columns`) as read-only NumPy
+        arrays, which wrap the columns without copying them. This requires
+        NumPy to be installed.
+
+        :return: A dictionary of NumPy arrays.
+        """
+
+        import numpy as _numpy
+
+        return {
+            name: _numpy.frombuffer(column, dtype="i{}".format(column.itemsize))
+            for (name, column) in self.columns().items()
+        }
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Trace, TraceHistory)):
+            other = other.snapshot()
+        return self.snapshot() == other
+
+    def __repr__(self) -> str:
+        return "Trace(steps={})".format(self._size)
+
+
+class VariableHistory(object):
+    """
+    Index of the values taken by the variables of a program, keyed by the
+    method of their frame ("class.method", as in step records) and their
+    name. For each variable, the steps at which it took a new value (or came
+    back in scope) are kept in sorted arrays, so that its values between two
+    steps are found by bisection, without rescanning the trace.
+
+    Values are interned under a hashable key (lists comparing as tuples, and
+    dictionaries as sets of items), so that each distinct value is stored
+    once, changes are detected by comparing integers, and values which are
+    not hashable, such as arrays, can still be deduplicated. Keys include the
+    type of values, so that `0`, `False` and `0.0` remain distinct.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> _typ.NoReturn:
+        self._size = 0
+        self._observations = 0
+
+        # Interning table of the distinct values
+        self.values_table = []
+        self._value_ids = {}
+
+        # Columns of each variable: the steps of its changes, and the values
+        self._steps = {}
+        self._ids = {}
+
+        # The last value of each variable, and when it was last observed
+        self._last = {}
+
+    @staticmethod
+    def _hashable(value: _typ.Any) -> _typ.Hashable:
+        # A hashable form of a value, under which equal values of the same
+        # type coincide (`0 == False == 0.0` in Python, but not in Java)
+        if isinstance(value, (list, tuple)):
+            return type(value), tuple(VariableHistory._hashable(item) for item in value)
+
+        if isinstance(value, dict):
+            return dict, frozenset((name, VariableHistory._hashable(item)) for (name, item) in value.items())
+
+        try:
+            hash(value)
+            return type(value), value
+
+        except TypeError:
+            return type(value), repr(value)
+
+    def _intern(self, value: _typ.Any) -> int:
+        key = self._hashable(value)
+
+        index = self._value_ids.get(key)
+        if index is None:
+            index = len(self.values_table)
+            self._value_ids[key] = index
+            self.values_table.append(value)
+
+        return index
+
+    def record(self, step: int, method: _typ.Optional[str], variables: _typ.Mapping[str, _typ.Any]) -> _typ.NoReturn:
+        """
+        Adds the values of the variables of a frame at a step. Steps must be
+        recorded in increasing order.
+
+        :param step: The index of the step.
+        :param method: The method of the frame ("class.method").
+        :param variables: The values of the variables, by name.
+        """
+
+        observation = self._observations
+        self._observations += 1
+
+        for (name, value) in variables.items():
+            key = (method, name)
+            last = self._last.get(key)
+
+            # Unchanged values are often the same objects (for instance, when
+            # `JdbProcess` reuses the variables it last retrieved)
+            if last is not None and last[2] == observation - 1 and last[0] is value:
+                self._last[key] = (value, last[1], observation)
+                continue
+
+            index = self._intern(value)
+
+            # Record a change, or the variable coming back in scope
+            if last is None or last[2] != observation - 1 or last[1] != index:
+                if key not in self._steps:
+                    self._steps[key] = _array.array("q")
+                    self._ids[key] = _array.array("q")
+                self._steps[key].append(step)
+                self._ids[key].append(index)
+
+            self._last[key] = (value, index, observation)
+
+    def append(self, info: _typ.Mapping[str, _typ.Any]) -> _typ.NoReturn:
+        """
+        Adds the local variables of a step record (if it has any), the step
+        being indexed by the number of records appended before it.
+
+        :param info: The step record, as returned by `JdbProcess.step`.
+        """
+
+        local = info.get("locals")
+        if local is not None:
+            self.record(self._size, info.get("class.method"), local)
+
+        self._size += 1
+
+    def extend(self, items: _typ.Iterable) -> _typ.NoReturn:
+        for info in items:
+            self.append(info)
+
+    def variables(self) -> _typ.List[_typ.Tuple[_typ.Optional[str], str]]:
+        """
+        Returns the variables of the history, as (method, name) pairs, in
+        the order in which they first appeared.
+
+        :return: The list of variables.
+        """
+
+        return list(self._steps)
+
+    def names(self) -> _typ.List[str]:
+        """
+        Returns the names of the variables of the history, in the order in
+        which they first appeared.
+
+        :return: The list of names.
+        """
+
+        return list(dict.fromkeys(name for (_, name) in self._steps))
+
+    def _changes(
+            self,
+            key: _typ.Tuple[_typ.Optional[str], str],
+            start: _typ.Optional[int],
+            stop: _typ.Optional[int],
+    ) -> _typ.Iterator[_typ.Tuple[int, int]]:
+        # The (step, value index) pairs of a variable, within a range of steps
+        steps = self._steps[key]
+        ids = self._ids[key]
+
+        first = 0 if start is None else _bisect.bisect_left(steps, start)
+        last = len(steps) if stop is None else _bisect.bisect_left(steps, stop)
+
+        return zip(steps[first:last], ids[first:last])
+
+    def _merged_changes(
+            self,
+            name: str,
+            method: _typ.Optional[str],
+            start: _typ.Optional[int],
+            stop: _typ.Optional[int],
+    ) -> _typ.Iterator[_typ.Tuple[int, int]]:
+        if method is not None:
+            keys = [(method, name)] if (method, name) in self._steps else []
+        else:
+            keys = [key for key in self._steps if key[1] == name]
+
+        if len(keys) == 1:
+            return self._changes(keys[0], start, stop)
+
+        # Variables of the same name in several methods, in order of steps
+        return _heapq.merge(*(self._changes(key, start, stop) for key in keys))
+
+    def history(
+            self,
+            name: str,
+            method: _typ.Optional[str] = None,
+            start: _typ.Optional[int] = None,
+            stop: _typ.Optional[int] = None,
+    ) -> _typ.List[_typ.Tuple[int, _typ.Any]]:
+        """
+        Returns the changes of a variable, as (step, value) pairs, from step
+        `start` (included) to step `stop` (excluded).
+
+        :param name: The name of the variable.
+        :param method: The method of its frame; by default, the variables of
+                       that name in all methods.
+        :param start: The first step, if any.
+        :param stop: The step at which to stop, if any.
+        :return: The list of changes, in order of steps.
+        """
+
+        return [
+            (step, self.values_table[index])
+            for (step, index) in self._merged_changes(name, method, start, stop)
+        ]
+
+    def values(
+            self,
+            name: str,
+            method: _typ.Optional[str] = None,
+            start: _typ.Optional[int] = None,
+            stop: _typ.Optional[int] = None,
+            unique: bool = False,
+    ) -> _typ.List[_typ.Any]:
+        """
+        Returns the successive values of a variable (see `history`), without
+        repeating a value which is taken again at the next change.
+
+        :param name: The name of the variable.
+        :param method: The method of its frame; by default, the variables of
+                       that name in all methods.
+        :param start: The first step, if any.
+        :param stop: The step at which to stop, if any.
+        :param unique: Whether to return each distinct value only once (in
+                       the order in which they were first taken).
+        :return: The list of values.
+        """
+
+        indices = []
+        seen = set()
+
+        for (_, index) in self._merged_changes(name, method, start, stop):
+            if unique:
+                if index in seen:
+                    continue
+                seen.add(index)
+
+            elif len(indices) > 0 and indices[-1] == index:
+                continue
+
+            indices.append(index)
+
+        return [self.values_table[index] for index in indices]
+
+    def __len__(self) -> int:
+        return len(self._steps)
+
+    def __contains__(self, name: str) -> bool:
+        return any(key[1] == name for key in self._steps)
+
+    def __repr__(self) -> str:
+        return "VariableHistory(variables={}, values={})".format(len(self._steps), len(self.values_table))
@@ -0,0 +1,674 @@
+
+import atexit as _atexit
+import functools as _functools
+import glob as _glob
+import hashlib as _hashlib
+import json as _json
+import os as _os
+import select as _select
+import shutil as _shutil
+import subprocess as _subprocess
+import sys as _sys
+import tempfile as _tempfile
+import threading as _threading
+import time as _time
+import typing as _typ
+
+
+JAVAC_NAME = "javac"
+JAVAC_VERSION_FLAG = "-version"
+
+# Folder of a compilation cache which records, for each folder that was
+# compiled, the key of its compilation and the classes it produced, so that
+# the compilation can be skipped next time (source folders are left as is)
+COMPILATION_MARKERS_FOLDER = "folders"
+
+# Files of class path entries which can affect the output of `javac`: the
+# compiled classes and archives of libraries (folders of sources, such as
+# other programs next to the one being compiled, are not libraries, and
+# their classes are the output of their own compilations)
+COMPILATION_CLASS_PATH_FILES = (".class", ".jar")
+COMPILATION_SOURCE_FILES = (".java",)
+
+COMPILATION_CACHE_ENV = "PYJDB_CACHE_DIR"
+COMPILATION_CACHE_DEFAULT_PATH = _os.path.join("~", ".cache", "pyjdb", "classes")
+
+JAVA_NAME = "java"
+
+COMPILER_SERVER_CLASS = "PyjdbCompilerServer"
+COMPILER_SERVER_SOURCE = _os.path.join(
+    _os.path.dirname(_os.path.abspath(__file__)), "java", "{}.java".format(COMPILER_SERVER_CLASS))
+COMPILER_SERVER_DEFAULT_PATH = _os.path.join("~", ".cache", "pyjdb", "server")
+
+# Seconds to wait for the server to announce that it is ready, and for the
+# outcome of a compilation, after which `javac` is run instead
+COMPILER_SERVER_START_TIMEOUT = 10
+COMPILER_SERVER_COMPILE_TIMEOUT = 60
+
+
+@_functools.lru_cache(maxsize=None)
+def get_javac_version() -> str:
+    """
+    Returns the version string of `javac` (which is printed on stderr by
+    older versions), or an empty string if `javac` is not available.
+
+    :return: The output of `javac -version`.
+    """
+
+    try:
+        ps = _subprocess.run(
+            [JAVAC_NAME, JAVAC_VERSION_FLAG],
+            stdout=_subprocess.PIPE,
+            stderr=_subprocess.STDOUT,
+        )
+    except OSError:
+        return ""
+
+    return ps.stdout.decode("utf-8", "replace").strip()
+
+
+def _class_path_files(entry: str, excluded: _typ.Set[str]) -> _typ.List[str]:
+    # The files of a class path entry: an archive, the archives of a folder
+    # (for "folder/*"), or the classes and archives under a folder, except
+    # under the excluded folders and folders of sources, which are not
+    # walked
+    if entry.endswith("*"):
+        return sorted(_glob.glob(_os.path.join(entry[:-1], "*.jar")))
+
+    if _os.path.isfile(entry):
+        return [entry]
+
+    files = []
+
+    for (folder, subfolders, names) in _os.walk(entry):
+        if any(name.endswith(COMPILATION_SOURCE_FILES) for name in names):
+            subfolders[:] = []
+            continue
+
+        subfolders[:] = [name for name in subfolders if _os.path.abspath(_os.path.join(folder, name)) not in excluded]
+        files += [_os.path.join(folder, name) for name in names if name.endswith(COMPILATION_CLASS_PATH_FILES)]
+
+    return sorted(files)
+
+
+def get_compilation_key(
+        sources: _typ.Iterable[str],
+        class_path: _typ.List[str],
+        exclude: _typ.Iterable[str] = (),
+) -> str:
+    """
+    Returns a hash of everything that determines the output of `javac`: the
+    names and contents of the source files, the contents of the class path
+    (its classes and archives, rather than its entries' names) and the
+    version of `javac`.
+
+    The folders being compiled (`exclude`) and all other folders of sources
+    are left out of the class path: their classes are the output of
+    compilations, so that a folder has the same key whichever folders are
+    compiled with it, and compiling a folder does not change the key of
+    the others.
+
+    :param sources: The paths of the source files.
+    :param class_path: The class path used for the compilation (relative
+                       entries are relative to the current directory).
+    :param exclude: The folders being compiled.
+    :return: The key of the compilation, as a hexadecimal string.
+    """
+
+    excluded = set(_os.path.abspath(folder) for folder in exclude)
+    h = _hashlib.sha256()
+
+    h.update(get_javac_version().encode("utf-8"))
+
+    for entry in class_path:
+        h.update(b"\0:")
+        if _os.path.abspath(entry) in excluded:
+            continue
+
+        for class_path_file in _class_path_files(entry, excluded):
+            h.update(b"\0")
+            h.update(_os.path.relpath(class_path_file, entry.rstrip("*") or ".").encode("utf-8"))
+            h.update(b"\0")
+            with open(class_path_file, "rb") as f:
+                h.update(f.read())
+
+    for source in sorted(sources, key=_os.path.basename):
+        h.update(b"\0")
+        h.update(_os.path.basename(source).encode("utf-8"))
+        h.update(b"\0")
+        with open(source, "rb") as f:
+            h.update(f.read())
+
+    return h.hexdigest()
+
+
+class CompilationCache(object):
+    """
+    Cache of compiled classes, indexed by the key of their compilation (see
+    `get_compilation_key`), shared by all folders and processes. It also
+    records which folders are already compiled (see `read_marker`).
+    """
+
+    def __init__(self, path: _typ.Optional[str] = None):
+        if path is None:
+            path = _os.environ.get(COMPILATION_CACHE_ENV, COMPILATION_CACHE_DEFAULT_PATH)
+        self.path = _os.path.expanduser(path)
+
+    def _entry_path(self, key: str) -> str:
+        return _os.path.join(self.path, key[:2], key)
+
+    def _marker_path(self, folder: str) -> str:
+        name = _hashlib.sha256(_os.path.abspath(folder).encode("utf-8")).hexdigest()
+        return _os.path.join(self.path, COMPILATION_MARKERS_FOLDER, "{}.json".format(name))
+
+    def read_marker(self, folder: str) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+        """
+        Returns the key of the last compilation of a folder, and the names of
+        the class files it produced, as recorded by `write_marker`.
+
+        :param folder: The folder that was compiled.
+        :return: A dictionary with the keys "key" and "classes", or `None`.
+        """
+
+        try:
+            with open(self._marker_path(folder)) as f:
+                return _json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_marker(self, folder: str, marker: _typ.Dict[str, _typ.Any]) -> _typ.NoReturn:
+        """
+        Records the last compilation of a folder (see `read_marker`).
+
+        :param folder: The folder that was compiled.
+        :param marker: A dictionary with the keys "key" and "classes".
+        """
+
+        path = self._marker_path(folder)
+
+        try:
+            _os.makedirs(_os.path.dirname(path), exist_ok=True)
+
+            # Replace the marker at once, as concurrent processes may read it
+            (handle, staging) = _tempfile.mkstemp(dir=_os.path.dirname(path))
+            with _os.fdopen(handle, "w") as f:
+                _json.dump(marker, f)
+            _os.replace(staging, path)
+
+        except OSError:
+            pass
+
+    def restore(self, key: str, destination: str) -> _typ.Optional[_typ.List[str]]:
+        """
+        Copies the classes of a cached compilation to a folder.
+
+        :param key: The key of the compilation.
+        :param destination: The folder to which the classes are copied.
+        :return: The names of the copied class files, or `None` on a miss.
+        """
+
+        entry = self._entry_path(key)
+        if not _os.path.isdir(entry):
+            return None
+
+        class_files = sorted(_os.listdir(entry))
+        for class_file in class_files:
+            _shutil.copy2(_os.path.join(entry, class_file), _os.path.join(destination, class_file))
+
+        return class_files
+
+    def store(self, key: str, source: str, class_files: _typ.Iterable[str]) -> _typ.NoReturn:
+        """
+        Adds the classes of a compilation to the cache.
+
+        :param key: The key of the compilation.
+        :param source: The folder that contains the class files.
+        :param class_files: The names of the class files.
+        """
+
+        entry = self._entry_path(key)
+        if _os.path.isdir(entry):
+            return
+
+        staging = None
+
+        try:
+            _os.makedirs(_os.path.dirname(entry), exist_ok=True)
+
+            # Populate the entry under a temporary name, then rename it, so
+            # that concurrent processes never see a partial entry
+            staging = _tempfile.mkdtemp(dir=_os.path.dirname(entry))
+            for class_file in class_files:
+                _shutil.copy2(_os.path.join(source, class_file), _os.path.join(staging, class_file))
+            _os.rename(staging, entry)
+
+        except OSError:
+            # The cache is an optimization, which should never prevent tracing
+            if staging is not None:
+                _shutil.rmtree(staging, ignore_errors=True)
+
+
+# The compilations made by the current process, by folder (as recorded in a
+# compilation cache, which is shared by other processes)
+_compiled_folders = {}
+
+
+def _read_marker(path: str, cache: _typ.Optional[CompilationCache]) -> _typ.Optional[_typ.Dict[str, _typ.Any]]:
+    marker = _compiled_folders.get(_os.path.abspath(path))
+    if marker is None and cache is not None:
+        marker = cache.read_marker(path)
+
+    return marker
+
+
+def _write_marker(
+        path: str,
+        key: str,
+        class_files: _typ.List[str],
+        cache: _typ.Optional[CompilationCache],
+) -> _typ.NoReturn:
+    marker = {"key": key, "classes": class_files}
+    _compiled_folders[_os.path.abspath(path)] = marker
+
+    if cache is not None:
+        cache.write_marker(path, marker)
+
+
+def _is_up_to_date(path: str, key: str, cache: _typ.Optional[CompilationCache]) -> bool:
+    # Nothing changed since the last compilation in this folder
+    marker = _read_marker(path, cache)
+    if marker is None or marker.get("key") != key:
+        return False
+
+    return all(_os.path.exists(_os.path.join(path, c)) for c in marker.get("classes", []))
+
+
+def _list_class_files(path: str) -> _typ.List[str]:
+    return sorted(_os.path.basename(f) for f in _glob.glob(_os.path.join(path, "*.class")))
+
+
+def _class_file_stamps(path: str) -> _typ.Dict[str, int]:
+    # The modification times of the class files of a folder
+    stamps = {}
+
+    for class_file in _list_class_files(path):
+        try:
+            stamps[class_file] = _os.stat(_os.path.join(path, class_file)).st_mtime_ns
+        except OSError:
+            pass
+
+    return stamps
+
+
+def _compiled_class_files(path: str, stamps: _typ.Dict[str, int]) -> _typ.List[str]:
+    # The class files which `javac` wrote, given the stamps from before it ran
+    # (other class files of the folder are not part of the compilation)
+    return sorted(
+        class_file for (class_file, stamp) in _class_file_stamps(path).items()
+        if stamps.get(class_file) != stamp
+    )
+
+
+class CompilerServer(object):
+    """
+    Long-lived JVM which compiles Java sources through `javax.tools`, to
+    avoid the startup cost of a `javac` process for every compilation. The
+    helper class (`java/PyjdbCompilerServer.java`) is itself compiled on
+    first use, for each version of `javac`.
+
+    The server is thread-safe, and handles one compilation at a time; if it
+    cannot be started (or dies, or does not answer in time), `compile`
+    returns `None`, so that callers can fall back on running `javac`.
+    """
+
+    def __init__(
+            self,
+            build_path: _typ.Optional[str] = None,
+            start_timeout: float = COMPILER_SERVER_START_TIMEOUT,
+            compile_timeout: float = COMPILER_SERVER_COMPILE_TIMEOUT,
+    ):
+        if build_path is None:
+            build_path = COMPILER_SERVER_DEFAULT_PATH
+        self.build_path = _os.path.expanduser(build_path)
+        self.start_timeout = start_timeout
+        self.compile_timeout = compile_timeout
+        self.process = None
+        self.failed = False
+        self.lock = _threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def _build(self) -> _typ.Optional[str]:
+        # The helper is compiled in a folder specific to its source and to
+        # the version of javac
+        key = get_compilation_key([COMPILER_SERVER_SOURCE], [])
+        class_dir = _os.path.join(self.build_path, key)
+
+        if _os.path.exists(_os.path.join(class_dir, "{}.class".format(COMPILER_SERVER_CLASS))):
+            return class_dir
+
+        staging = None
+
+        try:
+            _os.makedirs(self.build_path, exist_ok=True)
+            staging = _tempfile.mkdtemp(dir=self.build_path)
+            ps = _subprocess.run([JAVAC_NAME, "-d", staging, COMPILER_SERVER_SOURCE])
+            if ps.returncode != 0:
+                raise OSError("Could not compile the compiler server.")
+            _os.rename(staging, class_dir)
+
+        except OSError:
+            if staging is not None:
+                _shutil.rmtree(staging, ignore_errors=True)
+
+            # Another process may have built the class concurrently
+            if not _os.path.isdir(class_dir):
+                return None
+
+        return class_dir
+
+    def start(self) -> bool:
+        """
+        Starts the server, unless it is already running.
+
+        :return: Whether the server is running.
+        """
+
+        if self.active:
+            return True
+
+        # Do not retry to start a server which could not be started
+        if self.failed:
+            return False
+
+        class_dir = self._build()
+
+        try:
+            if class_dir is None:
+                raise OSError("Could not build the compiler server.")
+
+            self.process = _subprocess.Popen(
+                [JAVA_NAME, "-cp", class_dir, COMPILER_SERVER_CLASS],
+                stdin=_subprocess.PIPE,
+                stdout=_subprocess.PIPE,
+                universal_newlines=True,
+                encoding="utf-8",
+            )
+
+            if self._read_line(_time.monotonic() + self.start_timeout) != "READY":
+                raise OSError("The compiler server did not start.")
+
+        except OSError:
+            self.close()
+            self.failed = True
+            return False
+
+        return True
+
+    def _read_line(self, deadline: float) -> _typ.Optional[str]:
+        # The next line printed by the server, unless it does not print one
+        # before the deadline (e.g. a JVM stuck at startup, or a compilation
+        # which hangs); it is read one byte at a time, so that nothing after
+        # it is consumed
+        stdout = self.process.stdout.fileno()
+        line = b""
+
+        while not line.endswith(b"\n"):
+            remaining = deadline - _time.monotonic()
+            if remaining <= 0 or len(_select.select([stdout], [], [], remaining)[0]) == 0:
+                return None
+
+            data = _os.read(stdout, 1)
+            if data == b"":
+                return None
+            line += data
+
+        return line.decode("utf-8", "replace").rstrip("\r\n")
+
+    def compile(self, sources: _typ.List[str], class_path: _typ.List[str]) -> _typ.Optional[bool]:
+        """
+        Compiles source files with debugging information, as `javac -g` does.
+
+        :param sources: The paths of the source files.
+        :param class_path: The class path used for the compilation (relative
+                           entries are relative to the current directory).
+        :return: Whether the compilation succeeded, or `None` if the server
+                 is not available.
+        """
+
+        with self.lock:
+            if not self.start():
+                return None
+
+            # The server does not share our working directory
+            request = ["COMPILE\t{}\t{}".format(
+                ":".join(_os.path.abspath(entry) for entry in class_path),
+                len(sources))]
+            request += [_os.path.abspath(source) for source in sources]
+
+            deadline = _time.monotonic() + self.compile_timeout
+
+            try:
+                self.process.stdin.write("\n".join(request) + "\n")
+                self.process.stdin.flush()
+
+                (status, count) = self._read_response_line(deadline).split("\t")
+                diagnostics = [self._read_response_line(deadline) for _ in range(int(count))]
+
+            except TimeoutError:
+                # The server is stuck: do not rely on it again
+                self.close()
+                self.failed = True
+                return None
+
+            except (OSError, ValueError):
+                self.close()
+                return None
+
+        # Report errors as javac would have
+        if len(diagnostics) > 0:
+            _sys.stderr.write("".join(line + "\n" for line in diagnostics))
+
+        return status == "OK"
+
+    def _read_response_line(self, deadline: float) -> str:
+        # A line of the response to a compilation (see `_read_line`)
+        line = self._read_line(deadline)
+        if line is None:
+            if _time.monotonic() >= deadline:
+                raise TimeoutError("The compiler server did not answer in time.")
+            raise OSError("The compiler server exited.")
+
+        return line
+
+    def close(self) -> _typ.NoReturn:
+        if self.process is not None:
+            # noinspection PyBroadException
+            try:
+                self.process.stdin.close()
+                self.process.kill()
+                self.process.wait()
+            except:
+                pass
+            finally:
+                self.process = None
+
+
+_default_compiler_server = None
+
+
+def get_default_compiler_server() -> CompilerServer:
+    """
+    Returns the compiler server shared by the current process, which is
+    started on first use.
+
+    :return: The default `CompilerServer`.
+    """
+
+    global _default_compiler_server
+
+    if _default_compiler_server is None:
+        _default_compiler_server = CompilerServer()
+        _atexit.register(_default_compiler_server.close)
+
+    return _default_compiler_server
+
+
+def _run_javac(
+        sources: _typ.List[str],
+        class_path: _typ.List[str],
+        server: _typ.Optional[CompilerServer] = None,
+) -> bool:
+    # Prefer the warm compiler, when it is available
+    if server is not None:
+        success = server.compile(sources, class_path)
+        if success is not None:
+            return success
+
+    try:
+        ps = _subprocess.run([
+            JAVAC_NAME,
+            "-classpath",
+            ":".join(class_path),
+            "-g"
+        ] + sources)
+
+    except OSError:
+        return False
+
+    return ps.returncode == 0
+
+
+def compile_directory(
+        path: str = ".",
+        class_name: _typ.Optional[str] = None,
+        class_path: _typ.Optional[_typ.List[str]] = None,
+        cache: _typ.Optional[CompilationCache] = None,
+        server: _typ.Optional[CompilerServer] = None,
+) -> bool:
+    """
+    Compiles the Java sources of a folder with debugging information, unless
+    they have not changed since they were last compiled (in this folder, or
+    in any folder if a `cache` is provided). If the whole folder does not
+    compile, only `class_name` is compiled.
+
+    :param path: The folder that contains the sources.
+    :param class_name: The main class, compiled alone if the folder fails to.
+    :param class_path: The class path used for the compilation.
+    :param cache: An optional cache of compiled classes.
+    :param server: An optional compiler server, used instead of `javac`.
+    :return: Whether the classes are available.
+    """
+
+    if class_path is None:
+        class_path = ["."]
+
+    sources = sorted(_glob.glob(_os.path.join(path, "*.java")))
+    key = get_compilation_key(sources, class_path, [path])
+
+    if _is_up_to_date(path, key, cache):
+        return True
+
+    # Same sources compiled elsewhere
+    if cache is not None:
+        class_files = cache.restore(key, path)
+        if class_files is not None:
+            _write_marker(path, key, class_files, cache)
+            return True
+
+    stamps = _class_file_stamps(path)
+
+    if _run_javac(sources, class_path, server=server):
+        class_files = _compiled_class_files(path, stamps)
+        _write_marker(path, key, class_files, cache)
+        if cache is not None:
+            cache.store(key, path, class_files)
+        return True
+
+    # Fall back on compiling the main class (which is not cached, since it
+    # depends on which classes were already present)
+    if class_name is not None:
+        return _run_javac([_os.path.join(path, "{}.java".format(class_name))], class_path, server=server)
+
+    return False
+
+
+def compile_many(
+        paths: _typ.Iterable[str],
+        class_path: _typ.Optional[_typ.List[str]] = None,
+        cache: _typ.Optional[CompilationCache] = None,
+        server: _typ.Optional[CompilerServer] = None,
+) -> _typ.Dict[str, bool]:
+    """
+    Compiles the Java sources of many folders, skipping those which are
+    already compiled (see `compile_directory`), and compiling the others
+    with as few invocations of `javac` as possible: folders are grouped so
+    that no two folders of a group define a class with the same name, and
+    each group is compiled by a single `javac` (which writes the classes
+    next to their sources). If a group fails to compile, its folders are
+    compiled separately, so that one broken folder does not affect others.
+
+    Note that the folders of a group can see each other's classes; this
+    mode is thus intended for folders of independent programs.
+
+    :param paths: The folders that contain the sources.
+    :param class_path: The class path used for the compilation.
+    :param cache: An optional cache of compiled classes.
+    :param server: An optional compiler server, used instead of `javac`.
+    :return: A dictionary indicating, for each folder, whether it compiled.
+    """
+
+    if class_path is None:
+        class_path = ["."]
+
+    results = {}
+    groups = []
+
+    # The folders may be on the class path (e.g. in the current directory)
+    paths = list(paths)
+
+    for path in paths:
+        sources = sorted(_glob.glob(_os.path.join(path, "*.java")))
+        key = get_compilation_key(sources, class_path, paths)
+
+        if _is_up_to_date(path, key, cache):
+            results[path] = True
+            continue
+
+        if cache is not None:
+            class_files = cache.restore(key, path)
+            if class_files is not None:
+                _write_marker(path, key, class_files, cache)
+                results[path] = True
+                continue
+
+        # Add the folder to the first group without conflicting class names
+        names = set(_os.path.basename(source) for source in sources)
+        for group in groups:
+            if group["names"].isdisjoint(names):
+                break
+        else:
+            group = {"names": set(), "folders": []}
+            groups.append(group)
+
+        group["names"] |= names
+        group["folders"].append((path, sources, key, _class_file_stamps(path)))
+
+    for group in groups:
+        sources = [source for (_, folder_sources, _, _) in group["folders"] for source in folder_sources]
+
+        if len(group["folders"]) > 1 and _run_javac(sources, class_path, server=server):
+            for (path, _, key, stamps) in group["folders"]:
+                class_files = _compiled_class_files(path, stamps)
+                _write_marker(path, key, class_files, cache)
+                if cache is not None:
+                    cache.store(key, path, class_files)
+                results[path] = True
+            continue
+
+        for (path, _, _, _) in group["folders"]:
+            results[path] = compile_directory(path, class_path=class_path, cache=cache, server=server)
+
+    return results
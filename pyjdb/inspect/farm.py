@@ -0,0 +1,235 @@
+import collections as _collections
+import multiprocessing as _multiprocessing
+import multiprocessing.connection as _connection
+import os as _os
+import pickle as _pickle
+import shutil as _shutil
+import signal as _signal
+import tempfile as _tempfile
+import time as _time
+import typing as _typ
+
+import pyjdb.inspect.process as _process
+
+
+TraceJobResult = _collections.namedtuple(
+    "TraceJobResult", ["index", "job", "result", "error", "elapsed"])
+TraceJobResult.__doc__ = """
+The outcome of a job run by `trace_many`: the `index` of the job in the
+list of jobs, the `job` itself, the `result` returned by the trace function
+(or `None`), the `error` that was raised (or `None`), and the number of
+seconds the job took (`elapsed`).
+"""
+
+
+def _raise_system_exit(signum, frame):
+    # Unwind the stack, so that context managers terminate jdb and the target
+    raise SystemExit(1)
+
+
+def _run_trace_job(function, job, isolate):
+    start = _time.monotonic()
+    cwd = _os.getcwd()
+    isolated_path = None
+    result = None
+    error = None
+
+    try:
+        if isolate:
+            # Compile and run in a private copy of the sources, so that
+            # concurrent jobs on the same folder do not overwrite each other's
+            # .class files; a job without a folder runs in the current one
+            isolated_path = _tempfile.mkdtemp(prefix="pyjdb-")
+            job_path = _os.path.join(isolated_path, "job")
+            _shutil.copytree(job.get("path") or cwd, job_path)
+
+            if job.get("path") is not None:
+                job = dict(job, path=job_path)
+            else:
+                _os.chdir(job_path)
+
+        result = function(**job)
+
+    except Exception as e:
+        error = e
+
+    finally:
+        # The worker runs the next job in the same process
+        _os.chdir(cwd)
+        if isolated_path is not None:
+            _shutil.rmtree(isolated_path, ignore_errors=True)
+
+    # Exceptions are not all picklable
+    try:
+        _pickle.dumps(error)
+    except Exception:
+        error = RuntimeError(repr(error))
+
+    return result, error, _time.monotonic() - start
+
+
+def _run_trace_worker(function, isolate, connection):
+    _signal.signal(_signal.SIGTERM, _raise_system_exit)
+
+    while True:
+        try:
+            job = connection.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+
+        (result, error, elapsed) = _run_trace_job(function, job, isolate)
+
+        # Neither are results (nothing is sent if pickling fails)
+        try:
+            connection.send((result, error, elapsed))
+        except Exception as e:
+            error = RuntimeError("Job result could not be sent: {!r}".format(e))
+            connection.send((None, error, elapsed))
+
+    connection.close()
+
+
+def _stop_worker(worker, connection, terminate=False):
+    if terminate:
+        worker.terminate()
+    else:
+        try:
+            connection.send(None)
+        except OSError:
+            pass
+
+    worker.join()
+    connection.close()
+
+
+def trace_many(
+        jobs: _typ.Iterable[_typ.Mapping[str, _typ.Any]],
+        workers: _typ.Optional[int] = None,
+        timeout: _typ.Optional[float] = None,
+        isolate: bool = True,
+        function: _typ.Callable = _process.get_program_trace,
+) -> _typ.Iterator[TraceJobResult]:
+    """
+    Runs many tracing jobs in parallel, in a pool of worker processes, and
+    yields their results as soon as each job completes (so not necessarily in
+    the order of `jobs`).
+
+    Each job is a dictionary of keyword arguments for `function` (by default
+    `get_program_trace`, so for instance `class_name`, `path`, `args` and
+    `stdin_text`). Because each job runs in a separate process, changing the
+    working directory (as `JdbProcessContextManager` does) is safe. A job
+    whose worker exits without a result (for instance, because the result
+    cannot be pickled, or because it crashed) is reported with an error, and
+    the worker is replaced.
+
+    Workers are spawned (rather than forked from a parent which may hold
+    threads and open terminals) once, and each runs many jobs.
+
+    :param jobs: The keyword arguments of each call to `function`.
+    :param workers: The maximum number of concurrent jobs (by default, the
+                    number of CPUs).
+    :param timeout: The maximum number of seconds for a single job, after
+                    which its worker is terminated and the job is reported
+                    with a `TimeoutError`.
+    :param isolate: Whether to run each job in a temporary copy of its `path`
+                    (or, for jobs without one, of the current directory).
+    :param function: The (module-level) tracing function to call for each job.
+    :return: An iterator of `TraceJobResult`, in order of completion.
+    """
+
+    if workers is None:
+        workers = _os.cpu_count() or 1
+
+    context = _multiprocessing.get_context("spawn")
+
+    pending = _collections.deque(enumerate(jobs))
+    idle = []
+    running = {}
+
+    def start_worker():
+        (connection, worker_connection) = context.Pipe()
+        worker = context.Process(
+            target=_run_trace_worker,
+            args=(function, isolate, worker_connection),
+            daemon=True,
+        )
+        worker.start()
+
+        # Only the worker holds its end, so that the pipe is closed when it exits
+        worker_connection.close()
+        idle.append((worker, connection))
+
+    try:
+        for _ in range(min(workers, len(pending))):
+            start_worker()
+
+        while len(pending) > 0 or len(running) > 0:
+
+            # Give a job to each idle worker; each worker has its own pipe, so
+            # that terminating a job cannot corrupt the results of the others
+            while len(pending) > 0 and len(idle) > 0:
+                index, job = pending.popleft()
+                (worker, connection) = idle.pop()
+                try:
+                    connection.send(job)
+                except Exception as e:
+                    idle.append((worker, connection))
+                    error = RuntimeError("Job could not be sent: {!r}".format(e))
+                    yield TraceJobResult(index, job, None, error, 0.0)
+                    continue
+
+                running[connection] = (index, worker, job, _time.monotonic())
+
+            if len(running) == 0:
+                continue
+
+            # Wait for a result (or an exit), or for the next job to be over time
+            wait_timeout = None
+            if timeout is not None:
+                deadline = min(start for (_, _, _, start) in running.values()) + timeout
+                wait_timeout = max(0.0, deadline - _time.monotonic())
+
+            ready = _connection.wait(list(running), timeout=wait_timeout)
+
+            for connection in ready:
+                (index, worker, job, start) = running.pop(connection)
+
+                # A worker which exits (or crashes) without sending its result
+                # closes the pipe, and has failed whatever its exit code
+                try:
+                    (result, error, elapsed) = connection.recv()
+                except (EOFError, OSError):
+                    _stop_worker(worker, connection, terminate=True)
+                    (result, error, elapsed) = (
+                        None,
+                        RuntimeError("Worker exited with code {} without a result".format(worker.exitcode)),
+                        _time.monotonic() - start,
+                    )
+                    if len(pending) > 0:
+                        start_worker()
+                else:
+                    idle.append((worker, connection))
+
+                yield TraceJobResult(index, job, result, error, elapsed)
+
+            # Terminate the workers whose jobs are over time
+            now = _time.monotonic()
+            for connection, (index, worker, job, start) in list(running.items()):
+                if timeout is not None and now - start >= timeout:
+                    del running[connection]
+                    _stop_worker(worker, connection, terminate=True)
+                    if len(pending) > 0:
+                        start_worker()
+                    yield TraceJobResult(
+                        index, job, None,
+                        TimeoutError("Job exceeded {} seconds".format(timeout)),
+                        now - start)
+
+    finally:
+        # Jobs that are still running when iteration stops early
+        for connection, (_, worker, _, _) in running.items():
+            _stop_worker(worker, connection, terminate=True)
+        for (worker, connection) in idle:
+            _stop_worker(worker, connection)
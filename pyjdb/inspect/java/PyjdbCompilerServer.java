@@ -0,0 +1,89 @@
+/******************************************************************************
+    Compilation server for pyjdb, which keeps a JVM (and the Java compiler)
+    warm between compilations, to avoid paying for the startup of `javac`
+    for every program that is traced.
+
+    Protocol (one request at a time, on stdin/stdout, UTF-8):
+
+        <- READY
+        -> COMPILE<TAB><class path><TAB><number of files>
+        -> <path of source file 1>
+        -> ...
+        <- OK|FAILED<TAB><number of lines of diagnostics>
+        <- <diagnostics line 1>
+        <- ...
+
+    Class files are written next to their sources, as `javac` does when it
+    is not given the -d option.
+******************************************************************************/
+
+import java.io.BufferedReader;
+import java.io.File;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.io.StringWriter;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.List;
+
+import javax.tools.JavaCompiler;
+import javax.tools.JavaFileObject;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.ToolProvider;
+
+
+public class PyjdbCompilerServer {
+    public static void main(String[] args) throws Exception {
+        BufferedReader in = new BufferedReader(
+            new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        PrintStream out = new PrintStream(System.out, true, "UTF-8");
+
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+        if (compiler == null) {
+            out.println("ERROR\tNo system Java compiler available");
+            return;
+        }
+
+        out.println("READY");
+
+        String line;
+        while ((line = in.readLine()) != null) {
+            String[] header = line.split("\t", -1);
+            if (header.length != 3 || !header[0].equals("COMPILE")) {
+                out.println("ERROR\tMalformed request");
+                continue;
+            }
+
+            String classPath = header[1];
+            int count = Integer.parseInt(header[2]);
+
+            List<File> files = new ArrayList<File>();
+            for (int i = 0; i < count; i++)
+                files.add(new File(in.readLine()));
+
+            // Diagnostics are written to this writer, as javac would print them
+            StringWriter diagnostics = new StringWriter();
+            boolean success;
+
+            try (StandardJavaFileManager fileManager =
+                     compiler.getStandardFileManager(null, null, StandardCharsets.UTF_8)) {
+                Iterable<? extends JavaFileObject> units =
+                    fileManager.getJavaFileObjectsFromFiles(files);
+                List<String> options = Arrays.asList("-g", "-classpath", classPath);
+                success = compiler.getTask(
+                    diagnostics, fileManager, null, options, null, units).call();
+            } catch (Exception e) {
+                success = false;
+                diagnostics.write(e.toString());
+            }
+
+            String text = diagnostics.toString().trim();
+            String[] lines = text.isEmpty() ? new String[0] : text.split("\r?\n");
+
+            out.println((success ? "OK" : "FAILED") + "\t" + lines.length);
+            for (String diagnostic : lines)
+                out.println(diagnostic);
+        }
+    }
+}
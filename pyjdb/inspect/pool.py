@@ -0,0 +1,253 @@
+import collections as _collections
+import concurrent.futures as _futures
+import contextlib as _contextlib
+import os as _os
+import threading as _threading
+import typing as _typ
+
+import pyjdb.core.jdb_process as _jdb_process
+import pyjdb.inspect.compiler as _compiler
+import pyjdb.inspect.process as _process
+
+
+class JdbSessionPool(object):
+    """
+    Pool of debugging sessions of a class, launched ahead of time: each
+    session (a target JVM and the `jdb` process attached to it, or with the
+    experimental `jdwp` backend, the connection to its debugging agent) is
+    spawned in the background, and waits, suspended at the entry method,
+    until it is checked out with `acquire`. Traces then skip the startup of
+    the JVMs.
+
+    The class path is relative to `path` (not to the current directory),
+    since sessions are spawned from other threads.
+
+    As the command-line arguments of a program are set when its JVM is
+    launched, sessions are pooled by arguments; programs which are traced
+    with many inputs should preferably read them from their standard input.
+    A session can only be used for a single trace: every session that is
+    checked out is replaced by a new one, launched in the background.
+    """
+
+    def __init__(
+            self,
+            class_name: str,
+            path: _typ.Optional[str] = None,
+            class_path: _typ.Optional[_typ.List[str]] = None,
+            size: int = 2,
+            entry_method: str = "main",
+            exclude_classes: _typ.Optional[_typ.List[str]] = None,
+            compilation_cache: _typ.Optional[_compiler.CompilationCache] = None,
+            backend: str = "jdb",
+    ):
+        _process._check_backend(backend)
+
+        self.class_name = class_name
+        self.path = _os.path.abspath(path if path is not None else _os.getcwd())
+        self.class_path = _absolute_class_path(self.path, class_path)
+        self.size = size
+        self.entry_method = entry_method
+        self.exclude_classes = exclude_classes
+        self.backend = backend
+
+        self._sessions = _collections.defaultdict(_collections.deque)
+        self._lock = _threading.Lock()
+        self._executor = _futures.ThreadPoolExecutor(max_workers=max(1, size))
+        self._closed = False
+
+        # Sessions are spawned in the background, so compile beforehand
+        # (optionally through a cache; `True` selects the default cache)
+        if compilation_cache is True:
+            compilation_cache = _compiler.CompilationCache()
+
+        _compiler.compile_directory(
+            path=self.path,
+            class_name=self.class_name,
+            class_path=self.class_path,
+            cache=compilation_cache or None,
+        )
+
+    def _spawn(self, args: _typ.Optional[str]) -> _jdb_process.JdbProcess:
+        p = _process.SESSION_BACKENDS[self.backend](
+            self.class_name,
+            class_path=self.class_path,
+            entry_method=self.entry_method,
+            exclude_classes=self.exclude_classes,
+        )
+
+        # Sessions are spawned from other threads, so they cannot rely on
+        # the current directory
+        p.cwd = self.path
+        p.spawn(args, capture_target=True)
+
+        return p
+
+    def _launch(self, args: _typ.Optional[str]) -> _typ.NoReturn:
+        # Must be called with the lock held
+        self._sessions[args].append(self._executor.submit(self._spawn, args))
+
+    def prestart(self, args: _typ.Optional[str] = None, count: _typ.Optional[int] = None) -> _typ.NoReturn:
+        """
+        Launches sessions in the background, until `count` sessions (by
+        default, the size of the pool) are ready or starting for `args`.
+
+        :param args: The command-line arguments of the program.
+        :param count: The number of sessions to keep ready.
+        """
+
+        count = self.size if count is None else count
+
+        with self._lock:
+            if self._closed:
+                return
+
+            while len(self._sessions[args]) < count:
+                self._launch(args)
+
+    def _check_session(
+            self,
+            class_name: _typ.Optional[str],
+            path: _typ.Optional[str],
+            class_path: _typ.Optional[_typ.List[str]],
+            backend: _typ.Optional[str],
+    ) -> _typ.NoReturn:
+        # Sessions of the pool can only replace sessions of the same class,
+        # launched from the same folder, with the same class path and backend
+        if class_name is not None and class_name != self.class_name:
+            raise ValueError("The session pool traces {}, not {}.".format(self.class_name, class_name))
+
+        if path is not None and _os.path.abspath(path) != self.path:
+            raise ValueError("The session pool runs in {}, not {}.".format(self.path, _os.path.abspath(path)))
+
+        if class_path is not None and set(_absolute_class_path(self.path, class_path)) != set(self.class_path):
+            raise ValueError("The session pool uses the class path {}, not {}.".format(
+                ":".join(self.class_path), ":".join(_absolute_class_path(self.path, class_path))))
+
+        if backend is not None and backend != self.backend:
+            raise ValueError("The session pool uses the {!r} backend, not {!r}.".format(self.backend, backend))
+
+    def acquire(
+            self,
+            args: _typ.Optional[str] = None,
+            timeout: _typ.Optional[float] = None,
+            class_name: _typ.Optional[str] = None,
+            path: _typ.Optional[str] = None,
+            class_path: _typ.Optional[_typ.List[str]] = None,
+            backend: _typ.Optional[str] = None,
+    ) -> _jdb_process.JdbProcess:
+        """
+        Checks out a session, suspended at the entry method of the class,
+        and launched beforehand if possible. The session belongs to the
+        caller, which should close it once done (see `session`); it is
+        replaced in the pool by a new session, launched in the background.
+
+        A session which failed to start is replaced by one spawned on the
+        spot; if that fails too, its error is raised, caused by the first.
+
+        The class, folder, class path (relative to the folder) and backend
+        that the caller expects, when given, are checked against those of the
+        pool.
+
+        :param args: The command-line arguments of the program.
+        :param timeout: The number of seconds to wait for a session which is
+                        still starting.
+        :param class_name: The class which the caller expects to trace.
+        :param path: The folder of the class.
+        :param class_path: The class path, relative to `path`.
+        :param backend: The kind of session (see `process.SESSION_BACKENDS`).
+        :return: A spawned `JdbProcess` (or `JdwpProcess`).
+        """
+
+        self._check_session(class_name, path, class_path, backend)
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The session pool is closed.")
+
+            # Sessions are launched in order, so the caller's comes first
+            queue = self._sessions[args]
+            if len(queue) == 0:
+                self._launch(args)
+            future = queue.popleft()
+
+            # Keep the pool full for these arguments
+            while len(queue) < self.size:
+                self._launch(args)
+
+        # A session which failed to start, or died while idle, is replaced by
+        # a session spawned on the spot
+        error = None
+        try:
+            p = future.result(timeout=timeout)
+            if p.active:
+                return p
+            p.close()
+
+        except _futures.TimeoutError:
+            future.add_done_callback(_close_future_session)
+
+        except Exception as e:
+            error = e
+
+        try:
+            return self._spawn(args)
+
+        except Exception as e:
+            # If spawning fails again, the first failure is likely the cause
+            if error is None:
+                raise
+            raise e from error
+
+    @_contextlib.contextmanager
+    def session(self, args: _typ.Optional[str] = None, timeout: _typ.Optional[float] = None):
+        """
+        Checks out a session (see `acquire`) for the duration of a `with`
+        block, and closes it afterwards.
+
+        :param args: The command-line arguments of the program.
+        :param timeout: The number of seconds to wait for a session which is
+                        still starting.
+        """
+
+        p = self.acquire(args, timeout=timeout)
+        try:
+            yield p
+        finally:
+            p.close()
+
+    def close(self) -> _typ.NoReturn:
+        """
+        Terminates the sessions that were not checked out.
+        """
+
+        with self._lock:
+            self._closed = True
+            futures = [future for queue in self._sessions.values() for future in queue]
+            self._sessions.clear()
+
+        for future in futures:
+            future.add_done_callback(_close_future_session)
+
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _absolute_class_path(path: str, class_path: _typ.Optional[_typ.List[str]]) -> _typ.List[str]:
+    # Resolve a class path relative to a folder, which it always includes
+    class_path = [_os.path.abspath(_os.path.join(path, entry)) for entry in (class_path or [])]
+
+    if path not in class_path:
+        class_path.append(path)
+
+    return class_path
+
+
+def _close_future_session(future: _futures.Future) -> _typ.NoReturn:
+    # Close a session once it has started, when it is no longer needed
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
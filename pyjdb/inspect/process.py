@@ -1,115 +1,278 @@
 
-import copy as _copy
-import glob as _glob
 import itertools as _itertools
 import os as _os
-import subprocess as _subprocess
 
 import pyjdb.core.exceptions as _exceptions
+import pyjdb.core.helpers as _helpers
 import pyjdb.core.jdb_process as _jdb_process
+import pyjdb.core.jdwp_process as _jdwp_process
+import pyjdb.core.trace as _trace
+import pyjdb.inspect.compiler as _compiler
 
 
-def get_program_variables_trace(class_name, path=None, class_path=None, args=None, unique=False, stdin_text=None):
+# The classes of debugging sessions, by backend: `jdb` scrapes the output of
+# the `jdb` CLI
+SESSION_BACKENDS = {
+    "jdb": _jdb_process.JdbProcess,
+}
+
+# The backends which are only offered once enabled (see `enable_backend`):
+# `jdwp` talks to the debugging agent of the JVM directly, but has yet to be
+# benchmarked against `jdb` (`benchmarks/run_benchmarks.py --backend`) and
+# validated by the JVM tests (`tests/test_jdwp_jvm.py`)
+EXPERIMENTAL_SESSION_BACKENDS = {
+    "jdwp": _jdwp_process.JdwpProcess,
+}
+
+
+def enable_backend(name):
+    """
+    Offers an experimental backend (see `EXPERIMENTAL_SESSION_BACKENDS`), so
+    that it can be selected with the `backend` argument of the helpers and
+    of `JdbSessionPool`.
+
+    :param name: The name of the backend (e.g. "jdwp").
+    """
+
+    if name not in SESSION_BACKENDS:
+        if name not in EXPERIMENTAL_SESSION_BACKENDS:
+            raise ValueError("Unknown backend: {!r}".format(name))
+        SESSION_BACKENDS[name] = EXPERIMENTAL_SESSION_BACKENDS[name]
+
+
+def _check_backend(name):
+    # Experimental backends are rejected until they are enabled
+    if name in SESSION_BACKENDS:
+        return
+
+    if name in EXPERIMENTAL_SESSION_BACKENDS:
+        raise ValueError(
+            "The {!r} backend is experimental: enable it with `enable_backend({!r})`.".format(name, name))
+
+    raise ValueError("Unknown backend: {!r}".format(name))
+
+
+def get_program_variables_trace(class_name, path=None, class_path=None, args=None, unique=False, stdin_text=None,
+                                locals_policy=_helpers.LOCALS_POLICY_ALWAYS, pool=None, backend="jdb",
+                                max_steps=None, max_wall_time=None, command_timeout=None,
+                                return_truncated=False, return_history=False):
 
     with JdbProcessContextManager(
         class_name=class_name,
         path=path,
         class_path=class_path,
         args=args,
+        pool=pool,
+        backend=backend,
     ) as p:
 
         p.trace_max = 5
 
-        variables = {}
+        if command_timeout is not None:
+            p.command_timeout = command_timeout
+
+        # Index the values of each variable, by method and step
+        history = _trace.VariableHistory()
         exception = False
 
         if stdin_text is not None and stdin_text != "":
             p.target_send_line(stdin_text)
 
-        while True:
-
-            # Try to make an additional step and retrieve local variables
-            result = None
-            try:
-                p.step()
-                result = p.locals()
+        try:
+            # Each step retrieves the local variables (at most) once
+            steps = p.iter_steps(locals_policy=locals_policy, max_steps=max_steps, max_wall_time=max_wall_time)
 
-            except _exceptions.JdbHostErrorException:
-                exception = True
-                break
+            for (step, info) in enumerate(steps):
 
-            except _exceptions.JdbHostExitedException:
-                break
+                # Retrieve local variables
+                result = p.current_locals
+                if result is None:
+                    continue
 
-            if result is None:
-                continue
+                # Store the values of each variable
+                (args, local_vars) = result
+                history.record(step, info.get("class.method"), dict(_itertools.chain(args.items(), local_vars.items())))
 
-            # Store the values of each variable
-            (args, local_vars) = result
+        except _exceptions.JdbHostErrorException:
+            exception = True
 
-            for (var, val) in _itertools.chain(args.items(), local_vars.items()):
-                # Add the current value a variable is taking to a possibly empty history
-                # of values
-                variables[var] = variables.get(var, list())
+        except _exceptions.JdbHostExitedException:
+            pass
 
-                if len(variables[var]) == 0:
-                    variables[var].append(val)
-                else:
-                    if val != variables[var][-1]:
-                        variables[var].append(val)
+        # The history of values of each variable (whichever its method)
+        if return_history:
+            variables = history
+        else:
+            variables = {var: history.values(var, unique=unique) for var in history.names()}
 
-        if unique:
-            variables_unique_values = {
-                var: list(set(vals)) for (var, vals) in variables.items()
-            }
-            return exception, variables_unique_values
+        # The reason why the trace stopped early, if it did
+        if return_truncated:
+            return exception, variables, p.truncated
 
         return exception, variables
 
 
-def get_program_trace(class_name, path=None, class_path=None, args=None, stdin_text=None):
+def get_program_trace(class_name, path=None, class_path=None, args=None, stdin_text=None, columnar=False,
+                      sinks=None, keep_trace=True, pool=None, backend="jdb", include_classes=None,
+                      include_methods=None, max_depth=None, skip_policy=None, max_steps=None, max_wall_time=None,
+                      command_timeout=None, return_truncated=False, catch_exceptions=False):
 
     with JdbProcessContextManager(
         class_name=class_name,
         path=path,
         class_path=class_path,
         args=args,
+        pool=pool,
+        backend=backend,
+        include_classes=include_classes,
+        include_methods=include_methods,
+        max_depth=max_depth,
+        skip_policy=skip_policy,
     ) as p:
 
         # Remove cap on trace history
         p.trace_max = None
+        p.trace_columnar = columnar
+        p.keep_trace = keep_trace
+
+        if command_timeout is not None:
+            p.command_timeout = command_timeout
+
+        # Record the exceptions which are caught, and trace their handlers
+        if catch_exceptions:
+            p.catch_exceptions = True
+
+        # Stream the steps out as they are parsed
+        for sink in sinks or []:
+            p.add_trace_sink(sink)
 
         exception = False
 
         if stdin_text is not None and stdin_text != "":
             p.target_send_line(stdin_text)
 
-        while True:
-
-            # Try to make an additional step
-            try:
-                p.step(include_locals=True)
+        # Make steps until the program terminates
+        try:
+            for _ in p.iter_steps(include_locals=True, max_steps=max_steps, max_wall_time=max_wall_time):
+                pass
 
-            except _exceptions.JdbHostErrorException:
-                exception = True
-                break
+        except _exceptions.JdbHostErrorException:
+            exception = True
 
-            except _exceptions.JdbHostExitedException:
-                break
+        # The process is discarded, so its history need not be copied
+        if not keep_trace:
+            trace_history = None
+        elif columnar:
+            trace_history = p.trace
+        else:
+            trace_history = p.trace.snapshot()
 
-        trace_history = _copy.deepcopy(p.trace)
+        # The reason why the trace stopped early, if it did
+        if return_truncated:
+            return exception, trace_history, p.truncated
 
         return exception, trace_history
 
 
+def get_program_samples(class_name, breakpoints, watches=None, path=None, class_path=None, args=None,
+                        stdin_text=None, include_locals=True, pool=None):
+
+    with JdbProcessContextManager(
+        class_name=class_name,
+        path=path,
+        class_path=class_path,
+        args=args,
+        pool=pool,
+    ) as p:
+
+        # Remove cap on trace history
+        p.trace_max = None
+
+        exception = False
+
+        if stdin_text is not None and stdin_text != "":
+            p.target_send_line(stdin_text)
+
+        # Run from breakpoint to breakpoint until the program terminates
+        samples = []
+        try:
+            for info in p.iter_samples(
+                    breakpoints=breakpoints,
+                    watches=watches or [],
+                    include_locals=include_locals):
+                samples.append(info)
+
+        except _exceptions.JdbHostErrorException:
+            exception = True
+
+        return exception, samples
+
+
+def get_program_call_tree(class_name, path=None, class_path=None, args=None, stdin_text=None,
+                          include_arguments=True, pool=None):
+
+    with JdbProcessContextManager(
+        class_name=class_name,
+        path=path,
+        class_path=class_path,
+        args=args,
+        pool=pool,
+    ) as p:
+
+        # The tree is the result, so do not keep the history
+        p.keep_trace = False
+
+        exception = False
+        tree = None
+
+        if stdin_text is not None and stdin_text != "":
+            p.target_send_line(stdin_text)
+
+        try:
+            tree = p.trace_calls(include_arguments=include_arguments)
+
+        except _exceptions.JdbHostErrorException:
+            exception = True
+
+        return exception, tree
+
+
 class JdbProcessContextManager(object):
 
-    def __init__(self, class_name, path=None, class_path=None, args=None):
+    def __init__(self, class_name, path=None, class_path=None, args=None, compilation_cache=None,
+                 compiler_server=None, pool=None, backend="jdb", include_classes=None, include_methods=None,
+                 max_depth=None, skip_policy=None):
         self.path = path
         self.class_name = class_name
         self.class_path = class_path if class_path is not None else ["."]
         self.args = args
 
+        # Optionally share compiled classes between folders and processes
+        # through a cache (`True` selects the default cache)
+        if compilation_cache is True:
+            compilation_cache = _compiler.CompilationCache()
+        self.compilation_cache = compilation_cache or None
+
+        # Optionally compile with a warm JVM rather than a `javac` process
+        # (`True` selects the server shared by the current process)
+        if compiler_server is True:
+            compiler_server = _compiler.get_default_compiler_server()
+        self.compiler_server = compiler_server or None
+
+        # Optionally check out a session launched beforehand (the pool then
+        # takes care of compiling the class)
+        self.pool = pool
+
+        # The kind of debugging session (see `SESSION_BACKENDS`)
+        _check_backend(backend)
+        self.backend = backend
+
+        # Optionally restrict tracing to some methods (see `JdbProcess.step`)
+        self.include_classes = include_classes
+        self.include_methods = include_methods
+        self.max_depth = max_depth
+        self.skip_policy = skip_policy
+
         self.jdb_process = None
         self.original_path = None
 
@@ -118,35 +281,27 @@ class JdbProcessContextManager(object):
             self.class_path.append(".")
 
     def compile(self):
-        compiled_all = True
-        compiled_class = True
-
-        try:
-            ps1 = _subprocess.run([
-                "javac",
-                "-classpath",
-                ":".join(self.class_path),
-                "-g"
-            ] + _glob.glob("*.java"))
-
-        except:
-            compiled_all = False
-
-        if not compiled_all:
-
-            try:
-                ps2 = _subprocess.run([
-                    "javac",
-                    "-classpath",
-                    ":".join(self.class_path),
-                    "-g",
-                    "{}.java".format(self.class_name)])
-            except:
-                compiled_class = False
-
-        can_continue = compiled_all or compiled_class
+        # Skips javac when the sources did not change since they were compiled
+        return _compiler.compile_directory(
+            path=".",
+            class_name=self.class_name,
+            class_path=self.class_path,
+            cache=self.compilation_cache,
+            server=self.compiler_server,
+        )
 
-        return can_continue
+    def configure(self, p):
+        # Set the filters of traced methods (which apply to sessions from a
+        # pool too, as they are applied while stepping)
+        if self.include_classes is not None:
+            p.include_classes = self.include_classes
+        if self.include_methods is not None:
+            p.include_methods = self.include_methods
+        if self.max_depth is not None:
+            p.max_depth = self.max_depth
+        if self.skip_policy is not None:
+            p.skip_policy = self.skip_policy
+        return p
 
     def __enter__(self):
         # Switch to target folder (otherwise staying in current directory)
@@ -154,14 +309,30 @@ class JdbProcessContextManager(object):
             self.original_path = _os.getcwd()
             _os.chdir(self.path)
 
+        if self.pool is not None:
+            # The pool must launch the same sessions as this manager would
+            try:
+                self.jdb_process = self.pool.acquire(
+                    self.args,
+                    class_name=self.class_name,
+                    path=_os.getcwd(),
+                    class_path=self.class_path,
+                    backend=self.backend,
+                )
+            except ValueError:
+                self.__exit__()
+                raise
+
+            return self.configure(self.jdb_process)
+
         # Compile files
         self.compile()
 
         # Spawn the JDB process (and make sure to capture stdin/stdout)
-        self.jdb_process = _jdb_process.JdbProcess(
+        self.jdb_process = self.configure(SESSION_BACKENDS[self.backend](
             self.class_name,
             class_path=self.class_path,
-        )
+        ))
         self.jdb_process.spawn(self.args, capture_target=True)
 
         return self.jdb_process
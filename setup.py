@@ -34,6 +34,9 @@ setup(
         "Programming Language :: Python :: 3.7",
     ],
     packages=find_packages(),
+    package_data={
+        "pyjdb": ["inspect/java/*.java"],
+    },
     install_requires=[
         "pexpect",
         "typing",
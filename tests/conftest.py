@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+
+TRANSCRIPTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcripts")
+
+
+def read_transcript(name: str) -> str:
+    # Transcripts keep the "\r\n" line endings of the PTY
+    with open(os.path.join(TRANSCRIPTS_PATH, name), newline="") as f:
+        return f.read()
+
+
+@pytest.fixture
+def transcript():
+    return read_transcript
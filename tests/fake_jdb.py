@@ -0,0 +1,167 @@
+import asyncio
+import collections
+
+import pexpect
+
+from pyjdb.core import async_jdb_process as _async_jdb_process
+from pyjdb.core import events as _events
+from pyjdb.core import jdb_process as _jdb_process
+
+
+PROMPT = "main[1] "
+
+STEP_HEADERS = {
+    "step": "Step completed:",
+    "entered": "Method entered:",
+}
+
+
+def step_outcome(kind, method, line, bci, instruction):
+    return "\r\n{} \"thread=main\", {}, line={} bci={}\r\n{:<14d}{}\r\n\r\n{}".format(
+        STEP_HEADERS[kind], method, line, bci, line, instruction, PROMPT)
+
+
+def locals_outcome(arguments, variables):
+    lines = ["Method arguments:"] + ["{} = {}".format(*item) for item in arguments.items()]
+    lines += ["Local variables:"] + ["{} = {}".format(*item) for item in variables.items()]
+    return "\r\n".join(lines) + "\r\n" + PROMPT
+
+
+class FakeJdbPty(object):
+    """
+    Stands for the PTY of a `jdb` session suspended in the entry method,
+    which makes the steps of a script: each step is a tuple of the output of
+    the step, and of the `locals` command at its location.
+
+    As `jdb`, commands are run in order, and those received while the VM
+    runs (after a step, until it completes) are rejected. Commands written
+    before the output is read are taken to arrive while the VM still runs.
+    """
+
+    string_type = str
+
+    def __init__(self, steps):
+        self.steps = collections.deque(steps)
+        self.timeout = 5
+        self.buffer = ""
+        self.closed = False
+        self.commands = []
+        self.rejected = []
+        self._input = collections.deque()
+        self._output = ""
+        self._locals = None
+        self._exited = False
+
+    def eof(self):
+        return self._exited and len(self._output) == 0
+
+    def sendline(self, line):
+        self.commands.append(line)
+        self._input.append(line)
+
+    def _run(self):
+        running = False
+
+        while len(self._input) > 0:
+            command = self._input.popleft()
+
+            if running or self._exited:
+                self.rejected.append(command)
+                self._output += "Nothing suspended.\r\n> "
+
+            elif command.startswith(("step", "next")):
+                running = True
+                self._output += "> "
+
+            elif command == "locals":
+                self._output += self._locals
+
+            else:
+                self._output += PROMPT
+
+        # The VM stops at the next step once the pending commands are read
+        if running:
+            if len(self.steps) == 0:
+                self._output += "\r\nThe application exited\r\n"
+                self._exited = True
+            else:
+                (outcome, self._locals) = self.steps.popleft()
+                self._output += outcome
+
+    def read_nonblocking(self, size=1, timeout=-1):
+        if len(self._output) == 0:
+            self._run()
+
+        if len(self._output) == 0:
+            if self._exited:
+                raise pexpect.EOF("End of file")
+            raise pexpect.TIMEOUT("Timeout")
+
+        (data, self._output) = (self._output[:size], self._output[size:])
+        return data
+
+    def close(self, force=False):
+        self.closed = True
+
+
+class FakeAsyncJdbSubprocess(object):
+    """
+    Stands for the `asyncio` subprocess of a `jdb` session, as `FakeJdbPty`.
+    """
+
+    def __init__(self, steps):
+        self.jdb = FakeJdbPty(steps)
+        self.stdin = self
+        self.stdout = self
+        self.returncode = None
+
+    def write(self, data):
+        for line in data.decode("utf-8").splitlines():
+            self.jdb.sendline(line)
+
+    async def drain(self):
+        pass
+
+    async def read(self, size):
+        try:
+            return self.jdb.read_nonblocking(size).encode("utf-8")
+        except pexpect.EOF:
+            self.returncode = 0
+            return b""
+        except pexpect.TIMEOUT:
+            raise asyncio.TimeoutError()
+
+    def kill(self):
+        self.returncode = -9
+
+    async def wait(self):
+        return self.returncode
+
+
+def make_process(steps):
+    """
+    Makes a `JdbProcess` attached to a `FakeJdbPty`, as after `spawn`.
+    """
+
+    process = _jdb_process.JdbProcess("IterPower")
+    process.pty = FakeJdbPty(steps)
+    process.events = _events.JdbEventStream(process.pty, stats=process.stats)
+    process._reset_threads("main")
+    process._reset_call_depth()
+    process._reset_trace_history()
+    return process
+
+
+def make_async_process(steps):
+    """
+    Makes an `AsyncJdbProcess` attached to a `FakeAsyncJdbSubprocess`, as
+    after `spawn`.
+    """
+
+    process = _async_jdb_process.AsyncJdbProcess("IterPower")
+    process.pty = FakeAsyncJdbSubprocess(steps)
+    process.events = _events.AsyncJdbEventStream(process.pty.stdout, stats=process.stats)
+    process.tracer._reset_threads("main")
+    process.tracer._reset_call_depth()
+    process.tracer._reset_trace_history()
+    return process
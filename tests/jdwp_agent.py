@@ -0,0 +1,80 @@
+import socket
+import struct
+import threading
+
+from pyjdb.core import jdwp as _jdwp
+
+
+class FakeJdwpAgent(object):
+    """
+    Minimal JDWP agent, listening on a local port, which answers each command
+    with a handler: `handler(agent, command, reader)` returns the data of the
+    reply (a `JdwpWriter` or bytes), or an error code (an int). Handlers may
+    send events with `send_events`, which are written after the reply.
+    """
+
+    def __init__(self, handler, id_size: int = 8):
+        self.handler = handler
+        self.id_size = id_size
+        self.id_sizes = dict.fromkeys(["field", "method", "object", "reference_type", "frame"], id_size)
+        self.commands = []
+        self._outgoing = []
+        self._server = socket.socket()
+        self._server.bind(("localhost", 0))
+        self._server.listen(1)
+        self.port = self._server.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def writer(self) -> _jdwp.JdwpWriter:
+        return _jdwp.JdwpWriter(self.id_sizes)
+
+    def send_events(self, suspend_policy: int, events) -> None:
+        # Events are given as (kind, request id, body writer) tuples
+        data = self.writer().u8(suspend_policy).i32(len(events))
+        for (kind, request_id, body) in events:
+            data.u8(kind).i32(request_id)
+            data.parts.append(body.getvalue())
+        self._outgoing.append(self._packet(0, 0, bytes(_jdwp.CMD_EVENT_COMPOSITE), data.getvalue()))
+
+    @staticmethod
+    def _packet(packet_id: int, flags: int, code: bytes, data: bytes) -> bytes:
+        return _jdwp.JDWP_HEADER.pack(_jdwp.JDWP_HEADER.size + 2 + len(data), packet_id, flags) + code + data
+
+    def _serve(self) -> None:
+        (connection, _) = self._server.accept()
+        self.connection = connection
+        stream = connection.makefile("rb")
+
+        if stream.read(len(_jdwp.JDWP_HANDSHAKE)) != _jdwp.JDWP_HANDSHAKE:
+            return
+        connection.sendall(_jdwp.JDWP_HANDSHAKE)
+
+        while True:
+            header = stream.read(11)
+            if len(header) < 11:
+                return
+
+            (length, packet_id, _, command_set, command) = struct.unpack(">IIBBB", header)
+            reader = _jdwp.JdwpReader(stream.read(length - 11), self.id_sizes)
+            command = (command_set, command)
+            self.commands.append(command)
+
+            if command == _jdwp.CMD_VM_ID_SIZES:
+                reply = self.writer()
+                for _ in range(5):
+                    reply.i32(self.id_size)
+            else:
+                reply = self.handler(self, command, reader)
+
+            if isinstance(reply, int):
+                packet = self._packet(packet_id, _jdwp.JDWP_FLAG_REPLY, struct.pack(">H", reply), b"")
+            else:
+                data = reply.getvalue() if isinstance(reply, _jdwp.JdwpWriter) else (reply or b"")
+                packet = self._packet(packet_id, _jdwp.JDWP_FLAG_REPLY, b"\0\0", data)
+
+            connection.sendall(packet + b"".join(self._outgoing))
+            self._outgoing = []
+
+    def close(self) -> None:
+        self._server.close()
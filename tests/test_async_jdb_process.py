@@ -0,0 +1,73 @@
+import asyncio
+import inspect
+
+from pyjdb.core import async_jdb_process as _async_jdb_process
+from pyjdb.core import jdb_process as _jdb_process
+
+import fake_jdb
+from test_jdb_process import ITERPOWER_STEPS
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_public_methods_are_coroutines():
+    assert not issubclass(_async_jdb_process.AsyncJdbProcess, _jdb_process.JdbProcess)
+
+    for (name, _) in inspect.getmembers(_jdb_process.JdbProcess, inspect.isfunction):
+        if name.startswith("_") or name == "add_trace_sink":
+            continue
+
+        method = getattr(_async_jdb_process.AsyncJdbProcess, name)
+        assert inspect.iscoroutinefunction(method) or inspect.isasyncgenfunction(method), name
+
+
+def test_step_many_matches_sync():
+    expected = fake_jdb.make_process(ITERPOWER_STEPS).step_many(4, include_locals=True)
+
+    process = fake_jdb.make_async_process(ITERPOWER_STEPS)
+    assert run(process.step_many(4, include_locals=True)) == expected
+    assert process.pty.jdb.rejected == []
+    assert process.trace.snapshot() == expected
+    assert process.call_depth == 2
+
+
+def test_iter_steps_until_exit():
+    process = fake_jdb.make_async_process(ITERPOWER_STEPS)
+
+    async def collect():
+        return [info async for info in process.iter_steps()]
+
+    records = run(collect())
+    assert [info["line"] for info in records] == [17, 20, 30, 31]
+    assert records[2]["call"] == {"base": 2, "exp": 3}
+
+
+def test_settings_apply_at_next_step():
+    process = fake_jdb.make_async_process(ITERPOWER_STEPS)
+    process.catch_exceptions = True
+    process.trace_threads = True
+
+    run(process.step())
+    assert process.pty.jdb.commands[:4] == [
+        "threads", "untrace methods", "trace methods", "catch caught java.lang.Throwable"]
+    assert process.tracer.trace_threads
+
+
+def test_iter_steps_matches_sync():
+    stepped = fake_jdb.make_process(ITERPOWER_STEPS)
+    expected = list(stepped.iter_steps(include_locals=True, max_steps=2, max_wall_time=60))
+
+    process = fake_jdb.make_async_process(ITERPOWER_STEPS)
+    process.command_timeout = 5
+
+    async def collect():
+        return [info async for info in process.iter_steps(include_locals=True, max_steps=2, max_wall_time=60)]
+
+    assert run(collect()) == expected
+    assert process.truncated == stepped.truncated == "max_steps"
+
+    # The deadline no longer bounds the commands
+    assert process.command_timeout == 5
+    assert process.events.timeout == 5
@@ -0,0 +1,208 @@
+import os
+
+import pytest
+
+from pyjdb.inspect import compiler as _compiler
+from pyjdb.inspect import process as _process
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    # A stand-in for `javac`, which writes a class file for each source, and
+    # records its runs
+    monkeypatch.setattr(_compiler, "get_javac_version", lambda: "javac 11")
+    monkeypatch.setattr(_compiler, "_compiled_folders", {})
+
+    runs = []
+
+    def run_javac(sources, class_path, server=None):
+        runs.append(sources)
+        for source in sources:
+            with open(source[:-len(".java")] + ".class", "w") as f:
+                f.write("compiled " + open(source).read())
+        return True
+
+    monkeypatch.setattr(_compiler, "_run_javac", run_javac)
+    return runs
+
+
+@pytest.fixture
+def folder(tmp_path, runs):
+    path = tmp_path / "src"
+    path.mkdir()
+    (path / "Main.java").write_text("class Main {}")
+    return path
+
+
+def key(folder, class_path=(".",)):
+    sources = [str(folder / "Main.java")]
+    return _compiler.get_compilation_key(sources, list(class_path), [str(folder)])
+
+
+def test_key_depends_on_sources(folder):
+    before = key(folder)
+    (folder / "Main.java").write_text("class Main { int x; }")
+
+    assert key(folder) != before
+
+
+def test_key_depends_on_class_path_contents(folder, tmp_path, monkeypatch):
+    lib = tmp_path / "lib"
+    lib.mkdir()
+    (lib / "Helper.class").write_text("v1")
+    monkeypatch.chdir(str(folder))
+
+    before = key(folder, [".", str(lib)])
+    assert key(folder, [".", "../lib"]) == before
+
+    (lib / "Helper.class").write_text("v2")
+    assert key(folder, [".", str(lib)]) != before
+
+    (lib / "pkg").mkdir()
+    (lib / "pkg" / "Util.class").write_text("compiled")
+    assert key(folder, [".", str(lib)]) != before
+
+
+def test_key_ignores_compiled_folder(folder, monkeypatch):
+    monkeypatch.chdir(str(folder))
+    before = key(folder)
+
+    # The classes of the folder are the output of the compilation
+    (folder / "Main.class").write_text("compiled")
+
+    assert key(folder) == before
+
+
+def test_key_ignores_folders_of_sources(folder, tmp_path, monkeypatch):
+    # Other programs next to the folder, on the default class path
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / "Other.java").write_text("class Other {}")
+    monkeypatch.chdir(str(tmp_path))
+
+    before = key(folder)
+
+    # Compiling them does not change the key of the folder
+    (other / "Other.class").write_text("compiled")
+    assert key(folder) == before
+
+    # Nor does compiling them together with it
+    sources = [str(folder / "Main.java")]
+    assert _compiler.get_compilation_key(sources, ["."], [str(folder), str(other)]) == before
+
+
+def test_compile_many_shares_cache_with_compile_directory(folder, runs, tmp_path, tmp_path_factory, monkeypatch):
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / "Other.java").write_text("class Other {}")
+    monkeypatch.chdir(str(tmp_path))
+    cache = _compiler.CompilationCache(str(tmp_path_factory.mktemp("cache")))
+
+    assert _compiler.compile_many([str(folder), str(other)], cache=cache) == {str(folder): True, str(other): True}
+    assert len(runs) == 1
+
+    # The folders are up to date, and their classes are cached
+    assert _compiler.compile_directory(str(folder), cache=cache)
+    _compiler._compiled_folders.clear()
+    (other / "Other.class").unlink()
+    assert _compiler.compile_directory(str(other), cache=cache)
+    assert len(runs) == 1
+    assert (other / "Other.class").exists()
+
+
+def test_no_marker_in_sources(folder, runs):
+    assert _compiler.compile_directory(str(folder), class_path=[str(folder)])
+    assert _compiler.compile_directory(str(folder), class_path=[str(folder)])
+
+    assert sorted(os.listdir(str(folder))) == ["Main.class", "Main.java"]
+    assert len(runs) == 1
+
+
+def test_cache_stores_only_outputs(folder, runs, tmp_path):
+    (folder / "Stale.class").write_text("stale")
+    cache = _compiler.CompilationCache(str(tmp_path / "cache"))
+
+    assert _compiler.compile_directory(str(folder), class_path=[str(folder)], cache=cache)
+
+    # Another folder with the same sources is restored from the cache
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / "Main.java").write_text("class Main {}")
+    _compiler._compiled_folders.clear()
+
+    assert _compiler.compile_directory(str(other), class_path=[str(other)], cache=cache)
+    assert sorted(os.listdir(str(other))) == ["Main.class", "Main.java"]
+    assert len(runs) == 1
+
+    # Compilations are recorded in the cache, not in the folder
+    assert cache.read_marker(str(other))["classes"] == ["Main.class"]
+
+
+def test_cache_is_opt_in():
+    manager = _process.JdbProcessContextManager("IterPower")
+    assert manager.compilation_cache is None
+
+    manager = _process.JdbProcessContextManager("IterPower", compilation_cache=True)
+    assert isinstance(manager.compilation_cache, _compiler.CompilationCache)
+
+
+@pytest.fixture
+def fake_java(tmp_path, monkeypatch):
+    # Stand-ins for the JVM of the compiler server, and for `javac`
+    def script(name, body):
+        path = tmp_path / name
+        path.write_text("#!/bin/sh\n" + body + "\n")
+        path.chmod(0o755)
+        return str(path)
+
+    monkeypatch.setattr(_compiler.CompilerServer, "_build", lambda self: str(tmp_path))
+    monkeypatch.setattr(_compiler, "JAVAC_NAME", script("javac", "exit 0"))
+    return script
+
+
+def test_compiler_server_start(fake_java, monkeypatch):
+    monkeypatch.setattr(_compiler, "JAVA_NAME", fake_java("java", "echo READY; cat > /dev/null"))
+    server = _compiler.CompilerServer(start_timeout=5)
+
+    try:
+        assert server.start()
+    finally:
+        server.close()
+
+
+def test_compiler_server_start_timeout(fake_java, monkeypatch):
+    # A server which never completes its handshake
+    monkeypatch.setattr(_compiler, "JAVA_NAME", fake_java("java", "printf REA; sleep 30"))
+    server = _compiler.CompilerServer(start_timeout=0.5)
+
+    assert not server.start()
+    assert server.failed
+    assert not server.active
+
+    # Compilations fall back on `javac`
+    assert _compiler._run_javac(["Main.java"], ["."], server=server)
+
+
+def test_compiler_server_compile(fake_java, monkeypatch):
+    monkeypatch.setattr(_compiler, "JAVA_NAME", fake_java(
+        "java", "echo READY; read request; read source; printf 'FAILED\\t1\\n  error\\n'; cat > /dev/null"))
+    server = _compiler.CompilerServer(start_timeout=5, compile_timeout=5)
+
+    try:
+        assert server.compile(["Main.java"], ["."]) is False
+        assert server.active
+    finally:
+        server.close()
+
+
+def test_compiler_server_compile_timeout(fake_java, monkeypatch):
+    # A server which never answers a compilation
+    monkeypatch.setattr(_compiler, "JAVA_NAME", fake_java("java", "echo READY; sleep 30"))
+    server = _compiler.CompilerServer(start_timeout=5, compile_timeout=0.5)
+
+    assert server.compile(["Main.java"], ["."]) is None
+    assert server.failed
+    assert not server.active
+
+    # Compilations fall back on `javac`
+    assert _compiler._run_javac(["Main.java"], ["."], server=server)
@@ -0,0 +1,112 @@
+import pytest
+
+from pyjdb.core import events as _events
+
+
+def tokenize(text, chunk_size=None):
+    tokenizer = _events.JdbEventTokenizer()
+
+    if chunk_size is None:
+        events = tokenizer.feed(text)
+    else:
+        events = []
+        for start in range(0, len(text), chunk_size):
+            events += tokenizer.feed(text[start:start + chunk_size])
+
+    return events + tokenizer.close()
+
+
+def significant(events):
+    return [event for event in events if event.kind not in (_events.EVENT_OUTPUT, _events.EVENT_PROMPT)]
+
+
+def test_session_events(transcript):
+    events = significant(tokenize(transcript("iterpower_steps.txt")))
+
+    assert [event.kind for event in events] == [
+        _events.EVENT_BREAKPOINT,
+        _events.EVENT_STEP,
+        _events.EVENT_LOCALS,
+        _events.EVENT_METHOD_ENTERED,
+        _events.EVENT_LOCALS,
+        _events.EVENT_STEP,
+        _events.EVENT_METHOD_EXITED,
+        _events.EVENT_NOT_SUSPENDED,
+        _events.EVENT_EXITED,
+    ]
+
+    assert events[0].info == {
+        "thread": "main",
+        "class.method": "IterPower.main()",
+        "method": "main",
+        "line": 16,
+        "bci": 0,
+        "instruction": "int base = 10;",
+    }
+    assert events[2].info == ({"args": "instance of java.lang.String[2] (id=495)"}, {"base": 10})
+    assert events[4].info == ({"base": 2, "exp": 3}, {})
+    assert events[6].info["return"] == 8
+    assert events[6].info["line"] == 35
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 4096])
+def test_partial_chunks(transcript, chunk_size):
+    text = transcript("iterpower_steps.txt")
+    assert tokenize(text, chunk_size) == tokenize(text)
+
+
+def test_prompts():
+    events = tokenize("main[1] > Thread-0[12] ")
+    assert [event.kind for event in events] == [_events.EVENT_PROMPT] * 3
+    assert [event.info for event in events] == [
+        {"thread": "main", "frame": 1},
+        None,
+        {"thread": "Thread-0", "frame": 12},
+    ]
+
+
+def test_prompt_followed_by_echo():
+    events = tokenize("main[1] locals\r\nLocal variables:\r\nx = 1\r\nmain[1] ")
+    kinds = [event.kind for event in events]
+    assert kinds == [_events.EVENT_PROMPT, _events.EVENT_OUTPUT, _events.EVENT_LOCALS, _events.EVENT_PROMPT]
+
+
+def test_block_ends_at_prompt():
+    # The listing of a location belongs to its block, until the next prompt
+    events = significant(tokenize(
+        "Step completed: \"thread=main\", A.f(), line=3 bci=1\r\n3    x++;\r\n\r\nmain[1] "))
+    assert len(events) == 1
+    assert events[0].info["instruction"] == "x++;"
+
+
+def test_consecutive_locations_without_prompt():
+    # With `trace go methods`, events are not separated by prompts
+    events = significant(tokenize(
+        "Method entered: \"thread=main\", A.f(), line=3 bci=0\r\n"
+        "Method exited: return value = 1, \"thread=main\", A.f(), line=4 bci=2\r\n"
+        "> "))
+    assert [event.kind for event in events] == [_events.EVENT_METHOD_ENTERED, _events.EVENT_METHOD_EXITED]
+
+
+def test_exception_events(transcript):
+    events = significant(tokenize(transcript("exception.txt")))
+    assert [event.kind for event in events] == [_events.EVENT_EXCEPTION, _events.EVENT_EXCEPTION]
+
+    caught = events[0].info["exception"]
+    assert caught["class"] == "java.lang.NumberFormatException"
+    assert caught["caught"] is True
+    assert caught["catch"] == {"class.method": "IterPower.main()", "line": 21, "bci": 12}
+
+    uncaught = events[1].info
+    assert uncaught["exception"] == {"class": "java.lang.ArithmeticException", "caught": False, "catch": None}
+    assert uncaught["class.method"] == "IterPower.iterPower()"
+    assert uncaught["line"] == 32
+
+
+def test_watch_event():
+    events = significant(tokenize(
+        "Field (Node.next) is null, will be instance of Node(id=501): "
+        "\"thread=main\", Node.link(), line=12 bci=5\r\n12        this.next = other;\r\n\r\nmain[1] "))
+    assert events[0].kind == _events.EVENT_WATCH
+    assert events[0].info["watch"] == {"field": "Node.next", "value": None, "new_value": "instance of Node(id=501)"}
+    assert events[0].info["line"] == 12
@@ -0,0 +1,115 @@
+import os
+import time
+
+from pyjdb.inspect import farm as _farm
+
+
+# Jobs run in other processes, so their functions must be module-level
+
+def double(value):
+    return 2 * value
+
+
+def fail(value):
+    raise ValueError(value)
+
+
+def unpicklable(value):
+    return lambda: value
+
+
+def exit_silently(value):
+    os._exit(0)
+
+
+def sleep(value):
+    time.sleep(value)
+
+
+def folder(path=None):
+    path = os.getcwd() if path is None else path
+    return path, sorted(os.listdir(path))
+
+
+def pid():
+    return os.getpid()
+
+
+def run(function, jobs, **kwargs):
+    results = list(_farm.trace_many(jobs, workers=2, function=function, **kwargs))
+    return sorted(results, key=lambda job_result: job_result.index)
+
+
+def test_results():
+    results = run(double, [{"value": 1}, {"value": 2}, {"value": 3}])
+
+    assert [(job_result.result, job_result.error) for job_result in results] == [(2, None), (4, None), (6, None)]
+
+
+def test_errors():
+    [job_result] = run(fail, [{"value": 1}])
+
+    assert isinstance(job_result.error, ValueError)
+    assert job_result.result is None
+
+
+def test_unpicklable_result():
+    [job_result] = run(unpicklable, [{"value": 1}])
+
+    assert isinstance(job_result.error, RuntimeError)
+
+
+def test_exit_without_result():
+    [job_result] = run(exit_silently, [{"value": 1}])
+
+    assert isinstance(job_result.error, RuntimeError)
+    assert "without a result" in str(job_result.error)
+
+
+def test_timeout():
+    results = run(sleep, [{"value": 30}, {"value": 0}], timeout=1)
+
+    assert isinstance(results[0].error, TimeoutError)
+    assert results[1].error is None
+
+
+def test_workers_are_reused():
+    results = list(_farm.trace_many([{}, {}, {}], workers=1, function=pid))
+
+    assert len({job_result.result for job_result in results}) == 1
+    assert results[0].result != os.getpid()
+
+
+def test_worker_replaced_after_exit():
+    results = list(_farm.trace_many([{"value": 1}, {"value": 2}], workers=1, function=exit_silently))
+
+    assert all(isinstance(job_result.error, RuntimeError) for job_result in results)
+
+
+def test_isolate(tmp_path, monkeypatch):
+    (tmp_path / "sources").mkdir()
+    (tmp_path / "sources" / "Main.java").write_text("")
+    (tmp_path / "cwd").mkdir()
+    (tmp_path / "cwd" / "Other.java").write_text("")
+    monkeypatch.chdir(tmp_path / "cwd")
+
+    [isolated, without_path] = run(folder, [{"path": str(tmp_path / "sources")}, {}])
+
+    (path, files) = isolated.result
+    assert path != str(tmp_path / "sources")
+    assert files == ["Main.java"]
+    assert not os.path.exists(path)
+
+    # Jobs without a folder are given a copy of the current directory
+    (path, files) = without_path.result
+    assert path != str(tmp_path / "cwd")
+    assert files == ["Other.java"]
+    assert not os.path.exists(path)
+
+
+def test_no_isolate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    [job_result] = run(folder, [{}], isolate=False)
+
+    assert job_result.result == (str(tmp_path), [])
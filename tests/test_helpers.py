@@ -0,0 +1,194 @@
+import pytest
+
+from pyjdb.core import helpers as _helpers
+
+from benchmarks import bench_parse_values as _bench_parse_values
+
+
+@pytest.mark.parametrize("text, value", [
+    ("42", 42),
+    ("-7", -7),
+    ("1.5", 1.5),
+    ("-0.25", -0.25),
+    ("true", True),
+    ("false", False),
+    ("null", None),
+    ("\"hello, world\"", "hello, world"),
+    ("'c'", "c"),
+    ("", ""),
+    ("instance of Node(id=501)", "instance of Node(id=501)"),
+    ("{1, 2, 3}", [1, 2, 3]),
+    ("{}", []),
+    ("{1.5, 2}", [1.5, 2]),
+    ("{\"a\", \"b, c\"}", ["a", "b, c"]),
+    ("{{1, 2}, {3}}", [[1, 2], [3]]),
+    ("{{}, {null, true}}", [[], [None, True]]),
+    ("{instance of Node(id=1), null}", ["instance of Node(id=1)", None]),
+])
+def test_parse_jdb_value(text, value):
+    assert _helpers.parse_jdb_value(text) == value
+
+
+def test_parse_jdb_value_non_string():
+    assert _helpers.parse_jdb_value(3) == 3
+
+
+@pytest.mark.parametrize("text", [
+    "0", "-12", "3.5", "1.0E-5", "9223372036854775807", "true", "false", "null", "<void value>", "abc",
+    "'x'", "\"Fibonacci\"", "\"a, b\"", "\"{x}\"", "\"\"",
+    "instance of Node(id=502)", "instance of java.lang.String[2] (id=495)",
+    "{}", "{1, 2, 3}", "{1.5, -2}", "{true, false}", "{\"alpha\", \"beta\"}", "{'a', 'b'}",
+    "{instance of Node(id=1), null}", "{{1}, {2}}", "{{}, {1}}",
+])
+def test_parse_jdb_value_matches_legacy_parser(text):
+    assert _helpers.parse_jdb_value(text) == _bench_parse_values.legacy_parse_jdb_value(text)
+
+
+@pytest.mark.parametrize("text, value", [
+    ("{{1, 2}, {3, 4}}", [[1, 2], [3, 4]]),
+    ("{\"alpha\", \"beta\", \"gamma, delta\"}", ["alpha", "beta", "gamma, delta"]),
+    ("{{\"a, b\"}, {\"c\"}}", [["a, b"], ["c"]]),
+])
+def test_parse_jdb_value_fixes_legacy_parser(text, value):
+    # The legacy parser split nested arrays, and some quoted strings, on commas
+    assert _bench_parse_values.legacy_parse_jdb_value(text) != value
+    assert _helpers.parse_jdb_value(text) == value
+
+
+@pytest.mark.parametrize("value, reference", [
+    ("instance of Node(id=501)", ("Node", 501)),
+    ("instance of int[3] (id=12)", ("int[3]", 12)),
+    ("instance of", None),
+    ("Node", None),
+    (12, None),
+])
+def test_parse_jdb_reference(value, reference):
+    assert _helpers.parse_jdb_reference(value) == reference
+
+
+def test_parse_jdb_locals():
+    text = "\r\nMethod arguments:\r\nbase = 2\r\nexp = 3\r\nLocal variables:\r\nresult = 8\r\nname = \"a = b\"\r\n"
+    assert _helpers.parse_jdb_locals(text) == ({"base": 2, "exp": 3}, {"result": 8, "name": "a = b"})
+
+
+def test_parse_jdb_locals_unavailable():
+    assert _helpers.parse_jdb_locals("\r\nLocal variable information not available.\r\n") == ({}, {})
+
+
+def test_parse_jdb_dump():
+    text = "{\n    value: 3\n    next: null\n    name: \"n\"\n}"
+    assert _helpers.parse_jdb_dump(text) == {"value": 3, "next": None, "name": "n"}
+    assert _helpers.parse_jdb_dump("{1, 2}") == [1, 2]
+
+
+def test_parse_jdb_step():
+    text = ("\r\nMethod exited: return value = 8, \"thread=main\", IterPower.iterPower(), line=35 bci=17\r\n"
+            "35            return result;\r\n")
+    assert _helpers.parse_jdb_step(text) == {
+        "return": 8,
+        "thread": "main",
+        "class.method": "IterPower.iterPower()",
+        "method": "iterPower",
+        "line": 35,
+        "bci": 17,
+        "instruction": "return result;",
+    }
+
+
+def test_parse_jdb_step_exception():
+    assert _helpers.parse_jdb_step("Exception occurred: X (uncaught)\"thread=main\", A.f(), line=1 bci=0") is None
+
+
+def test_parse_jdb_exception():
+    text = ("\r\nException occurred: java.lang.ArithmeticException (uncaught)\"thread=main\", "
+            "IterPower.iterPower(), line=32 bci=9\r\n32                result *= base;\r\n")
+    info = _helpers.parse_jdb_exception(text)
+    assert info["exception"] == {"class": "java.lang.ArithmeticException", "caught": False, "catch": None}
+    assert info["thread"] == "main"
+    assert info["class.method"] == "IterPower.iterPower()"
+    assert info["method"] == "iterPower"
+    assert (info["line"], info["bci"]) == (32, 9)
+    assert info["instruction"] == "result *= base;"
+
+    assert _helpers.parse_jdb_exception("Step completed: \"thread=main\", A.f(), line=1 bci=0") is None
+
+
+def test_parse_jdb_where():
+    text = ("  [1] java.lang.Integer.parseInt (Integer.java:652)\n"
+            "  [2] IterPower.main (IterPower.java:21)\n"
+            "  [3] java.lang.Thread.run (native method)\n")
+    assert _helpers.parse_jdb_where(text) == [
+        {"class.method": "java.lang.Integer.parseInt()", "source": "Integer.java", "line": 652},
+        {"class.method": "IterPower.main()", "source": "IterPower.java", "line": 21},
+        {"class.method": "java.lang.Thread.run()", "source": "native method", "line": None},
+    ]
+
+
+def test_parse_jdb_watch():
+    assert _helpers.parse_jdb_watch("Field (Node.value) is 0, will be 3: \"thread=main\"") == {
+        "field": "Node.value", "value": 0, "new_value": 3}
+    assert _helpers.parse_jdb_watch("Field (Node.value) access encountered: \"thread=main\"") == {
+        "field": "Node.value"}
+    assert _helpers.parse_jdb_watch("Step completed:") is None
+
+
+def test_parse_jdb_threads(transcript):
+    threads = _helpers.parse_jdb_threads(transcript("threads.txt"))
+
+    assert [thread["name"] for thread in threads] == [
+        "Reference Handler", "Finalizer", "Signal Dispatcher", "main", "Worker-1", "Worker-2"]
+    assert threads[3] == {
+        "id": "0x1",
+        "type": "java.lang.Thread",
+        "name": "main",
+        "group": "main",
+        "status": "running",
+        "at_breakpoint": True,
+    }
+    assert threads[1]["status"] == "cond. waiting"
+    assert [thread["name"] for thread in threads if _helpers.is_program_thread(thread)] == ["main", "Worker-1"]
+
+
+@pytest.mark.parametrize("instruction, assigns", [
+    ("x = 1;", True),
+    ("x += y;", True),
+    ("i++;", True),
+    ("for (int i : items) {", True),
+    ("} catch (Exception e) {", True),
+    ("if (x == y) {", False),
+    ("if (x <= y && x != 0) {", False),
+    ("System.out.println(x);", False),
+    (None, True),
+])
+def test_may_assign_variables(instruction, assigns):
+    assert _helpers.may_assign_variables(instruction) == assigns
+
+
+@pytest.mark.parametrize("name, pattern, matches", [
+    ("Main", "Main", True),
+    ("pkg.Main", "pkg.*", True),
+    ("pkg.sub.Main", "pkg.*", True),
+    ("pkgx.Main", "pkg.*", False),
+    ("Main$Inner", "*Inner", True),
+    ("Other", "Main", False),
+])
+def test_match_class_pattern(name, pattern, matches):
+    assert _helpers.match_class_pattern(name, pattern) == matches
+
+
+def test_is_method_included():
+    assert _helpers.is_method_included("pkg.Sorter.sort()", None, None)
+    assert _helpers.is_method_included("pkg.Sorter.sort()", ["pkg.*"], None)
+    assert not _helpers.is_method_included("Main.main()", ["pkg.*"], None)
+    assert _helpers.is_method_included("pkg.Sorter.sort()", None, ["sort"])
+    assert _helpers.is_method_included("pkg.Sorter.sort()", None, ["pkg.Sorter.sort"])
+    assert _helpers.is_method_included("pkg.Sorter.sort()", None, ["*.Sorter.sort"])
+    assert not _helpers.is_method_included("pkg.Sorter.sort()", None, ["Sorter.sort"])
+    assert not _helpers.is_method_included("pkg.Sorter.swap()", None, ["sort"])
+
+
+def test_is_class_excluded():
+    assert _helpers.is_class_excluded("java.lang.Integer")
+    assert _helpers.is_class_excluded("jdk.internal.Misc")
+    assert not _helpers.is_class_excluded("Main")
+    assert _helpers.is_class_excluded("lib.Util", ["lib.*"])
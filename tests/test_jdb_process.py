@@ -0,0 +1,203 @@
+import sys
+import time
+
+import pexpect
+import pytest
+
+from pyjdb.core import events as _events
+from pyjdb.core import exceptions as _exceptions
+from pyjdb.core import jdb_process as _jdb_process
+
+import fake_jdb
+
+
+def make_process(entry_thread="0x1"):
+    process = _jdb_process.JdbProcess("IterPower")
+    process._reset_threads("main")
+    process._trace_threads = True
+    process._entry_thread = entry_thread
+    process._thread_ids = {"main": ["0x1"], "Worker": ["0x1a0", "0x1a1"]}
+    process._reset_call_depth()
+    return process
+
+
+def test_call_depth_by_thread_id():
+    process = make_process()
+
+    # Only the entry thread starts in the entry method
+    assert process._thread_depth("0x1") == (1, False)
+    assert process._thread_depth("0x1a0") == (0, False)
+
+    process._track_call_depth({"thread": "main", "call": None})
+    assert process.call_depth == 2
+
+    # Threads with the same name are told apart by the selected thread
+    process._selected_thread = {"id": "0x1a0", "name": "Worker"}
+    process._track_call_depth({"thread": "Worker", "call": None})
+    assert process.call_depth == 1
+
+    process._selected_thread = {"id": "0x1a1", "name": "Worker"}
+    process._track_call_depth({"thread": "Worker", "call": None})
+    process._track_call_depth({"thread": "Worker", "call": None})
+    assert process.call_depth == 2
+
+    # A method exit is counted when the caller is reached
+    process._selected_thread = {"id": "0x1", "name": "main"}
+    process._track_call_depth({"thread": "main", "return": 8})
+    assert process.call_depth == 2
+    process._track_call_depth({"thread": "main"})
+    assert process.call_depth == 1
+
+    assert process._depths == {"0x1": (1, False), "0x1a0": (1, False), "0x1a1": (2, False)}
+
+
+def test_entry_thread_listing():
+    process = _jdb_process.JdbProcess("IterPower")
+    process._reset_threads("main")
+    process._reset_call_depth()
+
+    # Depths followed before the entry thread is identified are kept
+    process._track_call_depth({"thread": "main", "call": None})
+
+    process.threads = lambda: [
+        {"id": "0x1c0", "name": "main", "group": "other", "status": "running", "at_breakpoint": False},
+        {"id": "0x1", "name": "main", "group": "main", "status": "running", "at_breakpoint": True},
+    ]
+    process._list_threads()
+
+    assert process._entry_thread == "0x1"
+    assert process._thread_ids == {"main": ["0x1c0", "0x1"]}
+    assert process._depths == {"0x1": (2, False)}
+
+
+def test_uncaught_exception_ends_trace():
+    process = make_process()
+    threads = [
+        {"id": "0x1", "name": "main", "group": "main", "status": "running", "at_breakpoint": False},
+        {"id": "0x1a0", "name": "Worker", "group": "main", "status": "running", "at_breakpoint": False},
+        {"id": "0x1a1", "name": "Worker", "group": "main", "status": "running", "at_breakpoint": False},
+    ]
+    process.threads = lambda: threads
+
+    # A worker dies while the others live on
+    process._selected_thread = threads[1]
+    assert not process._uncaught_ends_trace({"thread": "Worker"})
+    assert process._dead_threads == {"0x1a0"}
+
+    # The entry thread always ends the trace
+    process._selected_thread = threads[0]
+    assert process._uncaught_ends_trace({"thread": "main"})
+
+    # Once the entry thread has finished, so does the last live thread
+    del threads[0]
+    process._selected_thread = threads[1]
+    assert process._uncaught_ends_trace({"thread": "Worker"})
+
+    # Without tracing all threads, the traced thread ends the trace
+    process._trace_threads = False
+    assert process._uncaught_ends_trace({"thread": "Worker"})
+
+
+ITERPOWER_STEPS = [
+    (fake_jdb.step_outcome("step", "IterPower.main()", 17, 3, "int exp = 4;"),
+     fake_jdb.locals_outcome({"args": "instance of java.lang.String[2] (id=495)"}, {"base": 2})),
+    (fake_jdb.step_outcome("step", "IterPower.main()", 20, 6, "if (args.length > 0)"),
+     fake_jdb.locals_outcome({"args": "instance of java.lang.String[2] (id=495)"}, {"base": 2, "exp": 3})),
+    (fake_jdb.step_outcome("entered", "IterPower.iterPower()", 30, 0, "int result = 1;"),
+     fake_jdb.locals_outcome({"base": 2, "exp": 3}, {})),
+    (fake_jdb.step_outcome("step", "IterPower.iterPower()", 31, 2, "while (exp > 0) {"),
+     fake_jdb.locals_outcome({"base": 2, "exp": 3}, {"result": 1})),
+]
+
+
+def test_step_many_waits_for_each_step():
+    process = fake_jdb.make_process(ITERPOWER_STEPS)
+    records = process.step_many(3, include_locals=True)
+
+    # No command is written while the VM runs
+    assert process.pty.rejected == []
+    assert process.pty.commands == ["step in", "locals", "step in", "locals", "step in", "locals"]
+
+    assert [(info["line"], info["locals"]) for info in records] == [
+        (17, {"base": 2}),
+        (20, {"base": 2, "exp": 3}),
+        (30, {}),
+    ]
+    assert records[2]["call"] == {"base": 2, "exp": 3}
+    assert process.call_depth == 2
+    assert process.trace.snapshot() == records
+
+
+def test_step_many_until_exit():
+    process = fake_jdb.make_process(ITERPOWER_STEPS)
+    records = process.run_steps()
+
+    assert process.pty.rejected == []
+    assert [info["line"] for info in records] == [17, 20, 30, 31]
+    assert not process.active
+
+
+def test_iter_steps_yields_every_recorded_step():
+    process = fake_jdb.make_process(ITERPOWER_STEPS)
+    records = list(process.iter_steps(include_locals=True, max_steps=3))
+
+    assert [info["line"] for info in records] == [17, 20, 30]
+    assert process.trace.snapshot() == records
+    assert process.truncated == "max_steps"
+    assert process.pty.rejected == []
+
+
+def test_step_many_matches_step():
+    stepped = fake_jdb.make_process(ITERPOWER_STEPS)
+    expected = [stepped.step(include_locals=True) for _ in range(4)]
+
+    process = fake_jdb.make_process(ITERPOWER_STEPS)
+    assert process.step_many(4, include_locals=True) == expected
+
+
+def test_expect_event_strict():
+    process = fake_jdb.make_process(ITERPOWER_STEPS)
+
+    # A step event is never skipped while waiting for variables
+    process.pty.sendline("step")
+    with pytest.raises(_exceptions.JdbHostErrorException):
+        process._expect_locals(strict=True)
+
+    process = fake_jdb.make_process(ITERPOWER_STEPS)
+    process.pty.sendline("step")
+    assert process.events.expect_event([_events.EVENT_STEP], skipped=_events.NEUTRAL_EVENTS).info["line"] == 17
+
+
+def test_target_output_is_read():
+    # More output than a terminal buffers, which would block the target if
+    # it were not read
+    process = _jdb_process.JdbProcess("HeavyOutput")
+    process.target = pexpect.spawnu(
+        sys.executable, ["-c", "print('Listening'); print('x' * 200000); input()"])
+    process.target.expect("Listening")
+    process._start_target_reader()
+
+    deadline = time.monotonic() + 10
+    while process.target_output.count("x") < 200000 and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    process.close()
+
+    assert process.target_output.count("x") == 200000
+    assert process.target is None
+
+
+def test_operation_errors_are_thrown_back():
+    process = fake_jdb.make_process(ITERPOWER_STEPS)
+
+    def select_thread(thread):
+        raise _exceptions.JdbHostErrorException(thread)
+
+    def operation():
+        try:
+            yield ("select_thread", "0x1a0")
+        except _exceptions.JdbHostErrorException as e:
+            return "rejected {}".format(e)
+
+    process.select_thread = select_thread
+    assert process._run(operation()) == "rejected 0x1a0"
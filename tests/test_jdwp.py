@@ -0,0 +1,133 @@
+import pytest
+
+from pyjdb.core import exceptions as _exceptions
+from pyjdb.core import jdwp as _jdwp
+
+from jdwp_agent import FakeJdwpAgent
+
+
+@pytest.mark.parametrize("id_size", [4, 8])
+def test_codec_round_trip(id_size):
+    id_sizes = dict.fromkeys(["field", "method", "object", "reference_type", "frame"], id_size)
+    location = _jdwp.JdwpLocation(_jdwp.TYPE_TAG_CLASS, 0x1234, 0x56, 42)
+
+    data = (
+        _jdwp.JdwpWriter(id_sizes)
+        .u8(7).i32(-5).i64(1 << 40).id(99).string("héllo").location(location)
+        .getvalue()
+    )
+    reader = _jdwp.JdwpReader(data, id_sizes)
+
+    assert reader.u8() == 7
+    assert reader.i32() == -5
+    assert reader.i64() == 1 << 40
+    assert reader.id() == 99
+    assert reader.string() == "héllo"
+    assert reader.location() == location
+    assert reader.offset == len(data)
+
+
+def test_values():
+    data = (
+        _jdwp.JdwpWriter()
+        .u8(_jdwp.TAG_INT).i32(-3)
+        .u8(_jdwp.TAG_BOOLEAN).u8(1)
+        .u8(_jdwp.TAG_OBJECT).id(12)
+        .u8(_jdwp.TAG_VOID)
+        .getvalue()
+    )
+    reader = _jdwp.JdwpReader(data)
+
+    assert reader.value() == (_jdwp.TAG_INT, -3)
+    assert reader.value() == (_jdwp.TAG_BOOLEAN, True)
+    assert reader.value() == (_jdwp.TAG_OBJECT, 12)
+    assert reader.value() == (_jdwp.TAG_VOID, None)
+
+
+@pytest.mark.parametrize("signature, name", [
+    ("I", "int"),
+    ("Z", "boolean"),
+    ("Ljava/lang/String;", "java.lang.String"),
+    ("[Ljava/lang/String;", "java.lang.String[]"),
+    ("[[D", "double[][]"),
+    ("LNode;", "Node"),
+])
+def test_signature_to_name(signature, name):
+    assert _jdwp.signature_to_name(signature) == name
+
+
+def test_connection_commands_and_events():
+    location = _jdwp.JdwpLocation(_jdwp.TYPE_TAG_CLASS, 10, 20, 4)
+
+    def handler(agent, command, reader):
+        if command == _jdwp.CMD_THREAD_REFERENCE_NAME:
+            assert reader.id() == 1
+            # An event sent while the client waits for a reply is queued
+            agent.send_events(_jdwp.SUSPEND_ALL, [
+                (_jdwp.EVENT_KIND_SINGLE_STEP, 51, agent.writer().id(1).location(location)),
+                (_jdwp.EVENT_KIND_METHOD_EXIT_WITH_RETURN_VALUE, 52,
+                 agent.writer().id(1).location(location).u8(_jdwp.TAG_INT).i32(14)),
+            ])
+            return agent.writer().string("main")
+        return _jdwp.JDWP_ERROR_ABSENT_INFORMATION
+
+    agent = FakeJdwpAgent(handler, id_size=4)
+    connection = _jdwp.JdwpConnection("localhost", agent.port, timeout=5)
+
+    try:
+        assert connection.id_sizes["object"] == 4
+        assert connection.command(_jdwp.CMD_THREAD_REFERENCE_NAME, connection.writer().id(1).getvalue()).string() \
+            == "main"
+
+        (suspend_policy, events) = connection.wait_event()
+        assert suspend_policy == _jdwp.SUSPEND_ALL
+        assert [(event.kind, event.request_id, event.thread, event.location) for event in events] == [
+            (_jdwp.EVENT_KIND_SINGLE_STEP, 51, 1, location),
+            (_jdwp.EVENT_KIND_METHOD_EXIT_WITH_RETURN_VALUE, 52, 1, location),
+        ]
+        assert events[1].value == (_jdwp.TAG_INT, 14)
+
+        with pytest.raises(_exceptions.JdwpErrorException) as error:
+            connection.command(_jdwp.CMD_METHOD_LINE_TABLE)
+        assert error.value.error == _jdwp.JDWP_ERROR_ABSENT_INFORMATION
+
+    finally:
+        connection.close()
+        agent.close()
+
+
+def test_connection_exception_event():
+    throw = _jdwp.JdwpLocation(_jdwp.TYPE_TAG_CLASS, 10, 20, 4)
+    catch = _jdwp.JdwpLocation(_jdwp.TYPE_TAG_CLASS, 10, 21, 9)
+
+    def handler(agent, command, reader):
+        agent.send_events(_jdwp.SUSPEND_ALL, [
+            (_jdwp.EVENT_KIND_EXCEPTION, 54,
+             agent.writer().id(1).location(throw).u8(_jdwp.TAG_OBJECT).id(500).location(catch)),
+        ])
+        return agent.writer()
+
+    agent = FakeJdwpAgent(handler)
+    connection = _jdwp.JdwpConnection("localhost", agent.port, timeout=5)
+
+    try:
+        connection.command(_jdwp.CMD_VM_RESUME)
+        (_, [event]) = connection.wait_event()
+        assert (event.location, event.value, event.catch_location) == (throw, (_jdwp.TAG_OBJECT, 500), catch)
+
+    finally:
+        connection.close()
+        agent.close()
+
+
+def test_connection_timeout():
+    agent = FakeJdwpAgent(lambda agent, command, reader: agent.writer())
+    connection = _jdwp.JdwpConnection("localhost", agent.port, timeout=0.2)
+
+    try:
+        with pytest.raises(_exceptions.JdbTimeoutException):
+            connection.wait_event()
+
+    finally:
+        connection.close()
+        agent.close()
@@ -0,0 +1,55 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from pyjdb.core import jdwp_process as _jdwp_process
+
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
+
+# These tests launch `examples/IterPower.java` in a local JVM
+pytestmark = pytest.mark.skipif(
+    shutil.which("javac") is None or shutil.which("java") is None,
+    reason="requires a JDK",
+)
+
+
+@pytest.fixture
+def process(tmp_path):
+    shutil.copy(os.path.join(EXAMPLES, "IterPower.java"), str(tmp_path))
+    subprocess.run(["javac", "-g", "IterPower.java"], cwd=str(tmp_path), check=True)
+
+    p = _jdwp_process.JdwpProcess("IterPower")
+    p.cwd = str(tmp_path)
+    p.spawn()
+
+    yield p
+
+    p.close()
+
+
+def test_steps(process):
+    records = process.step_many(100, include_locals=True)
+
+    assert records[0]["class.method"] == "IterPower.main()"
+    calls = [record for record in records if record["method"] == "iterPower" and "call" in record]
+    assert calls[0]["call"] == {"base": 10, "exp": 4}
+    assert [record["return"] for record in records if record["method"] == "iterPower" and "return" in record] == [10000]
+
+
+def test_samples(process):
+    records = list(process.iter_samples(breakpoints=["IterPower:33"]))
+
+    # The arguments `base` and `exp` are not local variables
+    assert [record["locals"] for record in records] == [{"result": result} for result in [10, 100, 1000, 10000]]
+    assert not process.active
+
+
+def test_trace_calls(process):
+    root = process.trace_calls()
+
+    assert [(node["method"], node["call"], node["return"]) for node in root["calls"]] == [
+        ("iterPower", {"base": 10, "exp": 4}, 10000),
+    ]
@@ -0,0 +1,345 @@
+import pytest
+
+from pyjdb.core import exceptions as _exceptions
+from pyjdb.core import jdwp as _jdwp
+from pyjdb.core import jdwp_process as _jdwp_process
+
+from jdwp_agent import FakeJdwpAgent
+
+
+THREAD = 5
+FRAME = 9
+ITERPOWER = 1
+MAIN = 2
+ITERPOWER_METHOD = 3
+COUNT_FIELD = 7
+NODE = 11
+NODE_GET_VALUE = 12
+
+
+def location(method_id, index, class_id=ITERPOWER):
+    return _jdwp.JdwpLocation(_jdwp.TYPE_TAG_CLASS, class_id, method_id, index)
+
+
+class FakeVm(object):
+    """
+    Answers the commands of a `JdwpProcess` as a VM suspended in
+    `IterPower.main` would; each time the VM is resumed, it sends the next
+    batch of composite events of `script`, given as lists of
+    (suspend policy, [(kind, body writer)]) tuples, and then dies.
+    """
+
+    classes = {
+        "LIterPower;": (ITERPOWER, {MAIN: ("main", "([Ljava/lang/String;)V"), ITERPOWER_METHOD: ("iterPower", "(II)I")}),
+        "LNode;": (NODE, {NODE_GET_VALUE: ("getValue", "()I")}),
+    }
+
+    line_tables = {
+        MAIN: [(0, 16), (3, 17)],
+        ITERPOWER_METHOD: [(0, 30), (2, 31), (8, 32), (12, 33), (16, 35)],
+        NODE_GET_VALUE: [(0, 5)],
+    }
+
+    # The argument `base` and `exp`, and the local variable `result`
+    slots = {0: 10, 1: 4, 2: 1}
+
+    def __init__(self, script=()):
+        self.script = list(script)
+        self.loaded = {"LIterPower;"}
+        self.location = location(MAIN, 0)
+        self.requests = {}
+        self.cleared = []
+        self.resumes = 0
+        self._next_request = 1
+
+    def request_kinds(self):
+        return [kind for (kind, _, _) in self.requests.values()]
+
+    def handle(self, agent, command, reader):
+        if command == _jdwp.CMD_VM_CLASSES_BY_SIGNATURE:
+            signature = reader.string()
+            if signature not in self.loaded:
+                return agent.writer().i32(0)
+            return agent.writer().i32(1).u8(_jdwp.TYPE_TAG_CLASS).id(self.classes[signature][0]).i32(7)
+
+        if command == _jdwp.CMD_REFERENCE_TYPE_SIGNATURE:
+            class_id = reader.id()
+            return agent.writer().string([s for (s, (c, _)) in self.classes.items() if c == class_id][0])
+
+        if command == _jdwp.CMD_REFERENCE_TYPE_METHODS:
+            class_id = reader.id()
+            methods = [m for (c, m) in self.classes.values() if c == class_id][0]
+            reply = agent.writer().i32(len(methods))
+            for (method_id, (name, signature)) in methods.items():
+                reply.id(method_id).string(name).string(signature).i32(_jdwp.JDWP_ACC_STATIC)
+            return reply
+
+        if command == _jdwp.CMD_REFERENCE_TYPE_FIELDS:
+            return agent.writer().i32(1).id(COUNT_FIELD).string("count").string("I").i32(_jdwp.JDWP_ACC_STATIC)
+
+        if command == _jdwp.CMD_REFERENCE_TYPE_GET_VALUES:
+            return agent.writer().i32(1).u8(_jdwp.TAG_INT).i32(3)
+
+        if command == _jdwp.CMD_METHOD_LINE_TABLE:
+            (_, method_id) = (reader.id(), reader.id())
+            lines = self.line_tables[method_id]
+            reply = agent.writer().i64(0).i64(20).i32(len(lines))
+            for (index, line) in lines:
+                reply.i64(index).i32(line)
+            return reply
+
+        if command == _jdwp.CMD_METHOD_VARIABLE_TABLE:
+            (_, method_id) = (reader.id(), reader.id())
+            if method_id != ITERPOWER_METHOD:
+                return _jdwp.JDWP_ERROR_ABSENT_INFORMATION
+            return (
+                agent.writer().i32(2).i32(3)
+                .i64(0).string("base").string("I").i32(20).i32(0)
+                .i64(0).string("exp").string("I").i32(20).i32(1)
+                .i64(2).string("result").string("I").i32(18).i32(2)
+            )
+
+        if command == _jdwp.CMD_THREAD_REFERENCE_NAME:
+            return agent.writer().string("main")
+
+        if command == _jdwp.CMD_THREAD_REFERENCE_FRAMES:
+            return agent.writer().i32(1).id(FRAME).location(self.location)
+
+        if command == _jdwp.CMD_STACK_FRAME_GET_VALUES:
+            (reader.id(), reader.id())
+            reply = agent.writer()
+            slots = []
+            for _ in range(reader.i32()):
+                slots.append(reader.i32())
+                reader.u8()
+            reply.i32(len(slots))
+            for slot in slots:
+                reply.u8(_jdwp.TAG_INT).i32(self.slots[slot])
+            return reply
+
+        if command == _jdwp.CMD_EVENT_REQUEST_SET:
+            request_id = self._next_request
+            self._next_request += 1
+            self.requests[request_id] = (reader.u8(), reader.u8(), self._modifiers(reader))
+            return agent.writer().i32(request_id)
+
+        if command == _jdwp.CMD_EVENT_REQUEST_CLEAR:
+            reader.u8()
+            request_id = reader.i32()
+            self.cleared.append(request_id)
+            self.requests.pop(request_id, None)
+            return b""
+
+        if command == _jdwp.CMD_VM_RESUME:
+            self.resumes += 1
+            self._send_next(agent)
+            return b""
+
+        # Source files are not available
+        return _jdwp.JDWP_ERROR_ABSENT_INFORMATION
+
+    @staticmethod
+    def _modifiers(reader):
+        modifiers = []
+        for _ in range(reader.i32()):
+            kind = reader.u8()
+            if kind == _jdwp.MOD_LOCATION_ONLY:
+                modifiers.append((kind, reader.location()))
+            elif kind == _jdwp.MOD_FIELD_ONLY:
+                modifiers.append((kind, reader.id(), reader.id()))
+            elif kind in (_jdwp.MOD_CLASS_MATCH, _jdwp.MOD_CLASS_EXCLUDE):
+                modifiers.append((kind, reader.string()))
+            elif kind in (_jdwp.MOD_THREAD_ONLY, _jdwp.MOD_COUNT):
+                modifiers.append((kind, reader.id() if kind == _jdwp.MOD_THREAD_ONLY else reader.i32()))
+            elif kind == _jdwp.MOD_EXCEPTION_ONLY:
+                modifiers.append((kind, reader.id(), reader.u8(), reader.u8()))
+            elif kind == _jdwp.MOD_STEP:
+                modifiers.append((kind, reader.id(), reader.i32(), reader.i32()))
+        return modifiers
+
+    def _send_next(self, agent):
+        if len(self.script) == 0:
+            agent.send_events(_jdwp.SUSPEND_NONE, [(_jdwp.EVENT_KIND_VM_DEATH, 0, agent.writer())])
+            return
+
+        for (suspend_policy, events) in self.script.pop(0):
+            for (kind, body) in events:
+                if kind == _jdwp.EVENT_KIND_CLASS_PREPARE:
+                    self.loaded.add("LNode;")
+                elif kind != _jdwp.EVENT_KIND_VM_DEATH:
+                    self.location = _jdwp.JdwpReader(body.getvalue()[8:]).location()
+            agent.send_events(suspend_policy, [(kind, 0, body) for (kind, body) in events])
+
+
+def located(kind, at, value=None):
+    body = _jdwp.JdwpWriter().id(THREAD).location(at)
+    if value is not None:
+        body.u8(_jdwp.TAG_INT).i32(value)
+    return kind, body
+
+
+def field_modified(at, new_value):
+    body = (
+        _jdwp.JdwpWriter().id(THREAD).location(at)
+        .u8(_jdwp.TYPE_TAG_CLASS).id(ITERPOWER).id(COUNT_FIELD).u8(_jdwp.TAG_OBJECT).id(0)
+        .u8(_jdwp.TAG_INT).i32(new_value)
+    )
+    return _jdwp.EVENT_KIND_FIELD_MODIFICATION, body
+
+
+def class_prepared(signature, class_id):
+    body = _jdwp.JdwpWriter().id(THREAD).u8(_jdwp.TYPE_TAG_CLASS).id(class_id).string(signature).i32(7)
+    return _jdwp.EVENT_KIND_CLASS_PREPARE, body
+
+
+@pytest.fixture
+def session():
+    # Attach to the fake VM, as `spawn` does once the entry method is reached
+    agents = []
+
+    def attach(vm):
+        agent = FakeJdwpAgent(vm.handle)
+        agents.append(agent)
+
+        process = _jdwp_process.JdwpProcess("IterPower")
+        process.connection = _jdwp.JdwpConnection("localhost", agent.port, timeout=5)
+        process._thread = process._entry_thread = THREAD
+        process._reset_trace_history()
+        return process
+
+    yield attach
+
+    for agent in agents:
+        agent.close()
+
+
+def breakpoint_locations(vm):
+    return [
+        modifiers[0][1] for (kind, _, modifiers) in vm.requests.values()
+        if kind == _jdwp.EVENT_KIND_BREAKPOINT
+    ]
+
+
+def test_add_breakpoint_at_line(session):
+    vm = FakeVm()
+    session(vm).add_breakpoint("IterPower:32")
+
+    assert breakpoint_locations(vm) == [location(ITERPOWER_METHOD, 8)]
+
+
+def test_add_breakpoint_in_method(session):
+    vm = FakeVm()
+    session(vm).add_breakpoint("IterPower.iterPower")
+
+    assert breakpoint_locations(vm) == [location(ITERPOWER_METHOD, 0)]
+
+
+@pytest.mark.parametrize("where", ["IterPower:99", "IterPower:x", "IterPower.power"])
+def test_add_breakpoint_without_location(session, where):
+    with pytest.raises(_exceptions.JdbHostErrorException):
+        session(FakeVm()).add_breakpoint(where)
+
+
+def test_add_watch(session):
+    vm = FakeVm()
+    session(vm).add_watch("IterPower.count", access=True)
+
+    assert sorted(vm.requests.values()) == [
+        (_jdwp.EVENT_KIND_FIELD_ACCESS, _jdwp.SUSPEND_ALL, [(_jdwp.MOD_FIELD_ONLY, ITERPOWER, COUNT_FIELD)]),
+        (_jdwp.EVENT_KIND_FIELD_MODIFICATION, _jdwp.SUSPEND_ALL, [(_jdwp.MOD_FIELD_ONLY, ITERPOWER, COUNT_FIELD)]),
+    ]
+
+    with pytest.raises(_exceptions.JdbHostErrorException):
+        session(FakeVm()).add_watch("IterPower.total")
+
+
+def test_iter_samples(session):
+    vm = FakeVm([
+        [(_jdwp.SUSPEND_ALL, [located(_jdwp.EVENT_KIND_BREAKPOINT, location(ITERPOWER_METHOD, 0))])],
+        [(_jdwp.SUSPEND_ALL, [field_modified(location(ITERPOWER_METHOD, 8), 4)])],
+    ])
+    process = session(vm)
+    process._method_requests = [(_jdwp.EVENT_KIND_METHOD_ENTRY, 99)]
+
+    records = list(process.iter_samples(breakpoints=["IterPower.iterPower"], watches=["IterPower.count"]))
+
+    assert records == [
+        {
+            "thread": "main",
+            "class.method": "IterPower.iterPower()",
+            "method": "iterPower",
+            "line": 30,
+            "bci": 0,
+            "call": {"base": 10, "exp": 4},
+            "locals": {},
+        },
+        {
+            "thread": "main",
+            "class.method": "IterPower.iterPower()",
+            "method": "iterPower",
+            "line": 32,
+            "bci": 8,
+            "watch": {"field": "IterPower.count", "value": 3, "new_value": 4},
+            "locals": {"result": 1},
+        },
+    ]
+    assert len(process.trace) == 2
+    assert 99 in vm.cleared
+    assert not process.active
+
+
+def test_iter_samples_defers_breakpoints(session):
+    vm = FakeVm([
+        [(_jdwp.SUSPEND_ALL, [class_prepared("LNode;", NODE)])],
+        [(_jdwp.SUSPEND_ALL, [located(_jdwp.EVENT_KIND_BREAKPOINT, location(NODE_GET_VALUE, 0, NODE))])],
+    ])
+    process = session(vm)
+
+    process.add_breakpoint("Node:5")
+    assert vm.request_kinds() == [_jdwp.EVENT_KIND_CLASS_PREPARE]
+
+    records = list(process.iter_samples(include_locals=False))
+
+    assert [record["class.method"] for record in records] == ["Node.getValue()"]
+    assert vm.request_kinds() == [_jdwp.EVENT_KIND_BREAKPOINT]
+
+
+def test_trace_calls(session):
+    vm = FakeVm([
+        [(_jdwp.SUSPEND_ALL, [located(_jdwp.EVENT_KIND_METHOD_ENTRY, location(ITERPOWER_METHOD, 0))])],
+        [(_jdwp.SUSPEND_ALL, [
+            located(_jdwp.EVENT_KIND_METHOD_EXIT_WITH_RETURN_VALUE, location(ITERPOWER_METHOD, 16), 10000)])],
+    ])
+    process = session(vm)
+
+    root = process.trace_calls()
+
+    assert root["calls"] == [{
+        "thread": "main",
+        "class.method": "IterPower.iterPower()",
+        "method": "iterPower",
+        "line": 30,
+        "bci": 0,
+        "call": {"base": 10, "exp": 4},
+        "calls": [],
+        "return": 10000,
+    }]
+    assert len(process.trace) == 2
+
+
+def test_trace_calls_without_arguments(session):
+    # The VM does not suspend the program, so all events are sent at once
+    vm = FakeVm([[
+        (_jdwp.SUSPEND_NONE, [located(_jdwp.EVENT_KIND_METHOD_ENTRY, location(ITERPOWER_METHOD, 0))]),
+        (_jdwp.SUSPEND_NONE, [
+            located(_jdwp.EVENT_KIND_METHOD_EXIT_WITH_RETURN_VALUE, location(ITERPOWER_METHOD, 16), 10000)]),
+        (_jdwp.SUSPEND_NONE, [(_jdwp.EVENT_KIND_VM_DEATH, _jdwp.JdwpWriter())]),
+    ]])
+    process = session(vm)
+
+    root = process.trace_calls(include_arguments=False)
+
+    assert [(node["method"], node["call"], node["return"]) for node in root["calls"]] == [("iterPower", None, 10000)]
+    assert {suspend for (_, suspend, _) in vm.requests.values()} == {_jdwp.SUSPEND_NONE}
+    assert vm.resumes == 1
+
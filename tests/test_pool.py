@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+from pyjdb.core import jdwp_process as _jdwp_process
+from pyjdb.inspect import compiler as _compiler
+from pyjdb.inspect import pool as _pool
+from pyjdb.inspect import process as _process
+
+
+@pytest.fixture
+def compiled(monkeypatch):
+    # Record the compilations instead of running `javac`
+    calls = []
+    monkeypatch.setattr(_compiler, "compile_directory", lambda **kwargs: calls.append(kwargs) or True)
+    return calls
+
+
+def test_class_path_is_relative_to_path(tmp_path, compiled):
+    pool = _pool.JdbSessionPool("IterPower", path=str(tmp_path), class_path=["lib", "/opt/classes"])
+
+    assert pool.class_path == [str(tmp_path / "lib"), "/opt/classes", str(tmp_path)]
+    assert compiled[0]["path"] == str(tmp_path)
+    assert compiled[0]["class_path"] == pool.class_path
+
+
+@pytest.fixture
+def jdwp_backend(monkeypatch):
+    # Enable the experimental backend for a single test
+    monkeypatch.setattr(_process, "SESSION_BACKENDS", dict(_process.SESSION_BACKENDS))
+    _process.enable_backend("jdwp")
+
+
+def test_unknown_backend(tmp_path, compiled):
+    with pytest.raises(ValueError):
+        _pool.JdbSessionPool("IterPower", path=str(tmp_path), backend="gdb")
+
+
+def test_experimental_backend(tmp_path, compiled, monkeypatch):
+    monkeypatch.setattr(_process, "SESSION_BACKENDS", dict(_process.SESSION_BACKENDS))
+
+    with pytest.raises(ValueError, match="experimental"):
+        _pool.JdbSessionPool("IterPower", path=str(tmp_path), backend="jdwp")
+
+    _process.enable_backend("jdwp")
+    assert _pool.JdbSessionPool("IterPower", path=str(tmp_path), backend="jdwp").backend == "jdwp"
+
+    with pytest.raises(ValueError):
+        _process.enable_backend("gdb")
+
+
+def test_spawn_with_backend(tmp_path, compiled, monkeypatch, jdwp_backend):
+    monkeypatch.setattr(_jdwp_process.JdwpProcess, "spawn", lambda self, args, capture_target=True: None)
+    pool = _pool.JdbSessionPool("IterPower", path=str(tmp_path), backend="jdwp")
+
+    p = pool._spawn(None)
+
+    assert isinstance(p, _jdwp_process.JdwpProcess)
+    assert p.cwd == str(tmp_path)
+    assert p.class_path == [str(tmp_path)]
+
+
+@pytest.mark.parametrize("expected", [
+    {"class_name": "Other"},
+    {"path": "elsewhere"},
+    {"class_path": ["lib"]},
+    {"backend": "jdwp"},
+])
+def test_acquire_checks_session(tmp_path, compiled, expected):
+    pool = _pool.JdbSessionPool("IterPower", path=str(tmp_path))
+
+    with pytest.raises(ValueError):
+        pool.acquire(**expected)
+
+    # Nothing was launched
+    assert len(pool._sessions) == 0
+
+
+def test_context_manager_checks_pool(tmp_path, compiled, jdwp_backend):
+    pool = _pool.JdbSessionPool("IterPower", path=str(tmp_path))
+    cwd = os.getcwd()
+
+    with pytest.raises(ValueError):
+        with _process.JdbProcessContextManager(
+                "IterPower", path=str(tmp_path), pool=pool, backend="jdwp", compilation_cache=False):
+            pass
+
+    assert os.getcwd() == cwd
+
+
+def test_acquire_reports_both_spawn_errors(tmp_path, compiled, monkeypatch):
+    errors = [OSError("first"), OSError("second")]
+
+    def spawn(self, args):
+        raise errors.pop(0)
+
+    monkeypatch.setattr(_pool.JdbSessionPool, "_spawn", spawn)
+    pool = _pool.JdbSessionPool("IterPower", path=str(tmp_path), size=0)
+
+    with pytest.raises(OSError, match="second") as info:
+        pool.acquire()
+
+    assert str(info.value.__cause__) == "first"
+    pool.close()
@@ -0,0 +1,219 @@
+import pytest
+
+from pyjdb.core import trace as _trace
+
+
+def make_records(count):
+    records = []
+
+    for i in range(count):
+        info = {
+            "thread": "main",
+            "class.method": "IterPower.iterPower()" if i % 5 else "IterPower.main()",
+            "method": "iterPower" if i % 5 else "main",
+            "line": 30 + i % 6,
+            "bci": i % 20,
+            "instruction": "exp -= 1;" if i % 2 else "result *= base;",
+            "locals": {"base": 2, "exp": 10 - i // 3, "result": [i // 2, 1]},
+        }
+
+        if i % 5 == 0:
+            info["call"] = {"base": 2, "exp": 10}
+        if i % 7 == 3:
+            info["return"] = i
+        if i % 4 == 1:
+            del info["locals"]
+        if i % 11 == 6:
+            info["watch"] = {"field": "Node.next", "value": None, "new_value": {"value": i}}
+        if i % 9 == 8:
+            info["exception"] = {
+                "class": "java.lang.ArithmeticException",
+                "caught": i % 2 == 0,
+                "catch": {"class.method": "IterPower.main()", "line": 21, "bci": 12} if i % 2 == 0 else None,
+                "stack": [{"class.method": "IterPower.iterPower()", "source": "IterPower.java", "line": 32}],
+            }
+
+        records.append(info)
+
+    return records
+
+
+@pytest.mark.parametrize("maxlen", [None, 1, 3, 10, 100])
+def test_trace_history_ring_buffer(maxlen):
+    history = _trace.TraceHistory(maxlen=maxlen)
+    items = list(range(25))
+    history.extend(items)
+
+    expected = items if maxlen is None else items[-maxlen:]
+    assert history.snapshot() == expected
+    assert list(history) == expected
+    assert len(history) == len(expected)
+    assert history[0] == expected[0]
+    assert history[-1] == expected[-1]
+    assert history[1:4] == expected[1:4]
+    assert history == expected
+
+    with pytest.raises(IndexError):
+        history[len(expected)]
+
+
+def test_trace_history_maxlen_change():
+    history = _trace.TraceHistory(maxlen=5, items=range(10))
+    history.maxlen = 3
+    assert history.snapshot() == [7, 8, 9]
+
+    history.maxlen = None
+    history.append(10)
+    assert history.snapshot() == [7, 8, 9, 10]
+
+
+@pytest.mark.parametrize("checkpoint_interval", [1, 4, 256])
+def test_trace_round_trip(checkpoint_interval):
+    records = make_records(60)
+    trace = _trace.Trace(records, checkpoint_interval=checkpoint_interval)
+
+    assert len(trace) == len(records)
+    assert trace.snapshot() == records
+    assert [trace[i] for i in range(len(records))] == records
+    assert trace[-1] == records[-1]
+    assert trace[10:20] == records[10:20]
+    assert trace == _trace.TraceHistory(items=records)
+
+
+def test_trace_missing_values():
+    records = [{}, {"line": 3}, {"thread": "main", "locals": {}}]
+    assert _trace.Trace(records).snapshot() == records
+
+
+def test_trace_thread_index():
+    records = make_records(12)
+    for (i, info) in enumerate(records):
+        info["thread"] = "Worker-{}".format(i % 3)
+        info["index"] = i
+
+    trace = _trace.Trace(records)
+    assert trace.snapshot() == records
+    assert list(trace.columns()["index"]) == list(range(12))
+
+
+def test_trace_columns():
+    trace = _trace.Trace(make_records(10))
+    columns = trace.columns()
+
+    assert list(columns["line"]) == [30 + i % 6 for i in range(10)]
+    assert trace.threads == ["main"]
+    assert [trace.methods[index][0] for index in columns["method"][:2]] == ["IterPower.main()",
+                                                                            "IterPower.iterPower()"]
+
+
+def test_trace_columns_are_views():
+    records = make_records(10)
+    trace = _trace.Trace(records[:5])
+    columns = trace.columns()
+
+    # The columns are not copied, and cannot be altered
+    assert columns["line"].obj is trace._line
+    with pytest.raises(TypeError):
+        columns["line"][0] = 0
+
+    # The trace only grows once they are released
+    with pytest.raises(BufferError):
+        trace.append(records[5])
+
+    for column in columns.values():
+        column.release()
+
+    trace.extend(records[5:])
+    assert trace.snapshot() == records
+    assert list(trace.columns()["line"]) == [info["line"] for info in records]
+
+
+@pytest.mark.parametrize("checkpoint_interval", [2, 4])
+def test_trace_checkpoints_bound_replay(checkpoint_interval):
+    # Variables change at every step which has any, and no step at a
+    # multiple of the interval has them
+    records = []
+    for i in range(40):
+        info = {"line": i}
+        if i % checkpoint_interval != 0:
+            info["locals"] = {"i": i}
+        records.append(info)
+
+    trace = _trace.Trace(records, checkpoint_interval=checkpoint_interval)
+
+    # No step is rebuilt from more than `checkpoint_interval` deltas
+    checkpoints = trace._checkpoint_indices + [len(records)]
+    for (start, stop) in zip(checkpoints, checkpoints[1:]):
+        assert len([i for i in trace._delta_indices if start < i < stop]) <= checkpoint_interval
+
+    assert [trace[i] for i in range(len(records))] == records
+    assert trace.snapshot() == records
+
+
+def test_variable_history_values():
+    history = _trace.VariableHistory()
+    history.extend(make_records(30))
+
+    assert history.names() == ["base", "exp", "result"]
+    assert history.values("base") == [2]
+    assert history.values("exp", unique=True) == list(range(10, 0, -1))
+
+    # Lists are deduplicated, although they are not hashable
+    assert history.values("result", unique=True) == [[i, 1] for i in range(15)]
+
+
+def test_variable_history_methods_and_ranges():
+    history = _trace.VariableHistory()
+    history.record(0, "A.f()", {"x": 1})
+    history.record(1, "A.f()", {"x": 1})
+    history.record(2, "A.g()", {"x": 5})
+    history.record(3, "A.f()", {"x": 1})
+    history.record(4, "A.f()", {"x": 2})
+    history.record(7, "A.f()", {"x": [1, 2]})
+
+    assert history.variables() == [("A.f()", "x"), ("A.g()", "x")]
+    assert history.history("x", "A.f()") == [(0, 1), (3, 1), (4, 2), (7, [1, 2])]
+    assert history.history("x") == [(0, 1), (2, 5), (3, 1), (4, 2), (7, [1, 2])]
+    assert history.values("x") == [1, 5, 1, 2, [1, 2]]
+    assert history.values("x", "A.f()") == [1, 2, [1, 2]]
+    assert history.values("x", start=3, stop=7) == [1, 2]
+    assert history.values("x", "A.g()", start=3) == []
+    assert history.values("y") == []
+    assert "x" in history and "y" not in history
+
+
+def test_variable_history_matches_flat_lists():
+    # The values of each name are those of a flat history, in which a value
+    # is only appended when it differs from the previous one
+    records = make_records(40)
+
+    flat = {}
+    for info in records:
+        for (name, value) in info.get("locals", {}).items():
+            values = flat.setdefault(name, [])
+            if len(values) == 0 or values[-1] != value:
+                values.append(value)
+
+    history = _trace.VariableHistory()
+    history.extend(records)
+
+    assert {name: history.values(name) for name in history.names()} == flat
+
+
+def test_variable_history_keeps_types():
+    # `0 == False == 0.0` in Python, but these values must not be interned
+    # as one another
+    history = _trace.VariableHistory()
+    history.record(0, "A.main()", {"i": 0, "d": 1})
+    history.record(1, "A.main()", {"i": 0, "d": 1, "done": False, "x": 1.0})
+    history.record(2, "A.main()", {"i": 0, "d": 1, "done": True, "x": [0, 1.0, False]})
+    history.record(3, "A.main()", {"i": 0.0, "d": True, "done": True, "x": [False, 1, 0.0]})
+
+    assert history.values("done") == [False, True]
+    assert [type(value) for value in history.values("done")] == [bool, bool]
+    assert [type(value) for value in history.values("x")[0:1]] == [float]
+    assert [[type(item) for item in value] for value in history.values("x")[1:]] == [
+        [int, float, bool], [bool, int, float],
+    ]
+    assert [type(value) for value in history.values("i")] == [int, float]
+    assert [type(value) for value in history.values("d")] == [int, bool]